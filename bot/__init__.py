@@ -27,6 +27,8 @@ from tzlocal import get_localzone
 from uvloop import install
 import pyrogram.utils as pyroutils
 
+from .helper.ext_utils.task_registry import TaskRegistry
+
 # Fix for new Telegram peer ID formats
 pyroutils.MIN_CHAT_ID = -999999999999
 pyroutils.MIN_CHANNEL_ID = -100999999999999
@@ -85,11 +87,10 @@ except:
 task_dict_lock = Lock()
 queue_dict_lock = Lock()
 qb_listener_lock = Lock()
-cpu_eater_lock = Lock()
 subprocess_lock = Lock()
 same_directory_lock = Lock()
 status_dict = {}
-task_dict = {}
+task_dict = TaskRegistry()
 rss_dict = {}
 
 BOT_TOKEN = environ.get("BOT_TOKEN", "")
@@ -399,6 +400,70 @@ except:
     log_error(f"Wrong FFMPEG_CMDS format: {FFMPEG_CMDS}")
     FFMPEG_CMDS = []
 
+IO_WORKERS = environ.get("IO_WORKERS", "")
+IO_WORKERS = 0 if len(IO_WORKERS) == 0 else int(IO_WORKERS)
+
+THUMB_CACHE_DIR = environ.get("THUMB_CACHE_DIR", "").rstrip("/")
+if len(THUMB_CACHE_DIR) == 0:
+    THUMB_CACHE_DIR = "thumb_cache"
+
+THUMB_CACHE_SIZE = environ.get("THUMB_CACHE_SIZE", "")
+THUMB_CACHE_SIZE = 209715200 if len(THUMB_CACHE_SIZE) == 0 else int(THUMB_CACHE_SIZE)
+
+CPU_SLOTS = environ.get("CPU_SLOTS", "")
+CPU_SLOTS = 0 if len(CPU_SLOTS) == 0 else int(CPU_SLOTS)
+
+STREAM_ZIP_UPLOAD = environ.get("STREAM_ZIP_UPLOAD", "")
+STREAM_ZIP_UPLOAD = STREAM_ZIP_UPLOAD.lower() == "true"
+
+QUEUE_USER = environ.get("QUEUE_USER", "")
+QUEUE_USER = "" if len(QUEUE_USER) == 0 else int(QUEUE_USER)
+
+QUEUE_DISK_RESERVE = environ.get("QUEUE_DISK_RESERVE", "")
+if len(QUEUE_DISK_RESERVE) == 0:
+    QUEUE_DISK_RESERVE = 0
+else:
+    QUEUE_DISK_RESERVE = int(QUEUE_DISK_RESERVE)
+
+QUEUE_BANDWIDTH = environ.get("QUEUE_BANDWIDTH", "")
+if len(QUEUE_BANDWIDTH) == 0:
+    QUEUE_BANDWIDTH = 0
+else:
+    QUEUE_BANDWIDTH = int(QUEUE_BANDWIDTH)
+
+RESUME_QUEUED_TASKS = environ.get("RESUME_QUEUED_TASKS", "")
+RESUME_QUEUED_TASKS = RESUME_QUEUED_TASKS.lower() == "true"
+
+ENGINE_POLL_INTERVAL = environ.get("ENGINE_POLL_INTERVAL", "")
+if len(ENGINE_POLL_INTERVAL) == 0:
+    ENGINE_POLL_INTERVAL = 2
+else:
+    ENGINE_POLL_INTERVAL = int(ENGINE_POLL_INTERVAL)
+
+METRICS_PORT = environ.get("METRICS_PORT", "")
+METRICS_PORT = "" if len(METRICS_PORT) == 0 else int(METRICS_PORT)
+
+PERF_HISTORY = environ.get("PERF_HISTORY", "")
+if len(PERF_HISTORY) == 0:
+    PERF_HISTORY = 5000
+else:
+    PERF_HISTORY = int(PERF_HISTORY)
+
+QBIT_HOOK_PORT = environ.get("QBIT_HOOK_PORT", "")
+if len(QBIT_HOOK_PORT) == 0:
+    QBIT_HOOK_PORT = 8091
+else:
+    QBIT_HOOK_PORT = int(QBIT_HOOK_PORT)
+
+DIRECT_PARALLEL_DOWNLOADS = environ.get("DIRECT_PARALLEL_DOWNLOADS", "")
+if len(DIRECT_PARALLEL_DOWNLOADS) == 0:
+    DIRECT_PARALLEL_DOWNLOADS = 4
+else:
+    DIRECT_PARALLEL_DOWNLOADS = max(int(DIRECT_PARALLEL_DOWNLOADS), 1)
+
+QUEUE_DISK_CHECK = environ.get("QUEUE_DISK_CHECK", "")
+QUEUE_DISK_CHECK = QUEUE_DISK_CHECK.lower() == "true"
+
 config_dict = {
     "AS_DOCUMENT": AS_DOCUMENT,
     "AUTHORIZED_CHATS": AUTHORIZED_CHATS,
@@ -406,9 +471,12 @@ config_dict = {
     "BASE_URL_PORT": BASE_URL_PORT,
     "BOT_TOKEN": BOT_TOKEN,
     "CMD_SUFFIX": CMD_SUFFIX,
+    "CPU_SLOTS": CPU_SLOTS,
     "DATABASE_URL": DATABASE_URL,
     "DEFAULT_UPLOAD": DEFAULT_UPLOAD,
+    "DIRECT_PARALLEL_DOWNLOADS": DIRECT_PARALLEL_DOWNLOADS,
     "DOWNLOAD_DIR": DOWNLOAD_DIR,
+    "ENGINE_POLL_INTERVAL": ENGINE_POLL_INTERVAL,
     "EQUAL_SPLITS": EQUAL_SPLITS,
     "EXTENSION_FILTER": EXTENSION_FILTER,
     "FFMPEG_CMDS": FFMPEG_CMDS,
@@ -416,23 +484,32 @@ config_dict = {
     "GDRIVE_ID": GDRIVE_ID,
     "INCOMPLETE_TASK_NOTIFIER": INCOMPLETE_TASK_NOTIFIER,
     "INDEX_URL": INDEX_URL,
+    "IO_WORKERS": IO_WORKERS,
     "IS_TEAM_DRIVE": IS_TEAM_DRIVE,
     "LEECH_DUMP_CHAT": LEECH_DUMP_CHAT,
     "LEECH_FILENAME_PREFIX": LEECH_FILENAME_PREFIX,
     "LEECH_SPLIT_SIZE": LEECH_SPLIT_SIZE,
     "MEDIA_GROUP": MEDIA_GROUP,
+    "METRICS_PORT": METRICS_PORT,
     "MIXED_LEECH": MIXED_LEECH,
     "NAME_SUBSTITUTE": NAME_SUBSTITUTE,
     "OWNER_ID": OWNER_ID,
+    "PERF_HISTORY": PERF_HISTORY,
+    "QBIT_HOOK_PORT": QBIT_HOOK_PORT,
     "QUEUE_ALL": QUEUE_ALL,
+    "QUEUE_BANDWIDTH": QUEUE_BANDWIDTH,
+    "QUEUE_DISK_CHECK": QUEUE_DISK_CHECK,
+    "QUEUE_DISK_RESERVE": QUEUE_DISK_RESERVE,
     "QUEUE_DOWNLOAD": QUEUE_DOWNLOAD,
     "QUEUE_UPLOAD": QUEUE_UPLOAD,
+    "QUEUE_USER": QUEUE_USER,
     "RCLONE_FLAGS": RCLONE_FLAGS,
     "RCLONE_PATH": RCLONE_PATH,
     "RCLONE_SERVE_URL": RCLONE_SERVE_URL,
     "RCLONE_SERVE_USER": RCLONE_SERVE_USER,
     "RCLONE_SERVE_PASS": RCLONE_SERVE_PASS,
     "RCLONE_SERVE_PORT": RCLONE_SERVE_PORT,
+    "RESUME_QUEUED_TASKS": RESUME_QUEUED_TASKS,
     "RSS_CHAT": RSS_CHAT,
     "RSS_DELAY": RSS_DELAY,
     "SEARCH_API_LINK": SEARCH_API_LINK,
@@ -442,10 +519,13 @@ config_dict = {
     "STATUS_UPDATE_INTERVAL": STATUS_UPDATE_INTERVAL,
     "STOP_DUPLICATE": STOP_DUPLICATE,
     "STREAMWISH_API": STREAMWISH_API,
+    "STREAM_ZIP_UPLOAD": STREAM_ZIP_UPLOAD,
     "SUDO_USERS": SUDO_USERS,
     "TELEGRAM_API": TELEGRAM_API,
     "TELEGRAM_HASH": TELEGRAM_HASH,
     "THUMBNAIL_LAYOUT": THUMBNAIL_LAYOUT,
+    "THUMB_CACHE_DIR": THUMB_CACHE_DIR,
+    "THUMB_CACHE_SIZE": THUMB_CACHE_SIZE,
     "TORRENT_TIMEOUT": TORRENT_TIMEOUT,
     "USER_TRANSMISSION": USER_TRANSMISSION,
     "UPSTREAM_REPO": UPSTREAM_REPO,
@@ -528,6 +608,9 @@ bot_name = bot.me.username
 
 scheduler = AsyncIOScheduler(timezone=str(get_localzone()), event_loop=bot_loop)
 
+qb_hook = {"port": 0}
+
+
 def get_qb_options():
     global qbit_options
     if not qbit_options:
@@ -541,6 +624,21 @@ def get_qb_options():
         qbit_options["web_ui_password"] = "adminadmin"
         qb_opt = {**qbit_options}
         qbittorrent_client.app_set_preferences(qb_opt)
+    set_qb_hook()
+
+
+def set_qb_hook():
+    # Only pointed at the bot once start_qbit_hook has bound the port.
+    if hook_port := qb_hook["port"]:
+        hook = f"curl -s -m 5 http://127.0.0.1:{hook_port}/qbit"
+        qbittorrent_client.app_set_preferences(
+            {
+                "autorun_enabled": True,
+                "autorun_program": f"{hook}/finished/%I",
+                "autorun_on_torrent_added_enabled": True,
+                "autorun_on_torrent_added_program": f"{hook}/added/%I",
+            }
+        )
 
 get_qb_options()
 
@@ -1,6 +1,6 @@
 from aiofiles import open as aiopen
 from aiofiles.os import path as aiopath, remove
-from asyncio import gather, create_subprocess_exec
+from asyncio import gather, create_subprocess_exec, sleep
 from os import execl as osexecl
 from psutil import (
     disk_usage,
@@ -29,6 +29,7 @@ from bot import (
     intervals,
     config_dict,
     scheduler,
+    bot_loop,
 )
 from .helper.ext_utils.telegraph_helper import telegraph
 from .helper.ext_utils.bot_utils import (
@@ -39,13 +40,18 @@ from .helper.ext_utils.bot_utils import (
 )
 from .helper.ext_utils.db_handler import database
 from .helper.ext_utils.files_utils import clean_all, exit_clean_up
+from .helper.ext_utils.metrics_server import start_metrics_server
 from .helper.ext_utils.status_utils import get_readable_file_size, get_readable_time
 from .helper.listeners.aria2_listener import start_aria2_listener
+from .helper.listeners.qbit_listener import start_qbit_hook
 from .helper.mirror_leech_utils.rclone_utils.serve import rclone_serve_booter
 from .helper.telegram_helper.bot_commands import BotCommands
 from .helper.telegram_helper.button_build import ButtonMaker
 from .helper.telegram_helper.filters import CustomFilters
 from .helper.telegram_helper.message_utils import send_message, edit_message, send_file
+from .helper.telegram_helper.rate_limiter import tg_limit
+from .modules.mirror_leech import Mirror
+from .modules.ytdlp import YtDlp
 from .modules import (
     authorize,
     cancel_task,
@@ -64,6 +70,7 @@ from .modules import (
     help,
     force_start,
     channel_leech,
+    perf,
     channel_commands,
 )
 
@@ -182,6 +189,7 @@ NOTE: Try each command without any argument to see more detalis.
 /{BotCommands.SearchCommand} [query]: Search for torrents with API.
 /{BotCommands.StatusCommand}: Shows a status of all the downloads.
 /{BotCommands.StatsCommand}: Show stats of the machine where the bot is hosted in.
+/{BotCommands.PerfCommand} [window]: Stage timings of finished tasks, e.g. 24h or 7d (Only Owner & Sudo).
 /{BotCommands.PingCommand}: Check how long it takes to Ping the Bot (Only Owner & Sudo).
 /{BotCommands.AuthorizeCommand}: Authorize a chat or a user to use the bot (Only Owner & Sudo).
 /{BotCommands.UnAuthorizeCommand}: Unauthorize a chat or a user to use the bot (Only Owner & Sudo).
@@ -213,17 +221,19 @@ async def restart_notification():
     async def send_incomplete_task_message(cid, msg):
         try:
             if msg.startswith("Restarted Successfully!"):
-                await bot.edit_message_text(
-                    chat_id=chat_id, message_id=msg_id, text=msg
-                )
+                async with tg_limit(bot, "edit"):
+                    await bot.edit_message_text(
+                        chat_id=chat_id, message_id=msg_id, text=msg
+                    )
                 await remove(".restartmsg")
             else:
-                await bot.send_message(
-                    chat_id=cid,
-                    text=msg,
-                    disable_web_page_preview=True,
-                    disable_notification=True,
-                )
+                async with tg_limit(bot, "send"):
+                    await bot.send_message(
+                        chat_id=cid,
+                        text=msg,
+                        disable_web_page_preview=True,
+                        disable_notification=True,
+                    )
         except Exception as e:
             LOGGER.error(e)
 
@@ -243,14 +253,57 @@ async def restart_notification():
 
     if await aiopath.isfile(".restartmsg"):
         try:
-            await bot.edit_message_text(
-                chat_id=chat_id, message_id=msg_id, text="Restarted Successfully!"
-            )
+            async with tg_limit(bot, "edit"):
+                await bot.edit_message_text(
+                    chat_id=chat_id, message_id=msg_id, text="Restarted Successfully!"
+                )
         except:
             pass
         await remove(".restartmsg")
 
 
+async def restore_queued_tasks():
+    if not (config_dict["RESUME_QUEUED_TASKS"] and config_dict["DATABASE_URL"]):
+        return
+    if not (entries := await database.get_queued_tasks()):
+        return
+    LOGGER.info(f"Restoring {len(entries)} queued tasks")
+    for entry in entries:
+        try:
+            async with tg_limit(bot, "get_messages"):
+                message = await bot.get_messages(entry["cid"], entry["msg_id"])
+        except Exception as e:
+            LOGGER.error(f"Failed to restore queued task {entry['_id']}: {e}")
+            message = None
+        if message is None or message.empty:
+            await database.rm_queued_task(entry["_id"])
+            continue
+        # The entry is stored again by check_running_tasks if the task queues
+        # again, so links that fail before that aren't retried every restart.
+        await database.rm_queued_task(entry["_id"])
+        # Multi and bulk messages are sent by the bot, so the user who queued
+        # them has to be restored from the entry.
+        try:
+            if entry["user_id"] < 0:
+                async with tg_limit(bot, "get_messages"):
+                    message.sender_chat = await bot.get_chat(entry["user_id"])
+                message.from_user = None
+            else:
+                async with tg_limit(bot, "get_messages"):
+                    message.from_user = await bot.get_users(entry["user_id"])
+        except Exception as e:
+            LOGGER.error(f"Failed to restore queued task {entry['_id']}: {e}")
+            continue
+        message.text = entry["text"]
+        if entry["kind"] == "YtDlp":
+            task = YtDlp(bot, message, is_leech=entry["leech"])
+        else:
+            task = Mirror(bot, message, is_qbit=entry["qbit"], is_leech=entry["leech"])
+        bot_loop.create_task(task.new_event())
+        # Spread the restart so downloaders and Telegram aren't hit at once.
+        await sleep(3)
+
+
 async def main():
     if config_dict["DATABASE_URL"]:
         await database.db_load()
@@ -260,6 +313,8 @@ async def main():
         restart_notification(),
         telegraph.create_account(),
         rclone_serve_booter(),
+        start_metrics_server(),
+        start_qbit_hook(),
         sync_to_async(start_aria2_listener, wait=False),
     )
     create_help_buttons()
@@ -306,6 +361,7 @@ async def main():
     )
     LOGGER.info("Bot Started!")
     signal(SIGINT, exit_clean_up)
+    bot_loop.create_task(restore_queued_tasks())
 
 
 bot.loop.run_until_complete(main())
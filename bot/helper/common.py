@@ -1,11 +1,11 @@
 from aiofiles.os import path as aiopath, remove, makedirs
-from asyncio import sleep, create_subprocess_exec, gather
+from asyncio import sleep, create_subprocess_exec, gather, Semaphore
 from asyncio.subprocess import PIPE
-from os import walk, path as ospath
+from os import path as ospath
 from secrets import token_urlsafe
-from aioshutil import move, copy2
+from aioshutil import move
 from pyrogram.enums import ChatAction
-from re import sub, I
+from re import sub, I, findall
 
 from bot import (
     DOWNLOAD_DIR,
@@ -19,11 +19,15 @@ from bot import (
     task_dict_lock,
     task_dict,
     global_extension_filter,
-    cpu_eater_lock,
     subprocess_lock,
     intervals,
 )
-from .ext_utils.bot_utils import new_task, sync_to_async, get_size_bytes
+from .ext_utils.bot_utils import (
+    new_task,
+    sync_to_async,
+    async_to_sync,
+    get_size_bytes,
+)
 from .ext_utils.bulk_links import extract_bulk_links
 from .ext_utils.exceptions import NotSupportedExtractionArchive
 from .ext_utils.files_utils import (
@@ -31,8 +35,11 @@ from .ext_utils.files_utils import (
     is_first_archive_split,
     is_archive,
     is_archive_split,
-    get_path_size,
     clean_target,
+    get_io_workers,
+    clone_file,
+    FileInventory,
+    zstd_decompress,
 )
 from .ext_utils.links_utils import (
     is_gdrive_id,
@@ -41,6 +48,7 @@ from .ext_utils.links_utils import (
     is_telegram_link,
 )
 from .ext_utils.media_utils import (
+    FFProgress,
     create_thumb,
     create_sample_video,
     take_ss,
@@ -52,6 +60,9 @@ from .ext_utils.media_utils import (
     convert_video,
     convert_audio,
 )
+from .ext_utils.metrics import timed
+from .ext_utils.task_manager import cpu_pool
+from .ext_utils.zip_stream import write_zip_volumes
 from .mirror_leech_utils.gdrive_utils.list import GoogleDriveList
 from .mirror_leech_utils.rclone_utils.list import RcloneList
 from .mirror_leech_utils.status_utils.sevenz_status import SevenZStatus
@@ -62,6 +73,7 @@ from .telegram_helper.message_utils import (
     send_status_message,
     get_tg_link_message,
 )
+from .telegram_helper.rate_limiter import tg_limit
 
 
 class TaskConfig:
@@ -114,6 +126,10 @@ class TaskConfig:
         self.ffmpeg_cmds = None
         self.chat_thread_id = None
         self.subproc = None
+        self.subprocs = []
+        self.ffprogress = FFProgress()
+        self.sevenz_progress = {}
+        self.inventory = FileInventory()
         self.thumb = None
         self.extension_filter = []
         self.is_super_chat = self.message.chat.type.name in ["SUPERGROUP", "CHANNEL"]
@@ -329,15 +345,14 @@ class TaskConfig:
                     elif self.up_dest.lower() == "pm":
                         self.up_dest = self.user_id
 
-                if self.user_transmission:
-                    chat = await user.get_chat(self.up_dest)
-                    uploader_id = user.me.id
-                else:
-                    chat = await self.client.get_chat(self.up_dest)
-                    uploader_id = self.client.me.id
+                uploader = user if self.user_transmission else self.client
+                async with tg_limit(uploader, "get_messages"):
+                    chat = await uploader.get_chat(self.up_dest)
+                uploader_id = uploader.me.id
 
                 if chat.type.name in ["SUPERGROUP", "CHANNEL"]:
-                    member = await chat.get_member(uploader_id)
+                    async with tg_limit(uploader, "get_messages"):
+                        member = await chat.get_member(uploader_id)
                     if (
                         not member.privileges.can_manage_chat
                         or not member.privileges.can_delete_messages
@@ -351,9 +366,10 @@ class TaskConfig:
                     )
                 else:
                     try:
-                        await self.client.send_chat_action(
-                            self.up_dest, ChatAction.TYPING
-                        )
+                        async with tg_limit(self.client, "send"):
+                            await self.client.send_chat_action(
+                                self.up_dest, ChatAction.TYPING
+                            )
                     except:
                         raise ValueError("Start the bot and try again!")
             elif (
@@ -416,7 +432,8 @@ class TaskConfig:
                 self.tag = " ".join(user_info[:-1])
             else:
                 self.tag, id_ = text[1].split("Tag: ")[1].split()
-            self.user = self.message.from_user = await self.client.get_users(id_)
+            async with tg_limit(self.client, "get_messages"):
+                self.user = self.message.from_user = await self.client.get_users(id_)
             self.user_id = self.user.id
             self.user_dict = user_data.get(self.user_id, {})
             try:
@@ -461,17 +478,19 @@ class TaskConfig:
             msg = [s.strip() for s in input_list]
             index = msg.index("-i")
             msg[index + 1] = f"{self.multi - 1}"
-            nextmsg = await self.client.get_messages(
-                chat_id=self.message.chat.id,
-                message_ids=self.message.reply_to_message_id + 1,
-            )
+            async with tg_limit(self.client, "get_messages"):
+                nextmsg = await self.client.get_messages(
+                    chat_id=self.message.chat.id,
+                    message_ids=self.message.reply_to_message_id + 1,
+                )
             msgts = " ".join(msg)
             if self.multi > 2:
                 msgts += f"\nCancel Multi: <code>/{BotCommands.CancelTaskCommand[1]} {self.multi_tag}</code>"
             nextmsg = await send_message(nextmsg, msgts)
-        nextmsg = await self.client.get_messages(
-            chat_id=self.message.chat.id, message_ids=nextmsg.id
-        )
+        async with tg_limit(self.client, "get_messages"):
+            nextmsg = await self.client.get_messages(
+                chat_id=self.message.chat.id, message_ids=nextmsg.id
+            )
         if self.message.from_user:
             nextmsg.from_user = self.user
         else:
@@ -508,9 +527,10 @@ class TaskConfig:
                 multi_tags.add(self.multi_tag)
                 msg += f"\nCancel Multi: <code>/{BotCommands.CancelTaskCommand[1]} {self.multi_tag}</code>"
             nextmsg = await send_message(self.message, msg)
-            nextmsg = await self.client.get_messages(
-                chat_id=self.message.chat.id, message_ids=nextmsg.id
-            )
+            async with tg_limit(self.client, "get_messages"):
+                nextmsg = await self.client.get_messages(
+                    chat_id=self.message.chat.id, message_ids=nextmsg.id
+                )
             if self.message.from_user:
                 nextmsg.from_user = self.user
             else:
@@ -533,54 +553,79 @@ class TaskConfig:
 
     async def decompress_zst(self, dl_path, is_dir=False):
         if is_dir:
-            for dirpath, _, files in await sync_to_async(walk, dl_path, topdown=False):
-                for file_ in files:
-                    if file_.endswith(".zst"):
-                        f_path = ospath.join(dirpath, file_)
-                        out_path = get_base_name(f_path)
-                        cmd = ["unzstd", f_path, "-o", out_path]
-                        if self.is_cancelled:
-                            return ""
-                        async with subprocess_lock:
-                            self.subproc = await create_subprocess_exec(
-                                *cmd, stderr=PIPE
-                            )
-                        _, stderr = await self.subproc.communicate()
-                        if self.is_cancelled:
-                            return ""
-                        code = self.subproc.returncode
-                        if code != 0:
-                            try:
-                                stderr = stderr.decode().strip()
-                            except:
-                                stderr = "Unable to decode the error!"
-                            LOGGER.error(
-                                f"{stderr}. Unable to extract zst file!. Path: {f_path}"
-                            )
-                        elif not self.seed:
-                            await remove(f_path)
-            return
+            zst_files = [
+                ospath.join(dirpath, file_)
+                for dirpath, _, files in await self.inventory.walk(
+                    dl_path, topdown=False
+                )
+                for file_ in files
+                if file_.endswith(".zst")
+            ]
         elif dl_path.endswith(".zst"):
-            out_path = get_base_name(dl_path)
-            cmd = ["unzstd", dl_path, "-o", out_path]
-            if self.is_cancelled:
-                return ""
-            async with subprocess_lock:
-                self.subproc = await create_subprocess_exec(*cmd, stderr=PIPE)
-            _, stderr = await self.subproc.communicate()
-            if self.is_cancelled:
-                return ""
-            code = self.subproc.returncode
-            if code != 0:
+            zst_files = [dl_path]
+        else:
+            return dl_path
+        if not zst_files:
+            return
+        self.sevenz_progress = {
+            f_path: [self.inventory.file_size(f_path), 0] for f_path in zst_files
+        }
+        workers = min(len(zst_files), get_io_workers())
+        semaphore = Semaphore(workers)
+        failed = []
+
+        async def decompress(f_path):
+            out_path = get_base_name(f_path)
+            async with semaphore:
+                if self.is_cancelled:
+                    return
                 try:
-                    stderr = stderr.decode().strip()
-                except:
-                    stderr = "Unable to decode the error!"
-                LOGGER.error(f"{stderr}. Unable to extract zst file!. Path: {dl_path}")
-            elif not self.seed:
-                await remove(dl_path)
-            return out_path
-        return dl_path
+                    await sync_to_async(
+                        zstd_decompress,
+                        f_path,
+                        out_path,
+                        self.sevenz_progress[f_path],
+                        self,
+                    )
+                except Exception as e:
+                    failed.append(f_path)
+                    if not self.is_cancelled:
+                        LOGGER.error(
+                            f"{e}. Unable to extract zst file!. Path: {f_path}"
+                        )
+                    if await aiopath.isfile(out_path):
+                        await remove(out_path)
+                    return
+            if not self.seed:
+                await remove(f_path)
+
+        async with cpu_pool.job(self, "Zstd", workers):
+            await gather(*(decompress(f_path) for f_path in zst_files))
+        if self.is_cancelled:
+            return ""
+        if not is_dir:
+            return dl_path if failed else get_base_name(dl_path)
+
+    async def run_7z(self, cmd, archive):
+        cmd.insert(2, "-bsp1")
+        async with subprocess_lock:
+            if self.is_cancelled:
+                return -9, b""
+            subproc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
+            self.subprocs.append(subproc)
+
+        async def watch_progress():
+            while chunk := await subproc.stdout.read(1024):
+                if percents := findall(rb"(\d+)%", chunk):
+                    self.sevenz_progress[archive][1] = int(percents[-1])
+
+        with timed("mltb_stage_seconds", stage="7z"):
+            _, stderr = await gather(watch_progress(), subproc.stderr.read())
+            await subproc.wait()
+        self.subprocs.remove(subproc)
+        if subproc.returncode == 0:
+            self.sevenz_progress[archive][1] = 100
+        return subproc.returncode, stderr
 
     async def proceed_extract(self, dl_path, gid):
         pswd = self.extract if isinstance(self.extract, str) else ""
@@ -595,8 +640,9 @@ class TaskConfig:
                 else:
                     up_path = dl_path
                 await self.decompress_zst(dl_path, is_dir=True)
-                for dirpath, _, files in await sync_to_async(
-                    walk, dl_path, topdown=False
+                archives = []
+                for dirpath, _, files in await self.inventory.walk(
+                    dl_path, topdown=False
                 ):
                     for file_ in files:
                         if (
@@ -611,47 +657,57 @@ class TaskConfig:
                                 if self.seed
                                 else dirpath
                             )
-                            cmd = [
-                                "7z",
-                                "x",
-                                f"-p{pswd}",
-                                f_path,
-                                f"-o{t_path}",
-                                "-aot",
-                                "-xr!@PaxHeader",
-                            ]
-                            if not pswd:
-                                del cmd[2]
-                            if self.is_cancelled:
-                                return ""
-                            async with subprocess_lock:
-                                self.subproc = await create_subprocess_exec(
-                                    *cmd, stderr=PIPE
-                                )
-                            _, stderr = await self.subproc.communicate()
-                            if self.is_cancelled:
-                                return ""
-                            code = self.subproc.returncode
-                            if code != 0:
+                            archives.append((dirpath, f_path, t_path))
+                self.sevenz_progress = {
+                    f_path: [self.inventory.file_size(f_path), 0]
+                    for _, f_path, _ in archives
+                }
+                semaphore = Semaphore(get_io_workers())
+                failed = []
+
+                async def extract_archive(f_path, t_path):
+                    cmd = [
+                        "7z",
+                        "x",
+                        f"-p{pswd}",
+                        f_path,
+                        f"-o{t_path}",
+                        "-aot",
+                        "-xr!@PaxHeader",
+                    ]
+                    if not pswd:
+                        del cmd[2]
+                    async with semaphore:
+                        if self.is_cancelled:
+                            return
+                        code, stderr = await self.run_7z(cmd, f_path)
+                    if code != 0 and not self.is_cancelled:
+                        failed.append(f_path)
+                        try:
+                            stderr = stderr.decode().strip()
+                        except:
+                            stderr = "Unable to decode the error!"
+                        LOGGER.error(
+                            f"{stderr}. Unable to extract archive splits!. Path: {f_path}"
+                        )
+
+                await gather(
+                    *(extract_archive(f_path, t_path) for _, f_path, t_path in archives)
+                )
+                if self.is_cancelled:
+                    return ""
+                if not self.seed and archives and not failed:
+                    dirs = {dirpath for dirpath, _, _ in archives}
+                    for dirpath, _, files in await self.inventory.walk(dl_path):
+                        if dirpath not in dirs:
+                            continue
+                        for file_ in files:
+                            if is_archive_split(file_) or is_archive(file_):
+                                del_path = ospath.join(dirpath, file_)
                                 try:
-                                    stderr = stderr.decode().strip()
+                                    await remove(del_path)
                                 except:
-                                    stderr = "Unable to decode the error!"
-                                LOGGER.error(
-                                    f"{stderr}. Unable to extract archive splits!. Path: {f_path}"
-                                )
-                if (
-                    not self.seed
-                    and self.subproc is not None
-                    and self.subproc.returncode == 0
-                ):
-                    for file_ in files:
-                        if is_archive_split(file_) or is_archive(file_):
-                            del_path = ospath.join(dirpath, file_)
-                            try:
-                                await remove(del_path)
-                            except:
-                                self.is_cancelled = True
+                                    self.is_cancelled = True
                 return up_path
             else:
                 dl_path = await self.decompress_zst(dl_path)
@@ -672,12 +728,10 @@ class TaskConfig:
                     del cmd[2]
                 if self.is_cancelled:
                     return ""
-                async with subprocess_lock:
-                    self.subproc = await create_subprocess_exec(*cmd, stderr=PIPE)
-                _, stderr = await self.subproc.communicate()
+                self.sevenz_progress = {dl_path: [await aiopath.getsize(dl_path), 0]}
+                code, stderr = await self.run_7z(cmd, dl_path)
                 if self.is_cancelled:
                     return ""
-                code = self.subproc.returncode
                 if code == -9:
                     self.is_cancelled = True
                     return ""
@@ -717,7 +771,7 @@ class TaskConfig:
             delete = True
         async with task_dict_lock:
             task_dict[self.mid] = SevenZStatus(self, gid, "Zip")
-        size = await get_path_size(dl_path)
+        size = await self.inventory.size(dl_path)
         if self.equal_splits:
             parts = -(-size // self.split_size)
             split_size = (size // parts) + (size % parts)
@@ -783,14 +837,63 @@ class TaskConfig:
             LOGGER.error(f"{stderr}. Unable to zip this path: {dl_path}")
             return dl_path
 
+    async def proceed_stream_compress(self, dl_path, o_files, ft_delete, volumes):
+        self.new_dir = f"{self.dir}10000"
+        await makedirs(self.new_dir, exist_ok=True)
+        up_path = f"{self.new_dir}/{self.name}.zip"
+        self.name = f"{self.name}.zip"
+        size = await self.inventory.size(dl_path)
+        if self.equal_splits:
+            parts = -(-size // self.split_size)
+            split_size = (size // parts) + (size % parts)
+        else:
+            split_size = self.split_size
+        LOGGER.info(f"Zip: orig_path: {dl_path}, zip_path: {up_path}.0*")
+
+        async def put_volume(path):
+            while volumes.full():
+                if self.is_cancelled:
+                    return
+                await sleep(1)
+            volumes.put_nowait(path)
+
+        try:
+            await sync_to_async(
+                write_zip_volumes,
+                dl_path,
+                up_path,
+                split_size,
+                lambda path: async_to_sync(put_volume, path),
+                self,
+                set(o_files),
+                tuple(f".{ext}".lower() for ext in self.extension_filter),
+            )
+        except Exception as e:
+            if not self.is_cancelled:
+                LOGGER.error(f"{e}. Unable to zip this path: {dl_path}")
+                self.is_cancelled = True
+                await self.on_upload_error(f"Unable to zip: {e}")
+            await put_volume(None)
+            return
+        if not self.seed:
+            await clean_target(dl_path)
+        for f in ft_delete:
+            if await aiopath.exists(f):
+                try:
+                    await remove(f)
+                except:
+                    pass
+        ft_delete.clear()
+        await put_volume(None)
+
     async def proceed_split(self, up_dir, m_size, o_files, gid):
         checked = False
-        for dirpath, _, files in await sync_to_async(walk, up_dir, topdown=False):
+        for dirpath, _, files in await self.inventory.walk(up_dir, topdown=False):
             for file_ in files:
                 f_path = ospath.join(dirpath, file_)
                 if f_path in o_files:
                     continue
-                f_size = await aiopath.getsize(f_path)
+                f_size = self.inventory.file_size(f_path)
                 if f_size > self.split_size:
                     if not checked:
                         checked = True
@@ -840,7 +943,7 @@ class TaskConfig:
         if await aiopath.isfile(dl_path):
             if (await get_document_type(dl_path))[0]:
                 checked = True
-                async with cpu_eater_lock:
+                async with cpu_pool.job(self, "Sample Video"):
                     LOGGER.info(f"Creating Sample video: {self.name}")
                     res = await create_sample_video(
                         self, dl_path, sample_duration, part_duration
@@ -855,7 +958,7 @@ class TaskConfig:
                         new_folder = new_folder.replace(self.dir, self.new_dir)
                         await makedirs(new_folder, exist_ok=True)
                         await gather(
-                            copy2(dl_path, f"{new_folder}/{name}"),
+                            clone_file(dl_path, f"{new_folder}/{name}"),
                             move(res, f"{new_folder}/SAMPLE.{name}"),
                         )
                     else:
@@ -866,7 +969,7 @@ class TaskConfig:
                         )
                     return new_folder
         else:
-            for dirpath, _, files in await sync_to_async(walk, dl_path, topdown=False):
+            for dirpath, _, files in await self.inventory.walk(dl_path, topdown=False):
                 for file_ in files:
                     f_path = ospath.join(dirpath, file_)
                     if f_path in unwanted_files:
@@ -874,11 +977,11 @@ class TaskConfig:
                     if (await get_document_type(f_path))[0]:
                         if not checked:
                             checked = True
-                            await cpu_eater_lock.acquire()
+                            await cpu_pool.acquire(self, "Sample Video")
                             LOGGER.info(f"Creating Sample videos: {self.name}")
                         if self.is_cancelled:
                             if checked:
-                                cpu_eater_lock.release()
+                                cpu_pool.release(self)
                             return ""
                         res = await create_sample_video(
                             self, f_path, sample_duration, part_duration
@@ -886,7 +989,7 @@ class TaskConfig:
                         if res:
                             ft_delete.append(res)
             if checked:
-                cpu_eater_lock.release()
+                cpu_pool.release(self)
 
         return dl_path
 
@@ -948,7 +1051,7 @@ class TaskConfig:
                     checked = True
                     async with task_dict_lock:
                         task_dict[self.mid] = FFmpegStatus(self, gid, "Convert")
-                    await cpu_eater_lock.acquire()
+                    await cpu_pool.acquire(self, "Convert")
                     LOGGER.info(f"Converting: {self.name}")
                 else:
                     LOGGER.info(f"Converting: {m_path}")
@@ -971,7 +1074,7 @@ class TaskConfig:
                     checked = True
                     async with task_dict_lock:
                         task_dict[self.mid] = FFmpegStatus(self, gid, "Convert")
-                    await cpu_eater_lock.acquire()
+                    await cpu_pool.acquire(self, "Convert")
                     LOGGER.info(f"Converting: {self.name}")
                 else:
                     LOGGER.info(f"Converting: {m_path}")
@@ -983,7 +1086,7 @@ class TaskConfig:
         if await aiopath.isfile(dl_path):
             output_file = await proceed_convert(dl_path)
             if checked:
-                cpu_eater_lock.release()
+                cpu_pool.release(self)
             if output_file:
                 if self.seed:
                     self.new_dir = f"{self.dir}10000"
@@ -998,18 +1101,18 @@ class TaskConfig:
                         pass
                     return output_file
         else:
-            for dirpath, _, files in await sync_to_async(walk, dl_path, topdown=False):
+            for dirpath, _, files in await self.inventory.walk(dl_path, topdown=False):
                 for file_ in files:
                     if self.is_cancelled:
                         if checked:
-                            cpu_eater_lock.release()
+                            cpu_pool.release(self)
                         return ""
                     f_path = ospath.join(dirpath, file_)
                     res = await proceed_convert(f_path)
                     if res:
                         if self.seed and not self.new_dir:
                             o_files.append(f_path)
-                            fsize = await aiopath.getsize(f_path)
+                            fsize = self.inventory.file_size(f_path)
                             m_size.append(fsize)
                             ft_delete.append(res)
                         else:
@@ -1018,7 +1121,7 @@ class TaskConfig:
                             except:
                                 pass
             if checked:
-                cpu_eater_lock.release()
+                cpu_pool.release(self)
         return dl_path
 
     async def generate_screenshots(self, dl_path):
@@ -1035,7 +1138,7 @@ class TaskConfig:
                         new_folder = new_folder.replace(self.dir, self.new_dir)
                         await makedirs(new_folder, exist_ok=True)
                         await gather(
-                            copy2(dl_path, f"{new_folder}/{name}"),
+                            clone_file(dl_path, f"{new_folder}/{name}"),
                             move(res, new_folder),
                         )
                     else:
@@ -1047,7 +1150,7 @@ class TaskConfig:
                     return new_folder
         else:
             LOGGER.info(f"Creating Screenshot for: {dl_path}")
-            for dirpath, _, files in await sync_to_async(walk, dl_path, topdown=False):
+            for dirpath, _, files in await self.inventory.walk(dl_path, topdown=False):
                 for file_ in files:
                     f_path = ospath.join(dirpath, file_)
                     if (await get_document_type(f_path))[0]:
@@ -1084,7 +1187,7 @@ class TaskConfig:
             await move(dl_path, new_path)
             return new_path
         else:
-            for dirpath, _, files in await sync_to_async(walk, dl_path, topdown=False):
+            for dirpath, _, files in await self.inventory.walk(dl_path, topdown=False):
                 for file_ in files:
                     f_path = ospath.join(dirpath, file_)
                     for substitution in self.name_sub:
@@ -1159,19 +1262,19 @@ class TaskConfig:
                     checked = True
                     async with task_dict_lock:
                         task_dict[self.mid] = FFmpegStatus(self, gid, "FFmpeg")
-                    await cpu_eater_lock.acquire()
+                    await cpu_pool.acquire(self, "FFmpeg")
                 LOGGER.info(f"Running ffmpeg cmd for: {file_path}")
                 cmd[index + 1] = file_path
                 res = await run_ffmpeg_cmd(self, cmd, file_path)
                 if res and delete_files:
                     await remove(file_path)
             else:
-                for dirpath, _, files in await sync_to_async(
-                    walk, dl_path, topdown=False
+                for dirpath, _, files in await self.inventory.walk(
+                    dl_path, topdown=False
                 ):
                     for file_ in files:
                         if self.is_cancelled:
-                            cpu_eater_lock.release()
+                            cpu_pool.release(self)
                             return ""
                         f_path = ospath.join(dirpath, file_)
                         is_video, is_audio, _ = await get_document_type(f_path)
@@ -1188,11 +1291,11 @@ class TaskConfig:
                             checked = True
                             async with task_dict_lock:
                                 task_dict[self.mid] = FFmpegStatus(self, gid, "FFmpeg")
-                            await cpu_eater_lock.acquire()
+                            await cpu_pool.acquire(self, "FFmpeg")
                         LOGGER.info(f"Running ffmpeg cmd for: {f_path}")
                         res = await run_ffmpeg_cmd(self, cmd, f_path)
                         if res and delete_files:
                             await remove(f_path)
         if checked:
-            cpu_eater_lock.release()
+            cpu_pool.release(self)
         return dl_path
@@ -78,3 +78,17 @@ def get_hash_file(path: str) -> Optional[str]:
         logging.error(f"Failed to parse .torrent '{path}': {e}")
         return None
       
+
+
+def get_torrent_size(path: str) -> Optional[int]:
+    """
+    Total payload size of a .torrent file, summed over its files.
+    """
+    if not Torrent:
+        return None
+
+    try:
+        return Torrent.from_file(path).total_size or None
+    except Exception as e:
+        logging.error(f"Failed to read size of .torrent '{path}': {e}")
+        return None
@@ -1,6 +1,8 @@
 from aiofiles import open as aiopen
 from aiofiles.os import remove
 
+from ..telegram_helper.rate_limiter import tg_limit
+
 
 def filter_links(links_list: list, bulk_start: int, bulk_end: int) -> list:
     if bulk_start != 0 and bulk_end != 0:
@@ -19,7 +21,8 @@ def get_links_from_message(text: str) -> list:
 
 async def get_links_from_file(message) -> list:
     links_list = []
-    text_file_dir = await message.download()
+    async with tg_limit(message._client, "download"):
+        text_file_dir = await message.download()
     async with aiopen(text_file_dir, "r+") as f:
         lines = await f.readlines()
         links_list.extend(line.strip() for line in lines if len(line) != 0)
@@ -3,8 +3,10 @@ from aiofiles.os import path as aiopath, makedirs
 from dotenv import dotenv_values
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.server_api import ServerApi
-from pymongo.errors import PyMongoError
+from pymongo.errors import PyMongoError, CollectionInvalid
 from datetime import datetime
+from functools import wraps
+from inspect import iscoroutinefunction
 import os
 import re
 from bot import (
@@ -16,10 +18,17 @@ from bot import (
     aria2_options,
     qbit_options,
 )
+from .metrics import inc, timed
 import logging
 
 LOGGER = logging.getLogger(__name__)
 
+
+def _catalog_check(found):
+    inc("mltb_catalog_checks_total", result="hit" if found else "miss")
+    return found
+
+
 def sanitize_filename(filename):
     """Clean filename sanitization matching channel_leech.py exactly"""
     if not filename:
@@ -84,6 +93,7 @@ class DbManager:
         self._return = False
         self._db = None
         self._conn = None
+        self._perf_capped = False
 
     async def connect(self):
         try:
@@ -289,6 +299,48 @@ class DbManager:
         await self._db.tasks[BOT_ID].drop()
         return notifier_dict
 
+    async def add_queued_task(self, key, entry):
+        if self._return:
+            return
+        await self._db.queue[BOT_ID].update_one(
+            {"_id": key},
+            {"$set": entry, "$setOnInsert": {"seq": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def rm_queued_task(self, key):
+        if self._return:
+            return
+        await self._db.queue[BOT_ID].delete_one({"_id": key})
+
+    async def get_queued_tasks(self):
+        if self._return:
+            return []
+        rows = self._db.queue[BOT_ID].find({}).sort([("priority", 1), ("seq", 1)])
+        return [row async for row in rows]
+
+    async def add_task_timeline(self, entry):
+        if self._return:
+            return
+        if not self._perf_capped:
+            try:
+                await self._db.create_collection(
+                    f"perf.{BOT_ID}",
+                    capped=True,
+                    size=config_dict["PERF_HISTORY"] * 4096,
+                    max=config_dict["PERF_HISTORY"],
+                )
+            except CollectionInvalid:
+                pass
+            self._perf_capped = True
+        await self._db.perf[BOT_ID].insert_one(entry)
+
+    async def get_task_timelines(self, since):
+        if self._return:
+            return []
+        rows = self._db.perf[BOT_ID].find({"time": {"$gte": since}}, {"_id": 0})
+        return [row async for row in rows]
+
     async def trunc_table(self, name):
         if self._return:
             return
@@ -390,21 +442,21 @@ class DbManager:
                                 query = {field: {"$regex": f"^{re.escape(pattern)}$", "$options": "i"}}
                                 result = await self._db.file_catalog.find_one(query, {"_id": 1})
                                 if result:
-                                    return True
+                                    return _catalog_check(True)
             
             # Check by file_unique_id
             if file_unique_id:
                 result = await self._db.file_catalog.find_one({"file_unique_id": file_unique_id}, {"_id": 1})
                 if result:
-                    return True
+                    return _catalog_check(True)
             
             # Check by file_hash
             if file_hash:
                 result = await self._db.file_catalog.find_one({"file_hash": file_hash}, {"_id": 1})
                 if result:
-                    return True
+                    return _catalog_check(True)
             
-            return False
+            return _catalog_check(False)
             
         except PyMongoError as e:
             LOGGER.error(f"Error checking file exists: {e}")
@@ -468,6 +520,15 @@ class DbManager:
                 if 'sanitized_name' in doc:
                     existing.add(doc['sanitized_name'])
             
+            hits = sum(
+                any(
+                    file_info.get(key) in existing
+                    for key in ('file_unique_id', 'file_hash', 'sanitized_name')
+                )
+                for file_info in file_infos_list
+            )
+            inc("mltb_catalog_checks_total", hits, result="hit")
+            inc("mltb_catalog_checks_total", len(file_infos_list) - hits, result="miss")
             return existing
             
         except PyMongoError as e:
@@ -639,4 +700,20 @@ class DbManager:
     def _return(self, v):
         self.__dict__["__return"] = v
 
+
+def _timed_op(name, method):
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self._return:
+            return await method(self, *args, **kwargs)
+        with timed("mltb_mongo_op_seconds", op=name):
+            return await method(self, *args, **kwargs)
+
+    return wrapper
+
+
+for _name, _method in list(vars(DbManager).items()):
+    if iscoroutinefunction(_method) and not _name.startswith("_"):
+        setattr(DbManager, _name, _timed_op(_name, _method))
+
 database = DbManager()
@@ -0,0 +1,87 @@
+from aria2p import Download
+from qbittorrentapi import TorrentDictionary
+from threading import Lock
+from time import time
+
+from bot import aria2, qbittorrent_client, config_dict, LOGGER
+
+KEY_EXPIRY = 60
+
+
+class EngineCache:
+    # Serves every status object and listener from one bulk engine request
+    # per ENGINE_POLL_INTERVAL. Keys are what callers asked for recently, so
+    # engines that need explicit ids only poll live tasks.
+    def __init__(self, name, fetch):
+        self._name = name
+        self._fetch = fetch
+        self._lock = Lock()
+        self._keys = {}
+        self._data = {}
+        self._time = 0
+
+    def _refresh(self, now):
+        self._keys = {k: t for k, t in self._keys.items() if now - t < KEY_EXPIRY}
+        try:
+            self._data = self._fetch(list(self._keys))
+        except Exception as e:
+            LOGGER.error(f"{e}: {self._name}, while refreshing engine cache")
+        self._time = now
+
+    def get(self, key=None):
+        with self._lock:
+            now = time()
+            stale = now - self._time >= config_dict["ENGINE_POLL_INTERVAL"]
+            if key is not None:
+                stale = stale or key not in self._keys
+                self._keys[key] = now
+            if stale:
+                self._refresh(now)
+            return self._data if key is None else self._data.get(key)
+
+    def invalidate(self):
+        self._time = 0
+
+
+class _TorrentMirror:
+    # Local copy of qBittorrent's torrent list kept in sync with the rid based
+    # sync/maindata API, so each poll only transfers torrents that changed.
+    def __init__(self):
+        self._rid = 0
+        self._torrents = {}
+
+    def __call__(self, _):
+        try:
+            data = qbittorrent_client.sync_maindata(rid=self._rid)
+        except Exception:
+            self._rid = 0
+            raise
+        torrents = {} if data.get("full_update") else dict(self._torrents)
+        for hash_, fields in (data.get("torrents") or {}).items():
+            if tor := torrents.get(hash_):
+                fields = {**tor, **fields}
+            torrents[hash_] = TorrentDictionary(
+                {**fields, "hash": hash_}, client=qbittorrent_client
+            )
+        for hash_ in data.get("torrents_removed") or []:
+            torrents.pop(hash_, None)
+        self._rid = data.get("rid", 0)
+        self._torrents = torrents
+        return torrents
+
+
+def fetch_downloads(gids):
+    if not gids:
+        return {}
+    results = aria2.client.multicall2(
+        [(aria2.client.TELL_STATUS, [gid]) for gid in gids]
+    )
+    return {
+        gid: Download(aria2, res[0])
+        for gid, res in zip(gids, results)
+        if isinstance(res, list)
+    }
+
+
+qb_cache = EngineCache("Qbittorrent", _TorrentMirror())
+aria2_cache = EngineCache("Aria2c", fetch_downloads)
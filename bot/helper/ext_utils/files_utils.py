@@ -1,16 +1,41 @@
 from aiofiles.os import remove, path as aiopath, listdir, rmdir
+from asyncio import Semaphore, gather
 from aioshutil import rmtree as aiormtree
+from fcntl import ioctl
+from functools import lru_cache
 from magic import Magic
-from os import walk, path as ospath, makedirs
+from os import (
+    walk,
+    path as ospath,
+    makedirs,
+    stat,
+    major,
+    minor,
+    cpu_count,
+    link,
+    lseek,
+    sendfile,
+    copy_file_range,
+    remove as osremove,
+    scandir,
+    posix_fallocate,
+    SEEK_SET,
+)
 from re import split as re_split, I, search as re_search, escape
-from shutil import rmtree
+from shutil import rmtree, copystat
 from subprocess import run as srun
 from sys import exit
+from threading import Lock
+from zstandard import ZstdDecompressor
 
-from bot import aria2, LOGGER, DOWNLOAD_DIR, qbittorrent_client
-from .bot_utils import sync_to_async, cmd_exec
+from bot import aria2, LOGGER, DOWNLOAD_DIR, qbittorrent_client, config_dict
+from .bot_utils import sync_to_async
 from .exceptions import NotSupportedExtractionArchive
 
+FICLONE = 0x40049409
+ZSTD_BUFFER = 4194304
+ARCHIVE_SIGNATURES = (b"7z\xbc\xaf\x27\x1c", b"PK\x03\x04", b"PK\x07\x08")
+
 ARCH_EXT = [
     ".tar.bz2",
     ".tar.gz",
@@ -113,11 +138,17 @@ def exit_clean_up(signal, frame):
         exit(1)
 
 
-async def clean_unwanted(path, custom_list=None):
+async def walk_path(path, topdown=True, inventory=None):
+    if inventory is not None:
+        return await inventory.walk(path, topdown)
+    return await sync_to_async(walk, path, topdown=topdown)
+
+
+async def clean_unwanted(path, custom_list=None, inventory=None):
     if custom_list is None:
         custom_list = []
     LOGGER.info(f"Cleaning unwanted files/folders: {path}")
-    for dirpath, _, files in await sync_to_async(walk, path, topdown=False):
+    for dirpath, _, files in await walk_path(path, False, inventory):
         for filee in files:
             f_path = ospath.join(dirpath, filee)
             if (
@@ -129,7 +160,7 @@ async def clean_unwanted(path, custom_list=None):
                 await remove(f_path)
         if dirpath.endswith((".unwanted", "splited_files_mltb", "copied_mltb")):
             await aiormtree(dirpath, ignore_errors=True)
-    for dirpath, _, files in await sync_to_async(walk, path, topdown=False):
+    for dirpath, _, files in await walk_path(path, False, inventory):
         if not await listdir(dirpath):
             await rmdir(dirpath)
 
@@ -145,12 +176,101 @@ async def get_path_size(path):
     return total_size
 
 
-async def count_files_and_folders(path, extension_filter, unwanted_files=None):
+class FileInventory:
+    # Task-scoped view of the download tree built with scandir. Every lookup
+    # re-stats only the directories: a changed mtime means files were added,
+    # renamed or removed there, so only that directory is scanned again.
+    def __init__(self):
+        self._dirs = {}
+        self._lock = Lock()
+
+    def _drop(self, dirpath):
+        if entry := self._dirs.pop(dirpath, None):
+            for name in entry["dirs"]:
+                self._drop(ospath.join(dirpath, name))
+
+    def _sync(self, dirpath):
+        try:
+            mtime = stat(dirpath).st_mtime_ns
+        except OSError:
+            self._drop(dirpath)
+            return False
+        entry = self._dirs.get(dirpath)
+        if entry is None or entry["mtime"] != mtime:
+            dirs = {}
+            files = {}
+            with scandir(dirpath) as it:
+                for item in it:
+                    try:
+                        if item.is_dir():
+                            dirs[item.name] = item.is_symlink()
+                        else:
+                            fstat = item.stat()
+                            files[item.name] = (fstat.st_size, fstat.st_mtime)
+                    except OSError:
+                        files[item.name] = (0, 0)
+            if entry is not None:
+                for name in entry["dirs"]:
+                    if name not in dirs:
+                        self._drop(ospath.join(dirpath, name))
+            entry = {"mtime": mtime, "dirs": dirs, "files": files}
+            self._dirs[dirpath] = entry
+        for name, is_link in entry["dirs"].items():
+            if not is_link:
+                self._sync(ospath.join(dirpath, name))
+        return True
+
+    def _collect(self, dirpath, topdown, result):
+        if (entry := self._dirs.get(dirpath)) is None:
+            return
+        item = (dirpath, list(entry["dirs"]), list(entry["files"]))
+        if topdown:
+            result.append(item)
+        for name in item[1]:
+            self._collect(ospath.join(dirpath, name), topdown, result)
+        if not topdown:
+            result.append(item)
+
+    def _walk(self, path, topdown):
+        result = []
+        with self._lock:
+            if self._sync(path):
+                self._collect(path, topdown, result)
+        return result
+
+    def _size(self, path):
+        if not ospath.isdir(path):
+            return self.file_size(path)
+        return sum(
+            self.file_size(ospath.join(dirpath, f))
+            for dirpath, _, files in self._walk(path, True)
+            for f in files
+        )
+
+    def file_size(self, path):
+        dirpath, name = ospath.split(path)
+        if (entry := self._dirs.get(dirpath)) and name in entry["files"]:
+            return entry["files"][name][0]
+        try:
+            return ospath.getsize(path)
+        except OSError:
+            return 0
+
+    async def walk(self, path, topdown=True):
+        return await sync_to_async(self._walk, path, topdown)
+
+    async def size(self, path):
+        return await sync_to_async(self._size, path)
+
+
+async def count_files_and_folders(
+    path, extension_filter, unwanted_files=None, inventory=None
+):
     if unwanted_files is None:
         unwanted_files = []
     total_files = 0
     total_folders = 0
-    for dirpath, dirs, files in await sync_to_async(walk, path):
+    for dirpath, dirs, files in await walk_path(path, True, inventory):
         total_files += len(files)
         for f in files:
             if f.endswith(tuple(extension_filter)):
@@ -171,6 +291,86 @@ def get_base_name(orig_path):
         raise NotSupportedExtractionArchive("File format not supported for extraction")
 
 
+@lru_cache(maxsize=8)
+def is_rotational_disk(path):
+    try:
+        dev = stat(path).st_dev
+        block = f"/sys/dev/block/{major(dev)}:{minor(dev)}"
+        for queue in [f"{block}/queue", f"{block}/../queue"]:
+            if ospath.exists(f"{queue}/rotational"):
+                with open(f"{queue}/rotational") as f:
+                    return f.read().strip() == "1"
+    except Exception as e:
+        LOGGER.error(f"Unable to detect disk type of {path}. Error: {e}")
+    return None
+
+
+def get_io_workers():
+    if workers := config_dict["IO_WORKERS"]:
+        return workers
+    rotational = is_rotational_disk(DOWNLOAD_DIR)
+    if rotational:
+        return 1
+    return max(1, min((cpu_count() or 1) // 2, 4 if rotational is False else 2))
+
+
+copy_stats = {"reflink": 0, "hardlink": 0, "copy": 0, "copied_bytes": 0}
+
+
+def _copy_fd(ifd, ofd, size, out_offset=0):
+    offset = 0
+    use_range = True
+    while offset < size:
+        if use_range:
+            try:
+                sent = copy_file_range(
+                    ifd, ofd, size - offset, offset, out_offset + offset
+                )
+            except OSError:
+                use_range = False
+                lseek(ofd, out_offset + offset, SEEK_SET)
+                continue
+        else:
+            sent = sendfile(ofd, ifd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+    return offset
+
+
+def _clone_file(src, dst, hardlink):
+    if ospath.isdir(dst):
+        dst = ospath.join(dst, ospath.basename(src))
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            copy_stats["reflink"] += 1
+            return dst
+        except OSError:
+            pass
+    if hardlink:
+        try:
+            osremove(dst)
+            link(src, dst)
+            copy_stats["hardlink"] += 1
+            return dst
+        except OSError:
+            pass
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        offset = _copy_fd(fsrc.fileno(), fdst.fileno(), stat(fsrc.fileno()).st_size)
+    copystat(src, dst)
+    copy_stats["copy"] += 1
+    copy_stats["copied_bytes"] += offset
+    LOGGER.info(f"No reflink support, copied {offset} bytes to {dst}")
+    return dst
+
+
+async def clone_file(src, dst, hardlink=True):
+    # Seed copies: share blocks with FICLONE when the filesystem allows it, or
+    # hardlink when the caller won't modify dst, and only then copy the data.
+    return await sync_to_async(_clone_file, src, dst, hardlink)
+
+
 def get_mime_type(file_path):
     mime = Magic(mime=True)
     mime_type = mime.from_file(file_path)
@@ -178,25 +378,73 @@ def get_mime_type(file_path):
     return mime_type
 
 
+def zstd_decompress(src, dst, progress, listener):
+    size = ospath.getsize(src) or 1
+    dctx = ZstdDecompressor(max_window_size=2147483648)
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        reader = dctx.stream_reader(
+            fsrc, read_size=ZSTD_BUFFER, read_across_frames=True
+        )
+        while chunk := reader.read(ZSTD_BUFFER):
+            if listener.is_cancelled:
+                raise InterruptedError("Decompression cancelled")
+            fdst.write(chunk)
+            progress[1] = fsrc.tell() / size * 100
+
+
+def _is_archive_volume(path):
+    with open(path, "rb") as f:
+        return f.read(6).startswith(ARCHIVE_SIGNATURES)
+
+
+def _join_parts(fpath, parts):
+    sizes = [ospath.getsize(part) for part in parts]
+    total = sum(sizes)
+    written = 0
+    with open(fpath, "wb") as fdst:
+        try:
+            posix_fallocate(fdst.fileno(), 0, total)
+        except OSError:
+            pass
+        for part, size in zip(parts, sizes):
+            with open(part, "rb") as fsrc:
+                written += _copy_fd(fsrc.fileno(), fdst.fileno(), size, written)
+    if written != total or ospath.getsize(fpath) != total:
+        raise OSError(f"Joined size {written} doesn't match parts size {total}")
+
+
 async def join_files(path):
     files = await listdir(path)
     results = []
     exists = False
-    for file_ in files:
-        if re_search(r"\.0+2$", file_) and await sync_to_async(
-            get_mime_type, f"{path}/{file_}"
-        ) not in ["application/x-7z-compressed", "application/zip"]:
-            exists = True
-            final_name = file_.rsplit(".", 1)[0]
-            fpath = f"{path}/{final_name}"
-            cmd = f'cat "{fpath}."* > "{fpath}"'
-            _, stderr, code = await cmd_exec(cmd, True)
-            if code != 0:
-                LOGGER.error(f"Failed to join {final_name}, stderr: {stderr}")
+    semaphore = Semaphore(get_io_workers())
+
+    async def join_set(final_name):
+        parts = sorted(
+            (f for f in files if re_search(rf"^{escape(final_name)}\.\d+$", f)),
+            key=lambda f: int(f.rsplit(".", 1)[1]),
+        )
+        fpath = f"{path}/{final_name}"
+        async with semaphore:
+            try:
+                await sync_to_async(
+                    _join_parts, fpath, [f"{path}/{part}" for part in parts]
+                )
+            except Exception as e:
+                LOGGER.error(f"Failed to join {final_name}, error: {e}")
                 if await aiopath.isfile(fpath):
                     await remove(fpath)
-            else:
-                results.append(final_name)
+                return
+        results.append(final_name)
+
+    sets = []
+    for file_ in files:
+        if re_search(r"\.0+2$", file_) and not await sync_to_async(
+            _is_archive_volume, f"{path}/{file_}"
+        ):
+            exists = True
+            sets.append(file_.rsplit(".", 1)[0])
+    await gather(*(join_set(final_name) for final_name in sets))
 
     if not exists:
         LOGGER.warning("No files to join!")
@@ -0,0 +1,32 @@
+from asyncio import start_server
+
+from bot import LOGGER
+
+
+async def serve(host, port, route):
+    # Minimal HTTP/1.1 GET server for in-process endpoints. route(path)
+    # returns the body, or None for 404.
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            parts = request.split()
+            path = parts[1].decode() if len(parts) > 1 else ""
+            if (body := await route(path)) is None:
+                body, head = "Not Found\n", "404 Not Found"
+            else:
+                head = "200 OK"
+            body = body.encode()
+            writer.write(
+                f"HTTP/1.1 {head}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except Exception as e:
+            LOGGER.error(f"Local server request failed on port {port}: {e}")
+        finally:
+            writer.close()
+
+    return await start_server(handle, host, port)
@@ -1,16 +1,102 @@
 from PIL import Image
-from aiofiles.os import remove, path as aiopath, makedirs
-from asyncio import create_subprocess_exec, gather, wait_for, subprocess
+from aiofiles.os import remove, path as aiopath, makedirs, stat as aiostat
+from asyncio import create_subprocess_exec, gather, wait_for, subprocess, Semaphore
 from asyncio.subprocess import PIPE
 from os import path as ospath, cpu_count
-from re import search as re_search, escape
+from re import search as re_search
 from time import time
 from aioshutil import rmtree
 import json
 
 from bot import LOGGER, subprocess_lock, DOWNLOAD_DIR
 from .bot_utils import cmd_exec, sync_to_async
-from .files_utils import ARCH_EXT, get_mime_type
+from .files_utils import ARCH_EXT, get_mime_type, get_io_workers
+from .thumb_cache import get_cached_thumb, cache_thumb
+from ..telegram_helper.rate_limiter import tg_limit
+
+_keyframes_cache = {}
+
+
+class FFProgress:
+    def __init__(self):
+        self.reset()
+
+    def reset(self, total_time=0):
+        self.total_time = total_time
+        self.processed_time = 0
+        self.processed_bytes = 0
+        self.start_time = time()
+        self._rates = {}
+
+    @property
+    def time_rate(self):
+        # Parallel split parts each report their own speed, so the task runs
+        # at their sum.
+        return round(sum(self._rates.values()), 2)
+
+    @property
+    def speed_raw(self):
+        try:
+            return self.processed_bytes / (time() - self.start_time)
+        except ZeroDivisionError:
+            return 0
+
+    @property
+    def progress_raw(self):
+        try:
+            return min(self.processed_time / self.total_time * 100, 100)
+        except ZeroDivisionError:
+            return 0
+
+    @property
+    def eta_raw(self):
+        try:
+            return (self.total_time - self.processed_time) / self.time_rate
+        except ZeroDivisionError:
+            return 0
+
+    async def watch(self, stream):
+        rates = self._rates
+        try:
+            await self._watch(stream, rates)
+        finally:
+            rates.pop(stream, None)
+
+    async def _watch(self, stream, rates):
+        last_size = 0
+        last_time = 0
+        async for line in stream:
+            key, _, value = line.decode(errors="ignore").strip().partition("=")
+            if not value or value == "N/A":
+                continue
+            try:
+                if key == "total_size":
+                    self.processed_bytes += int(value) - last_size
+                    last_size = int(value)
+                elif key == "out_time_ms":
+                    out_time = max(int(value) / 1000000, 0)
+                    self.processed_time += out_time - last_time
+                    last_time = out_time
+                elif key == "speed":
+                    rates[stream] = float(value.rstrip("x"))
+            except ValueError:
+                continue
+
+
+async def ffmpeg_exec(listener, cmd, total_time=None):
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    if total_time is not None:
+        listener.ffprogress.reset(total_time)
+    async with subprocess_lock:
+        listener.subproc = await create_subprocess_exec(
+            *cmd, stdout=PIPE, stderr=PIPE
+        )
+    _, stderr = await gather(
+        listener.ffprogress.watch(listener.subproc.stdout),
+        listener.subproc.stderr.read(),
+    )
+    await listener.subproc.wait()
+    return stderr
 
 # New function added to get detailed media info using ffprobe
 async def get_detailed_media_streams_info(file_path: str) -> dict:
@@ -117,9 +203,8 @@ async def convert_video(listener, video_file, ext, retry=False):
         ]
     if listener.is_cancelled:
         return False
-    async with subprocess_lock:
-        listener.subproc = await create_subprocess_exec(*cmd, stderr=PIPE)
-    _, stderr = await listener.subproc.communicate()
+    duration = (await get_media_info(video_file))[0]
+    stderr = await ffmpeg_exec(listener, cmd, duration)
     if listener.is_cancelled:
         return False
     code = listener.subproc.returncode
@@ -160,9 +245,8 @@ async def convert_audio(listener, audio_file, ext):
     ]
     if listener.is_cancelled:
         return False
-    async with subprocess_lock:
-        listener.subproc = await create_subprocess_exec(*cmd, stderr=PIPE)
-    _, stderr = await listener.subproc.communicate()
+    duration = (await get_media_info(audio_file))[0]
+    stderr = await ffmpeg_exec(listener, cmd, duration)
     if listener.is_cancelled:
         return False
     code = listener.subproc.returncode
@@ -191,7 +275,8 @@ async def create_thumb(msg, _id=""):
     else:
         path = "Thumbnails"
     await makedirs(path, exist_ok=True)
-    photo_dir = await msg.download()
+    async with tg_limit(msg._client, "download"):
+        photo_dir = await msg.download()
     output = ospath.join(path, f"{_id}.jpg")
     await sync_to_async(Image.open(photo_dir).convert("RGB").save, output, "JPEG")
     await remove(photo_dir)
@@ -308,61 +393,125 @@ async def get_document_type(path):
     return is_video, is_audio, is_image
 
 
-async def take_ss(video_file, ss_nb) -> bool:
+def get_ss_timeout(duration, ss_nb):
+    return min(60 + ss_nb * 5 + duration // 60, 600)
+
+
+async def extract_frames(video_file, ss_nb, layout="", keep_screenshots=True):
+    dirpath, name = video_file.rsplit("/", 1)
+    name, _ = ospath.splitext(name)
+    dirpath = f"{dirpath}/{name}_mltbss"
+    output = None
+    if layout:
+        output_dir = f"{DOWNLOAD_DIR}Thumbnails"
+        await makedirs(output_dir, exist_ok=True)
+        output = ospath.join(output_dir, f"{time()}.jpg")
+    cached_ss = keep_screenshots and await get_cached_thumb(
+        video_file, f"ss:{ss_nb}", dirpath
+    )
+    cached_tile = layout and await get_cached_thumb(
+        video_file, f"tile:{layout}", output
+    )
+    if (cached_ss or not keep_screenshots) and (cached_tile or not layout):
+        return (dirpath if keep_screenshots else None), output
     duration = (await get_media_info(video_file))[0]
-    if duration != 0:
-        dirpath, name = video_file.rsplit("/", 1)
-        name, _ = ospath.splitext(name)
-        dirpath = f"{dirpath}/{name}_mltbss"
+    if duration == 0:
+        LOGGER.error("extract_frames: Can't get the duration of video")
+        if cached_tile:
+            await remove(output)
+        return None, None
+    if keep_screenshots and not cached_ss:
         await makedirs(dirpath, exist_ok=True)
-        interval = duration // (ss_nb + 1)
-        cap_time = interval
-        cmds = []
+    else:
+        dirpath = None
+    if cached_tile:
+        output = None
+    interval = duration // (ss_nb + 1)
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    filters = []
+    for i in range(ss_nb):
+        cmd.extend(["-ss", f"{interval * (i + 1)}", "-i", video_file])
+        if dirpath and output:
+            filters.append(f"[{i}:v:0]trim=end_frame=1,split=2[s{i}][t{i}]")
+        elif dirpath:
+            filters.append(f"[{i}:v:0]trim=end_frame=1[s{i}]")
+        else:
+            filters.append(f"[{i}:v:0]trim=end_frame=1[t{i}]")
+    if output:
+        tiles = "".join(f"[t{i}]" for i in range(ss_nb))
+        filters.append(f"{tiles}concat=n={ss_nb}:v=1:a=0,tile={layout}[tile]")
+    cmd.extend(["-filter_complex", ";".join(filters)])
+    if dirpath:
         for i in range(ss_nb):
-            output = f"{dirpath}/SS.{name}_{i:02}.png"
-            cmd = [
-                "ffmpeg",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-ss",
-                f"{cap_time}",
-                "-i",
-                video_file,
+            cmd.extend(
+                [
+                    "-map",
+                    f"[s{i}]",
+                    "-q:v",
+                    "1",
+                    "-frames:v",
+                    "1",
+                    f"{dirpath}/SS.{name}_{i:02}.png",
+                ]
+            )
+    if output:
+        cmd.extend(
+            [
+                "-map",
+                "[tile]",
                 "-q:v",
                 "1",
                 "-frames:v",
                 "1",
-                "-threads",
-                f"{cpu_count() // 2}",
+                "-f",
+                "mjpeg",
                 output,
             ]
-            cap_time += interval
-            cmds.append(cmd_exec(cmd))
-        try:
-            resutls = await wait_for(gather(*cmds), timeout=60)
-            if resutls[0][2] != 0:
-                LOGGER.error(
-                    f"Error while creating sreenshots from video. Path: {video_file}. stderr: {resutls[0][1]}"
-                )
-                await rmtree(dirpath, ignore_errors=True)
-                return False
-        except:
+        )
+    try:
+        _, err, code = await wait_for(
+            cmd_exec(cmd), timeout=get_ss_timeout(duration, ss_nb)
+        )
+        if code != 0 or output and not await aiopath.exists(output):
             LOGGER.error(
-                f"Error while creating sreenshots from video. Path: {video_file}. Error: Timeout some issues with ffmpeg with specific arch!"
+                f"Error while extracting frames from video. Path: {video_file}. stderr: {err}"
             )
+            if dirpath:
+                await rmtree(dirpath, ignore_errors=True)
+            if output and await aiopath.exists(output):
+                await remove(output)
+            return None, None
+    except:
+        LOGGER.error(
+            f"Error while extracting frames from video. Path: {video_file}. Error: Timeout some issues with ffmpeg with specific arch!"
+        )
+        if dirpath:
             await rmtree(dirpath, ignore_errors=True)
-            return False
-        return dirpath
-    else:
-        LOGGER.error("take_ss: Can't get the duration of video")
-        return False
+        if output and await aiopath.exists(output):
+            await remove(output)
+        return None, None
+    if dirpath:
+        await cache_thumb(video_file, f"ss:{ss_nb}", dirpath)
+    if output:
+        await cache_thumb(video_file, f"tile:{layout}", output)
+    if cached_ss:
+        dirpath = cached_ss
+    if cached_tile:
+        output = cached_tile
+    return dirpath, output
+
+
+async def take_ss(video_file, ss_nb) -> bool:
+    dirpath, _ = await extract_frames(video_file, ss_nb)
+    return dirpath or False
 
 
 async def get_audio_thumbnail(audio_file):
     output_dir = f"{DOWNLOAD_DIR}Thumbnails"
     await makedirs(output_dir, exist_ok=True)
     output = ospath.join(output_dir, f"{time()}.jpg")
+    if await get_cached_thumb(audio_file, "audio", output):
+        return output
     cmd = [
         "ffmpeg",
         "-hide_banner",
@@ -383,6 +532,7 @@ async def get_audio_thumbnail(audio_file):
             f"Error while extracting thumbnail from audio. Name: {audio_file} stderr: {err}"
         )
         return None
+    await cache_thumb(audio_file, "audio", output)
     return output
 
 
@@ -390,6 +540,8 @@ async def get_video_thumbnail(video_file, duration):
     output_dir = f"{DOWNLOAD_DIR}Thumbnails"
     await makedirs(output_dir, exist_ok=True)
     output = ospath.join(output_dir, f"{time()}.jpg")
+    if await get_cached_thumb(video_file, "video", output):
+        return output
     if duration is None:
         duration = (await get_media_info(video_file))[0]
     if duration == 0:
@@ -426,55 +578,247 @@ async def get_video_thumbnail(video_file, duration):
             f"Error while extracting thumbnail from video. Name: {video_file}. Error: Timeout some issues with ffmpeg with specific arch!"
         )
         return None
+    await cache_thumb(video_file, "video", output)
     return output
 
 
 async def get_multiple_frames_thumbnail(video_file, layout, keep_screenshots):
     ss_nb = layout.split("x")
     ss_nb = int(ss_nb[0]) * int(ss_nb[1])
-    dirpath = await take_ss(video_file, ss_nb)
-    if not dirpath:
+    _, output = await extract_frames(video_file, ss_nb, layout, keep_screenshots)
+    return output
+
+
+async def get_keyframes_index(path, listener):
+    try:
+        fstat = await aiostat(path)
+    except Exception as e:
+        LOGGER.error(f"Get Keyframes Index: {e}. Mostly File not found! - File: {path}")
         return None
-    output_dir = f"{DOWNLOAD_DIR}Thumbnails"
-    await makedirs(output_dir, exist_ok=True)
-    output = ospath.join(output_dir, f"{time()}.jpg")
+    key = (fstat.st_size, fstat.st_mtime)
+    if path in _keyframes_cache and _keyframes_cache[path][0] == key:
+        return _keyframes_cache[path][1]
     cmd = [
-        "ffmpeg",
+        "ffprobe",
         "-hide_banner",
         "-loglevel",
         "error",
-        "-pattern_type",
-        "glob",
-        "-i",
-        f"{escape(dirpath)}/*.png",
-        "-vf",
-        f"tile={layout}, thumbnail",
-        "-q:v",
-        "1",
-        "-frames:v",
-        "1",
-        "-f",
-        "mjpeg",
-        "-threads",
-        f"{cpu_count() // 2}",
-        output,
+        "-show_entries",
+        "packet=codec_type,stream_index,pts_time,size,flags",
+        "-of",
+        "compact=p=0",
+        path,
     ]
-    try:
-        _, err, code = await wait_for(cmd_exec(cmd), timeout=60)
-        if code != 0 or not await aiopath.exists(output):
-            LOGGER.error(
-                f"Error while combining thumbnails for video. Name: {video_file} stderr: {err}"
-            )
+    if listener.is_cancelled:
+        return None
+    async with subprocess_lock:
+        listener.subproc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
+    keyframes = {}
+    packets = {}
+    offset = 0
+    async for line in listener.subproc.stdout:
+        fields = dict(
+            field.split("=", 1)
+            for field in line.decode(errors="ignore").strip().split("|")
+            if "=" in field
+        )
+        try:
+            size = int(fields["size"])
+        except (KeyError, ValueError):
+            continue
+        if fields.get("codec_type") == "video":
+            stream = fields.get("stream_index")
+            packets[stream] = packets.get(stream, 0) + 1
+            if "K" in fields.get("flags", "") and fields.get("pts_time") not in [
+                None,
+                "N/A",
+            ]:
+                keyframes.setdefault(stream, []).append(
+                    (float(fields["pts_time"]), offset)
+                )
+        offset += size
+    _, stderr = await listener.subproc.communicate()
+    if listener.is_cancelled:
+        return None
+    if listener.subproc.returncode != 0 or not keyframes or offset == 0:
+        try:
+            stderr = stderr.decode().strip()
+        except:
+            stderr = "Unable to decode the error!"
+        LOGGER.error(f"{stderr}. Unable to read keyframes index. Path: {path}")
+        return None
+    video_stream = max(packets, key=packets.get)
+    ratio = fstat.st_size / offset
+    keyframes_index = sorted(
+        (pts, int(pos * ratio)) for pts, pos in keyframes.get(video_stream, [])
+    )
+    if len(_keyframes_cache) >= 16:
+        del _keyframes_cache[next(iter(_keyframes_cache))]
+    _keyframes_cache[path] = (key, keyframes_index)
+    return keyframes_index
+
+
+def plan_split_points(keyframes, total_size, part_size):
+    cuts = []
+    part_start = 0
+    last_fit = None
+    for pts, offset in keyframes:
+        if offset - part_start > part_size:
+            if last_fit is None:
+                return None
+            cuts.append(last_fit[0])
+            part_start = last_fit[1]
+            last_fit = None
+            if offset - part_start > part_size:
+                return None
+        if pts > 0 and offset > part_start:
+            last_fit = (pts, offset)
+    if total_size - part_start > part_size:
+        if last_fit is None or total_size - last_fit[1] > part_size:
             return None
-    except:
-        LOGGER.error(
-            f"Error while combining thumbnails from video. Name: {video_file}. Error: Timeout some issues with ffmpeg with specific arch!"
+        cuts.append(last_fit[0])
+    return cuts
+
+
+async def split_parts_concurrently(
+    path, dirpath, base_name, extension, cuts, listener, multi_streams, workers
+):
+    semaphore = Semaphore(workers)
+    results = []
+
+    async def extract_part(i, start, end):
+        out_path = f"{dirpath}/{base_name}.part{i:03}{extension}"
+        cmd = [
+            "ffmpeg",
+            "-progress",
+            "pipe:1",
+            "-nostats",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-ss",
+            f"{start:.3f}",
+            "-i",
+            path,
+            "-t",
+            f"{end - start - 0.001:.3f}" if end is not None else "",
+            "-map",
+            "0",
+            "-map_chapters",
+            "-1",
+            "-c",
+            "copy",
+            "-strict",
+            "-2",
+            "-avoid_negative_ts",
+            "make_zero",
+            "-fflags",
+            "+bitexact",
+            out_path,
+        ]
+        if not multi_streams:
+            del cmd[13]
+            del cmd[13]
+        if end is None:
+            del cmd[11]
+            del cmd[11]
+        async with semaphore:
+            if listener.is_cancelled or results:
+                return
+            async with subprocess_lock:
+                subproc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
+                listener.subprocs.append(subproc)
+            _, stderr = await gather(
+                listener.ffprogress.watch(subproc.stdout), subproc.stderr.read()
+            )
+            await subproc.wait()
+            listener.subprocs.remove(subproc)
+            if subproc.returncode != 0 and not results:
+                results.append((subproc.returncode, stderr))
+                async with subprocess_lock:
+                    for proc in listener.subprocs:
+                        if proc.returncode is None:
+                            proc.kill()
+
+    await gather(
+        *(
+            extract_part(i, start, end)
+            for i, (start, end) in enumerate(zip([0, *cuts], [*cuts, None]), start=1)
         )
+    )
+    return results[0] if results else (0, b"")
+
+
+async def split_video_by_keyframes(
+    path, size, dirpath, file_, split_size, listener, multi_streams
+):
+    keyframes = await get_keyframes_index(path, listener)
+    if listener.is_cancelled:
+        return False
+    if not keyframes:
         return None
-    finally:
-        if not keep_screenshots:
-            await rmtree(dirpath, ignore_errors=True)
-    return output
+    cuts = plan_split_points(keyframes, size, split_size)
+    if not cuts:
+        LOGGER.warning(
+            f"Keyframe interval is bigger than split size, falling back to size based splitting. Path: {path}"
+        )
+        return None
+    base_name, extension = ospath.splitext(file_)
+    if listener.is_cancelled:
+        return False
+    # Every part is cut by its own -ss/-t run whatever the worker count, so
+    # the parts don't depend on how many run at once.
+    listener.ffprogress.reset(keyframes[-1][0])
+    code, stderr = await split_parts_concurrently(
+        path,
+        dirpath,
+        base_name,
+        extension,
+        cuts,
+        listener,
+        multi_streams,
+        get_io_workers(),
+    )
+    if listener.is_cancelled:
+        return False
+    if code == -9:
+        listener.is_cancelled = True
+        return False
+    parts = [
+        f"{dirpath}/{base_name}.part{i:03}{extension}" for i in range(1, len(cuts) + 2)
+    ]
+    if code != 0:
+        for part in parts:
+            if await aiopath.exists(part):
+                await remove(part)
+        try:
+            stderr = stderr.decode().strip()
+        except:
+            stderr = "Unable to decode the error!"
+        if multi_streams:
+            LOGGER.warning(
+                f"{stderr}. Retrying without map, -map 0 not working in all situations. Path: {path}"
+            )
+            return await split_video_by_keyframes(
+                path, size, dirpath, file_, split_size, listener, False
+            )
+        LOGGER.warning(
+            f"{stderr}. Unable to split by keyframes, falling back to size based splitting. Path: {path}"
+        )
+        return None
+    for part in parts:
+        if (
+            not await aiopath.exists(part)
+            or await aiopath.getsize(part) > listener.max_split_size
+        ):
+            LOGGER.warning(
+                f"Keyframe split produced an invalid part, falling back to size based splitting. Path: {part}"
+            )
+            for part in parts:
+                if await aiopath.exists(part):
+                    await remove(part)
+            return None
+    return True
 
 
 async def split_file(
@@ -498,9 +842,22 @@ async def split_file(
     if not listener.as_doc and (await get_document_type(path))[0]:
         if multi_streams:
             multi_streams = await is_multi_streams(path)
+        if not inLoop:
+            res = await split_video_by_keyframes(
+                path,
+                size,
+                dirpath,
+                file_,
+                split_size - 5000000,
+                listener,
+                multi_streams,
+            )
+            if res is not None:
+                return res
         duration = (await get_media_info(path))[0]
         base_name, extension = ospath.splitext(file_)
         split_size -= 5000000
+        listener.ffprogress.reset(duration - start_time)
         while i <= parts or start_time < duration - 4:
             out_path = f"{dirpath}/{base_name}.part{i:03}{extension}"
             cmd = [
@@ -531,9 +888,7 @@ async def split_file(
                 del cmd[10]
             if listener.is_cancelled:
                 return False
-            async with subprocess_lock:
-                listener.subproc = await create_subprocess_exec(*cmd, stderr=PIPE)
-            _, stderr = await listener.subproc.communicate()
+            stderr = await ffmpeg_exec(listener, cmd)
             if listener.is_cancelled:
                 return False
             code = listener.subproc.returncode
@@ -685,9 +1040,9 @@ async def create_sample_video(listener, video_file, sample_duration, part_durati
 
     if listener.is_cancelled:
         return False
-    async with subprocess_lock:
-        listener.subproc = await create_subprocess_exec(*cmd, stderr=PIPE)
-    _, stderr = await listener.subproc.communicate()
+    stderr = await ffmpeg_exec(
+        listener, cmd, sum(end - start for start, end in segments)
+    )
     if listener.is_cancelled:
         return False
     code = listener.subproc.returncode
@@ -819,9 +1174,8 @@ async def run_ffmpeg_cmd(listener, ffmpeg, path):
     ffmpeg[-1] = output
     if listener.is_cancelled:
         return False
-    async with subprocess_lock:
-        listener.subproc = await create_subprocess_exec(*ffmpeg, stderr=PIPE)
-    _, stderr = await listener.subproc.communicate()
+    duration = (await get_media_info(path))[0]
+    stderr = await ffmpeg_exec(listener, ffmpeg, duration)
     if listener.is_cancelled:
         return False
     code = listener.subproc.returncode
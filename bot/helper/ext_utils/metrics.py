@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+from time import time
+
+# In-process counters for the /metrics exporter. Keys are
+# (metric name, sorted label pairs).
+counters = {}
+summaries = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    count, total = summaries.get(key, (0, 0))
+    summaries[key] = (count + 1, total + value)
+
+
+@contextmanager
+def timed(name, **labels):
+    start = time()
+    try:
+        yield
+    finally:
+        observe(name, time() - start, **labels)
+
+
+def record_flood_wait(client, seconds):
+    inc("mltb_floodwait_total", client=client)
+    inc("mltb_floodwait_seconds_total", seconds, client=client)
@@ -0,0 +1,108 @@
+from bot import config_dict, queued_dl, queued_up, non_queued_dl, non_queued_up, LOGGER
+from .local_server import serve
+from .metrics import counters, summaries
+from .status_utils import get_status_snapshot, speed_string_to_bytes, MirrorStatus
+from .task_manager import cpu_pool
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _family(lines, name, kind, samples):
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+
+async def _collect():
+    # Gauges come from the shared status snapshot, which polls the engines
+    # at most once per STATUS_UPDATE_INTERVAL however often we are scraped.
+    snapshot = await get_status_snapshot()
+    tasks = {}
+    speed = {}
+    processed = {}
+    for row in snapshot.tasks:
+        tasks[row["status"]] = tasks.get(row["status"], 0) + 1
+        if row["status"] == MirrorStatus.STATUS_SEED:
+            key = (row["engine"], "seed")
+            row_speed, row_processed = row["seed_speed"], row["uploaded"]
+        elif "speed" in row:
+            direction = "up" if row["status"] == MirrorStatus.STATUS_UPLOAD else "dl"
+            key = (row["engine"], direction)
+            row_speed, row_processed = row["speed"], row["processed"]
+        else:
+            continue
+        speed[key] = speed.get(key, 0) + speed_string_to_bytes(row_speed)
+        processed[key] = processed.get(key, 0) + speed_string_to_bytes(
+            row_processed
+        )
+
+    lines = []
+    _family(
+        lines,
+        "mltb_tasks",
+        "gauge",
+        [((("status", status),), count) for status, count in tasks.items()],
+    )
+    for name, values in [
+        ("mltb_transfer_speed_bytes", speed),
+        ("mltb_transfer_processed_bytes", processed),
+    ]:
+        _family(
+            lines,
+            name,
+            "gauge",
+            [
+                ((("direction", direction), ("engine", engine)), int(value))
+                for (engine, direction), value in values.items()
+            ],
+        )
+    _family(
+        lines,
+        "mltb_queue_length",
+        "gauge",
+        [((("queue", "dl"),), len(queued_dl)), ((("queue", "up"),), len(queued_up))],
+    )
+    _family(
+        lines,
+        "mltb_running_tasks",
+        "gauge",
+        [
+            ((("stage", "dl"),), len(non_queued_dl)),
+            ((("stage", "up"),), len(non_queued_up)),
+        ],
+    )
+    _family(lines, "mltb_cpu_slots_used", "gauge", [((), cpu_pool.used)])
+    _family(lines, "mltb_cpu_jobs_queued", "gauge", [((), cpu_pool.queued)])
+
+    families = {}
+    for (name, labels), value in counters.items():
+        families.setdefault(name, []).append((labels, value))
+    for name, samples in sorted(families.items()):
+        _family(lines, name, "counter", samples)
+    families = {}
+    for (name, labels), value in summaries.items():
+        families.setdefault(name, []).append((labels, value))
+    for stage, (count, total, _) in cpu_pool.wait_stats.items():
+        families.setdefault("mltb_cpu_wait_seconds", []).append(
+            ((("stage", stage),), (count, total))
+        )
+    for name, samples in sorted(families.items()):
+        lines.append(f"# TYPE {name} summary")
+        for labels, (count, total) in samples:
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {round(total, 6)}")
+    return "\n".join(lines) + "\n"
+
+
+async def _route(path):
+    return await _collect() if path == "/metrics" else None
+
+
+async def start_metrics_server():
+    if port := config_dict["METRICS_PORT"]:
+        await serve("0.0.0.0", port, _route)
+        LOGGER.info(f"Metrics exporter listening on port {port}")
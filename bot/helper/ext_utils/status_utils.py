@@ -1,7 +1,9 @@
+from asyncio import iscoroutinefunction, gather, Lock
+from collections import namedtuple
 from html import escape
 from psutil import virtual_memory, cpu_percent, disk_usage
 from time import time
-from asyncio import iscoroutinefunction
+from types import MappingProxyType
 
 from bot import (
     DOWNLOAD_DIR,
@@ -10,6 +12,7 @@ from bot import (
     bot_start_time,
     config_dict,
     status_dict,
+    LOGGER,
 )
 from .bot_utils import sync_to_async
 from ..telegram_helper.button_build import ButtonMaker
@@ -55,41 +58,21 @@ STATUSES = {
 
 async def get_task_by_gid(gid: str):
     async with task_dict_lock:
-        for tk in task_dict.values():
-            if hasattr(tk, "seeding"):
-                await sync_to_async(tk.update)
-            if tk.gid() == gid:
-                return tk
-        return None
+        return task_dict.find_gid(gid)
 
 
 def get_specific_tasks(status, user_id):
     if status == "All":
         if user_id:
-            return [tk for tk in task_dict.values() if tk.listener.user_id == user_id]
+            return task_dict.user_tasks(user_id)
         else:
             return list(task_dict.values())
-    elif user_id:
-        return [
-            tk
-            for tk in task_dict.values()
-            if tk.listener.user_id == user_id
-            and (
-                (st := tk.status())
-                and st == status
-                or status == MirrorStatus.STATUS_DOWNLOAD
-                and st not in STATUSES.values()
-            )
-        ]
-    else:
-        return [
-            tk
-            for tk in task_dict.values()
-            if (st := tk.status())
-            and st == status
-            or status == MirrorStatus.STATUS_DOWNLOAD
-            and st not in STATUSES.values()
-        ]
+    return task_dict.status_tasks(
+        lambda st: st == status
+        or status == MirrorStatus.STATUS_DOWNLOAD
+        and st not in STATUSES.values(),
+        user_id,
+    )
 
 
 async def get_all_tasks(req_status: str, user_id):
@@ -154,6 +137,10 @@ def speed_string_to_bytes(size_text: str):
     return size
 
 
+def get_engine_name(task):
+    return type(task).__name__.removesuffix("Status").lower()
+
+
 def get_progress_bar_string(pct):
     pct = float(pct.strip("%"))
     p = min(max(pct, 0), 100)
@@ -163,62 +150,152 @@ def get_progress_bar_string(pct):
     return f"[{p_str}]"
 
 
+StatusSnapshot = namedtuple(
+    "StatusSnapshot", ["time", "keys", "tasks", "cpu", "ram", "free"]
+)
+
+_snapshot = StatusSnapshot(0, (), (), 0, 0, 0)
+_snapshot_lock = Lock()
+
+
+def _task_row(task, progress=None):
+    tstatus = task.status()
+    listener = task.listener
+    row = {
+        "gid": task.gid(),
+        "name": task.name(),
+        "status": tstatus,
+        "user_id": listener.user_id,
+        "link": listener.message.link if listener.is_super_chat else "",
+        "size": task.size(),
+        "engine": get_engine_name(task),
+    }
+    if tstatus == MirrorStatus.STATUS_SEED:
+        row["seed_speed"] = task.seed_speed()
+        row["uploaded"] = task.uploaded_bytes()
+        row["ratio"] = task.ratio()
+        row["seeding_time"] = task.seeding_time()
+    elif tstatus != MirrorStatus.STATUS_QUEUEUP:
+        row["progress"] = progress or task.progress()
+        row["processed"] = task.processed_bytes()
+        row["speed"] = task.speed()
+        row["eta"] = task.eta()
+        if hasattr(task, "queue_position"):
+            row["queue_position"] = task.queue_position()
+        if hasattr(task, "queue_reason"):
+            row["queue_reason"] = task.queue_reason()
+        if hasattr(task, "seeders_num"):
+            try:
+                row["peers"] = (task.seeders_num(), task.leechers_num())
+            except:
+                pass
+    return MappingProxyType(row)
+
+
+async def _collect_task(task):
+    try:
+        progress = None
+        if iscoroutinefunction(task.progress):
+            progress = await task.progress()
+        return await sync_to_async(_task_row, task, progress)
+    except Exception as e:
+        LOGGER.error(f"Status snapshot failed for {task.listener.name}: {e}")
+        return None
+
+
+async def get_status_snapshot():
+    # One refresh per status interval feeds every status message. Tasks are
+    # only read under task_dict_lock long enough to copy the dict.
+    global _snapshot
+    max_age = max(config_dict["STATUS_UPDATE_INTERVAL"] - 1, 1)
+    async with _snapshot_lock:
+        async with task_dict_lock:
+            # Status objects compare by identity, so a stage change that
+            # replaces one under the same mid also refreshes the snapshot.
+            keys = tuple(task_dict.items())
+            tasks = list(task_dict.values())
+        if keys == _snapshot.keys and time() - _snapshot.time < max_age:
+            return _snapshot
+        rows = await gather(*[_collect_task(task) for task in tasks])
+        _snapshot = StatusSnapshot(
+            time(),
+            keys,
+            tuple(row for row in rows if row is not None),
+            cpu_percent(),
+            virtual_memory().percent,
+            disk_usage(DOWNLOAD_DIR).free,
+        )
+        return _snapshot
+
+
+def _filter_rows(rows, status, user_id):
+    return [
+        row
+        for row in rows
+        if (not user_id or row["user_id"] == user_id)
+        and (
+            status == "All"
+            or row["status"] == status
+            or status == MirrorStatus.STATUS_DOWNLOAD
+            and row["status"] not in STATUSES.values()
+        )
+    ]
+
+
 async def get_readable_message(sid, is_user, page_no=1, status="All", page_step=1):
     msg = ""
     button = None
 
-    tasks = await sync_to_async(get_specific_tasks, status, sid if is_user else None)
+    snapshot = await get_status_snapshot()
+    tasks = _filter_rows(snapshot.tasks, status, sid if is_user else None)
 
     STATUS_LIMIT = config_dict["STATUS_LIMIT"]
     tasks_no = len(tasks)
     pages = (max(tasks_no, 1) + STATUS_LIMIT - 1) // STATUS_LIMIT
     if page_no > pages:
         page_no = (page_no - 1) % pages + 1
-        status_dict[sid]["page_no"] = page_no
+        if sid in status_dict:
+            status_dict[sid]["page_no"] = page_no
     elif page_no < 1:
         page_no = pages - (abs(page_no) % pages)
-        status_dict[sid]["page_no"] = page_no
+        if sid in status_dict:
+            status_dict[sid]["page_no"] = page_no
     start_position = (page_no - 1) * STATUS_LIMIT
 
     for index, task in enumerate(
         tasks[start_position : STATUS_LIMIT + start_position], start=1
     ):
-        tstatus = await sync_to_async(task.status) if status == "All" else status
-        if task.listener.is_super_chat:
-            msg += f"<b>{index + start_position}.<a href='{task.listener.message.link}'>{tstatus}</a>: </b>"
+        tstatus = task["status"] if status == "All" else status
+        if task["link"]:
+            msg += f"<b>{index + start_position}.<a href='{task['link']}'>{tstatus}</a>: </b>"
         else:
             msg += f"<b>{index + start_position}.{tstatus}: </b>"
-        msg += f"<code>{escape(f'{task.name()}')}</code>"
+        msg += f"<code>{escape(str(task['name']))}</code>"
         if tstatus not in [
-            MirrorStatus.STATUS_SPLIT,
             MirrorStatus.STATUS_SEED,
-            MirrorStatus.STATUS_SAMVID,
-            MirrorStatus.STATUS_CONVERT,
-            MirrorStatus.STATUS_FFMPEG,
             MirrorStatus.STATUS_QUEUEUP,
         ]:
-            progress = (
-                await task.progress()
-                if iscoroutinefunction(task.progress)
-                else task.progress()
-            )
+            progress = task["progress"]
             msg += f"\n{get_progress_bar_string(progress)} {progress}"
-            msg += f"\n<b>Processed:</b> {task.processed_bytes()} of {task.size()}"
-            msg += f"\n<b>Speed:</b> {task.speed()} | <b>ETA:</b> {task.eta()}"
-            if hasattr(task, "seeders_num"):
-                try:
-                    msg += f"\n<b>Seeders:</b> {task.seeders_num()} | <b>Leechers:</b> {task.leechers_num()}"
-                except:
-                    pass
+            msg += f"\n<b>Processed:</b> {task['processed']} of {task['size']}"
+            msg += f"\n<b>Speed:</b> {task['speed']} | <b>ETA:</b> {task['eta']}"
+            if position := task.get("queue_position"):
+                position, waited = position
+                if position:
+                    msg += f"\n<b>CPU Queue:</b> #{position} | <b>Waiting:</b> {get_readable_time(waited) or '0s'}"
+            if reason := task.get("queue_reason"):
+                msg += f"\n<b>Queued:</b> {reason}"
+            if peers := task.get("peers"):
+                msg += f"\n<b>Seeders:</b> {peers[0]} | <b>Leechers:</b> {peers[1]}"
         elif tstatus == MirrorStatus.STATUS_SEED:
-            msg += f"\n<b>Size: </b>{task.size()}"
-            msg += f"\n<b>Speed: </b>{task.seed_speed()}"
-            msg += f" | <b>Uploaded: </b>{task.uploaded_bytes()}"
-            msg += f"\n<b>Ratio: </b>{task.ratio()}"
-            msg += f" | <b>Time: </b>{task.seeding_time()}"
+            msg += f"\n<b>Size: </b>{task['size']}"
+            msg += f"\n<b>Speed: </b>{task['seed_speed']}"
+            msg += f" | <b>Uploaded: </b>{task['uploaded']}"
+            msg += f"\n<b>Ratio: </b>{task['ratio']}"
+            msg += f" | <b>Time: </b>{task['seeding_time']}"
         else:
-            msg += f"\n<b>Size: </b>{task.size()}"
-        msg += f"\n<b>Cancel: </b><code>/c {task.gid()}</code>\n\n"
+            msg += f"\n<b>Size: </b>{task['size']}"
+        msg += f"\n<b>Cancel: </b><code>/c {task['gid']}</code>\n\n"
 
     if len(msg) == 0:
         if status == "All":
@@ -241,6 +318,6 @@ async def get_readable_message(sid, is_user, page_no=1, status="All", page_step=
                 buttons.data_button(label, f"status {sid} st {status_value}")
     buttons.data_button("♻️", f"status {sid} ref", position="header")
     button = buttons.build_menu(8)
-    msg += f"<b>CPU:</b> {cpu_percent()}% | <b>FREE:</b> {get_readable_file_size(disk_usage(DOWNLOAD_DIR).free)}"
-    msg += f"\n<b>RAM:</b> {virtual_memory().percent}% | <b>UPTIME:</b> {get_readable_time(time() - bot_start_time)}"
+    msg += f"<b>CPU:</b> {snapshot.cpu}% | <b>FREE:</b> {get_readable_file_size(snapshot.free)}"
+    msg += f"\n<b>RAM:</b> {snapshot.ram}% | <b>UPTIME:</b> {get_readable_time(time() - bot_start_time)}"
     return msg, button
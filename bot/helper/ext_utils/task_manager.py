@@ -1,17 +1,35 @@
-from asyncio import Event
+from asyncio import Event, sleep
+from contextlib import asynccontextmanager
+from os import cpu_count
+from psutil import disk_usage
+from re import sub as re_sub
+from time import time
 
 from bot import (
     config_dict,
+    user_data,
+    OWNER_ID,
     queued_dl,
     queued_up,
     non_queued_up,
     non_queued_dl,
     queue_dict_lock,
+    task_dict,
+    bot_loop,
+    DOWNLOAD_DIR,
     LOGGER,
 )
 from .bot_utils import sync_to_async, get_telegraph_list
+from .db_handler import database
 from .files_utils import get_base_name
+from .status_utils import (
+    get_readable_time,
+    get_readable_file_size,
+    speed_string_to_bytes,
+    MirrorStatus,
+)
 from .links_utils import is_gdrive_id
+from .metrics import timed
 from ..mirror_leech_utils.gdrive_utils.search import GoogleDriveSearch
 
 
@@ -53,6 +71,225 @@ async def stop_duplicate_check(listener):
     return False, None
 
 
+queue_users = {}
+
+
+def _is_privileged(user_id):
+    return user_id == OWNER_ID or user_data.get(user_id, {}).get(
+        "is_sudo", False
+    )
+
+
+def _running_per_user(running):
+    counts = {}
+    for mid in running:
+        if (user_id := queue_users.get(mid)) is not None:
+            counts[user_id] = counts.get(user_id, 0) + 1
+    return counts
+
+
+def _is_user_over_limit(user_id):
+    if not (user_limit := config_dict["QUEUE_USER"]) or _is_privileged(user_id):
+        return False
+    return _running_per_user(non_queued_dl).get(user_id, 0) >= user_limit
+
+
+def _fair_order(queued, running):
+    # Owner and sudo first, then the user with the fewest active tasks.
+    # FIFO inside each user's sub-queue and between equal users.
+    for mid in list(queue_users):
+        if not (
+            mid in queued_dl
+            or mid in queued_up
+            or mid in non_queued_dl
+            or mid in non_queued_up
+        ):
+            del queue_users[mid]
+    for mid in list(held_downloads):
+        if mid not in queued_dl:
+            del held_downloads[mid]
+            queue_reasons.pop(mid, None)
+    user_limit = config_dict["QUEUE_USER"] if queued is queued_dl else 0
+    active = _running_per_user(running)
+    ranked = []
+    for seq, mid in enumerate(queued):
+        user_id = queue_users.get(mid)
+        privileged = _is_privileged(user_id)
+        rank = active.get(user_id, 0)
+        active[user_id] = rank + 1
+        if user_limit and not privileged and rank >= user_limit:
+            continue
+        ranked.append((not privileged, rank, seq, mid))
+    ranked.sort()
+    return [mid for *_, mid in ranked]
+
+
+held_downloads = {}
+queue_reasons = {}
+disk_reservations = {}
+_recheck = None
+
+
+def _disk_need(listener):
+    # Extract, zip and leech split each write another copy next to the
+    # download before the source is removed.
+    if not listener.size:
+        return 0
+    factor = 1 + bool(listener.extract) + bool(listener.compress)
+    if listener.is_leech and listener.split_size < listener.size:
+        factor += 1
+    return listener.size * factor
+
+
+def _disk_check():
+    return config_dict["QUEUE_DISK_CHECK"] or config_dict["QUEUE_DISK_RESERVE"]
+
+
+def _task_usage():
+    # Aggregate download speed, bytes written per downloading task and every
+    # task whose status could be read.
+    speed = 0
+    written = {}
+    seen = set()
+    for task in list(task_dict.values()):
+        try:
+            mid = task.listener.mid
+            status = task.status()
+            seen.add(mid)
+            if status not in [
+                MirrorStatus.STATUS_DOWNLOAD,
+                MirrorStatus.STATUS_QUEUEDL,
+            ]:
+                continue
+            speed += speed_string_to_bytes(task.speed())
+            written[mid] = speed_string_to_bytes(task.processed_bytes())
+        except Exception:
+            pass
+    return speed, written, seen
+
+
+async def _collect_usage():
+    # Reading task status polls the engines, so callers do it before taking
+    # queue_dict_lock.
+    if not (_disk_check() or config_dict["QUEUE_BANDWIDTH"]):
+        return None
+    return await sync_to_async(_task_usage)
+
+
+def _resource_reasons(listeners, usage):
+    reasons = {}
+    if usage is None or not listeners:
+        return reasons
+    speed, written, seen = usage
+    bandwidth = config_dict["QUEUE_BANDWIDTH"] * 1048576
+    if bandwidth and speed >= bandwidth:
+        for listener in listeners:
+            reasons[listener.mid] = (
+                f"Bandwidth {get_readable_file_size(speed)}/s in use"
+            )
+        return reasons
+    if not _disk_check():
+        return reasons
+    # Bytes admitted downloads have yet to write. Reservations made after
+    # usage was collected count as not started.
+    pending = 0
+    for mid, (need, size) in list(disk_reservations.items()):
+        if mid not in task_dict:
+            del disk_reservations[mid]
+            continue
+        pending += need - size
+        if mid in written:
+            pending += max(size - written[mid], 0)
+        elif mid not in seen:
+            pending += size
+    free = (
+        disk_usage(DOWNLOAD_DIR).free
+        - pending
+        - config_dict["QUEUE_DISK_RESERVE"] * 1073741824
+    )
+    for listener in listeners:
+        need = _disk_need(listener)
+        if need > free:
+            reasons[listener.mid] = (
+                f"Disk needs {get_readable_file_size(need)}, "
+                f"{get_readable_file_size(max(free, 0))} available"
+            )
+        else:
+            free -= need
+    return reasons
+
+
+def _reserve(listener):
+    if _disk_check() and (need := _disk_need(listener)):
+        disk_reservations[listener.mid] = (need, listener.size)
+
+
+def _admissible(order, usage):
+    listeners = [held_downloads[mid] for mid in order if mid in held_downloads]
+    reasons = _resource_reasons(listeners, usage)
+    queue_reasons.update(reasons)
+    return [mid for mid in order if mid not in reasons]
+
+
+async def _recheck_held():
+    # Free space and bandwidth change without any task event, so poll while
+    # downloads are held back for them.
+    while queued_dl and (_disk_check() or config_dict["QUEUE_BANDWIDTH"]):
+        await sleep(30)
+        await start_from_queued()
+
+
+def _schedule_recheck():
+    global _recheck
+    if _recheck is None or _recheck.done():
+        _recheck = bot_loop.create_task(_recheck_held())
+
+
+def _resume_enabled(listener):
+    return (
+        config_dict["RESUME_QUEUED_TASKS"]
+        and config_dict["DATABASE_URL"]
+        and type(listener).__name__ in ["Mirror", "YtDlp"]
+    )
+
+
+def _queue_key(listener):
+    return f"{listener.message.chat.id}:{listener.message.id}"
+
+
+async def _persist_queued(listener):
+    # Multi and bulk arguments are dropped since every queued message of a
+    # multi is stored on its own.
+    text = re_sub(
+        r"\s-[ib](?:\s+\d[\d:]*)?(?=\s|$)", "", listener.message.text.split("\n")[0]
+    )
+    try:
+        await database.add_queued_task(
+            _queue_key(listener),
+            {
+                "cid": listener.message.chat.id,
+                "msg_id": listener.message.id,
+                "text": text,
+                "kind": type(listener).__name__,
+                "qbit": listener.is_qbit,
+                "leech": listener.is_leech,
+                "user_id": listener.user_id,
+                "priority": 0 if _is_privileged(listener.user_id) else 1,
+            },
+        )
+    except Exception as e:
+        LOGGER.error(f"Failed to persist queued task {listener.name}: {e}")
+
+
+async def forget_queued_task(listener):
+    if not _resume_enabled(listener):
+        return
+    try:
+        await database.rm_queued_task(_queue_key(listener))
+    except Exception as e:
+        LOGGER.error(f"Failed to remove queued task {listener.name}: {e}")
+
+
 async def check_running_tasks(listener, state="dl"):
     all_limit = config_dict["QUEUE_ALL"]
     state_limit = (
@@ -60,35 +297,60 @@ async def check_running_tasks(listener, state="dl"):
     )
     event = None
     is_over_limit = False
+    usage = await _collect_usage() if state == "dl" else None
     async with queue_dict_lock:
         if state == "up" and listener.mid in non_queued_dl:
             non_queued_dl.remove(listener.mid)
+        if state == "up":
+            disk_reservations.pop(listener.mid, None)
+        queue_users[listener.mid] = listener.user_id
         if (
-            (all_limit or state_limit)
-            and not listener.force_run
+            not listener.force_run
             and not (listener.force_upload and state == "up")
             and not (listener.force_download and state == "dl")
         ):
             dl_count = len(non_queued_dl)
             up_count = len(non_queued_up)
             t_count = dl_count if state == "dl" else up_count
-            is_over_limit = (
+            if (
                 all_limit
                 and dl_count + up_count >= all_limit
                 and (not state_limit or t_count >= state_limit)
-            ) or (state_limit and t_count >= state_limit)
-            if is_over_limit:
+            ) or (state_limit and t_count >= state_limit):
+                reason = "Waiting for a free slot"
+            elif state == "dl" and _is_user_over_limit(listener.user_id):
+                reason = f"User limit of {config_dict['QUEUE_USER']} reached"
+            elif state == "dl":
+                reasons = _resource_reasons([listener], usage)
+                reason = reasons.get(listener.mid, "")
+            else:
+                reason = ""
+            if is_over_limit := bool(reason):
                 event = Event()
                 if state == "dl":
+                    listener.timeline.begin("queue")
                     queued_dl[listener.mid] = event
+                    held_downloads[listener.mid] = listener
+                    queue_reasons[listener.mid] = reason
+                    _schedule_recheck()
                 else:
+                    listener.timeline.begin("upload_queue")
                     queued_up[listener.mid] = event
         if not is_over_limit:
             if state == "up":
                 non_queued_up.add(listener.mid)
             else:
                 non_queued_dl.add(listener.mid)
+                listener.timeline.begin("download")
+                _reserve(listener)
+                await forget_queued_task(listener)
 
+    if is_over_limit and state == "dl" and _resume_enabled(listener):
+        # Written outside the lock. A task admitted meanwhile has already
+        # been forgotten, so drop the entry again.
+        await _persist_queued(listener)
+        if listener.mid not in queued_dl:
+            await forget_queued_task(listener)
     return is_over_limit, event
 
 
@@ -96,6 +358,11 @@ async def start_dl_from_queued(mid: int):
     queued_dl[mid].set()
     del queued_dl[mid]
     non_queued_dl.add(mid)
+    queue_reasons.pop(mid, None)
+    if listener := held_downloads.pop(mid, None):
+        listener.timeline.begin("download")
+        _reserve(listener)
+        await forget_queued_task(listener)
 
 
 async def start_up_from_queued(mid: int):
@@ -105,6 +372,7 @@ async def start_up_from_queued(mid: int):
 
 
 async def start_from_queued():
+    usage = await _collect_usage() if queued_dl else None
     if all_limit := config_dict["QUEUE_ALL"]:
         dl_limit = config_dict["QUEUE_DOWNLOAD"]
         up_limit = config_dict["QUEUE_UPLOAD"]
@@ -115,13 +383,15 @@ async def start_from_queued():
             if all_ < all_limit:
                 f_tasks = all_limit - all_
                 if queued_up and (not up_limit or up < up_limit):
-                    for index, mid in enumerate(list(queued_up.keys()), start=1):
+                    order = _fair_order(queued_up, non_queued_up)
+                    for index, mid in enumerate(order, start=1):
                         await start_up_from_queued(mid)
                         f_tasks -= 1
                         if f_tasks == 0 or (up_limit and index >= up_limit - up):
                             break
                 if queued_dl and (not dl_limit or dl < dl_limit) and f_tasks != 0:
-                    for index, mid in enumerate(list(queued_dl.keys()), start=1):
+                    order = _admissible(_fair_order(queued_dl, non_queued_dl), usage)
+                    for index, mid in enumerate(order, start=1):
                         await start_dl_from_queued(mid)
                         if (dl_limit and index >= dl_limit - dl) or index == f_tasks:
                             break
@@ -132,14 +402,15 @@ async def start_from_queued():
             up = len(non_queued_up)
             if queued_up and up < up_limit:
                 f_tasks = up_limit - up
-                for index, mid in enumerate(list(queued_up.keys()), start=1):
+                order = _fair_order(queued_up, non_queued_up)
+                for index, mid in enumerate(order, start=1):
                     await start_up_from_queued(mid)
                     if index == f_tasks:
                         break
     else:
         async with queue_dict_lock:
             if queued_up:
-                for mid in list(queued_up.keys()):
+                for mid in _fair_order(queued_up, non_queued_up):
                     await start_up_from_queued(mid)
 
     if dl_limit := config_dict["QUEUE_DOWNLOAD"]:
@@ -147,12 +418,116 @@ async def start_from_queued():
             dl = len(non_queued_dl)
             if queued_dl and dl < dl_limit:
                 f_tasks = dl_limit - dl
-                for index, mid in enumerate(list(queued_dl.keys()), start=1):
+                order = _admissible(_fair_order(queued_dl, non_queued_dl), usage)
+                for index, mid in enumerate(order, start=1):
                     await start_dl_from_queued(mid)
                     if index == f_tasks:
                         break
     else:
         async with queue_dict_lock:
             if queued_dl:
-                for mid in list(queued_dl.keys()):
+                for mid in _admissible(_fair_order(queued_dl, non_queued_dl), usage):
                     await start_dl_from_queued(mid)
+
+
+class CpuJobPool:
+    # Each ffmpeg stage reserves the threads it will use. Waiters are admitted
+    # in FIFO order, but users with fewer running jobs go first.
+    def __init__(self):
+        self._waiters = []
+        self._running = {}
+        self._used = 0
+        self._seq = 0
+        self.wait_stats = {}
+
+    @property
+    def slots(self):
+        return config_dict["CPU_SLOTS"] or cpu_count() or 1
+
+    @property
+    def used(self):
+        return self._used
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _ordered(self):
+        load = {}
+        for user_id, _ in self._running.values():
+            load[user_id] = load.get(user_id, 0) + 1
+        ranked = []
+        for waiter in self._waiters:
+            rank = load.get(waiter["user_id"], 0)
+            load[waiter["user_id"]] = rank + 1
+            ranked.append((rank, waiter["seq"], waiter))
+        ranked.sort(key=lambda x: x[:2])
+        return [waiter for _, _, waiter in ranked]
+
+    def _dispatch(self):
+        for waiter in self._ordered():
+            if self._running and self._used + waiter["weight"] > self.slots:
+                break
+            self._waiters.remove(waiter)
+            self._running[waiter["mid"]] = (waiter["user_id"], waiter["weight"])
+            self._used += waiter["weight"]
+            waiter["event"].set()
+
+    def position(self, listener):
+        for index, waiter in enumerate(self._ordered(), start=1):
+            if waiter["mid"] == listener.mid:
+                return index, time() - waiter["time"]
+        return 0, 0
+
+    async def acquire(self, listener, stage, weight=None):
+        weight = min(weight or max(cpu_count() // 2, 1), self.slots)
+        self._seq += 1
+        waiter = {
+            "mid": listener.mid,
+            "user_id": listener.user_id,
+            "weight": weight,
+            "seq": self._seq,
+            "time": time(),
+            "event": Event(),
+        }
+        self._waiters.append(waiter)
+        self._dispatch()
+        try:
+            await waiter["event"].wait()
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        if listener.is_cancelled:
+            return
+        waited = time() - waiter["time"]
+        count, total, longest = self.wait_stats.get(stage, (0, 0, 0))
+        self.wait_stats[stage] = (count + 1, total + waited, max(longest, waited))
+        if waited >= 1:
+            LOGGER.info(
+                f"{stage} waited {get_readable_time(waited)} for {weight} CPU slots: {listener.name}"
+            )
+
+    @asynccontextmanager
+    async def job(self, listener, stage, weight=None):
+        await self.acquire(listener, stage, weight)
+        try:
+            with timed("mltb_stage_seconds", stage=stage):
+                yield
+        finally:
+            self.release(listener)
+
+    def release(self, listener):
+        if job := self._running.pop(listener.mid, None):
+            self._used -= job[1]
+        self._dispatch()
+
+    def cancel(self, listener):
+        for waiter in self._waiters:
+            if waiter["mid"] == listener.mid:
+                self._waiters.remove(waiter)
+                waiter["event"].set()
+                break
+        self._dispatch()
+
+
+cpu_pool = CpuJobPool()
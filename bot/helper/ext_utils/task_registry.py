@@ -0,0 +1,120 @@
+from itertools import count
+
+
+class TaskRegistry(dict):
+    # task_dict with secondary indexes by gid, user and status. Indexes are
+    # refreshed whenever a task's status object is replaced. aria2/qbit and
+    # direct tasks change state inside the same object, so their status is
+    # always read live instead of indexed, and engine gids that move are
+    # re-indexed by the status object through refresh_gid.
+    def __init__(self):
+        super().__init__()
+        self._seq = count()
+        self._order = {}
+        self._gids = {}
+        self._gid_of = {}
+        self._users = {}
+        self._statuses = {}
+        self._status_of = {}
+        self._live = {}
+
+    def _index(self, mid, task, order=None):
+        self._order[mid] = next(self._seq) if order is None else order
+        self._users.setdefault(task.listener.user_id, {})[mid] = None
+        try:
+            self.index_gid(task.gid(), mid)
+        except Exception:
+            pass
+        if hasattr(task, "seeding") or getattr(task, "live_status", False):
+            self._live[mid] = None
+            return
+        try:
+            status = task.status()
+        except Exception:
+            self._live[mid] = None
+            return
+        self._status_of[mid] = status
+        self._statuses.setdefault(status, {})[mid] = None
+
+    def _unindex(self, mid):
+        task = self[mid]
+        user_id = task.listener.user_id
+        if (users := self._users.get(user_id)) is not None:
+            users.pop(mid, None)
+            if not users:
+                del self._users[user_id]
+        if (gid := self._gid_of.pop(mid, None)) is not None:
+            self._gids.pop(gid, None)
+        if (status := self._status_of.pop(mid, None)) is not None:
+            self._statuses[status].pop(mid, None)
+            if not self._statuses[status]:
+                del self._statuses[status]
+        self._live.pop(mid, None)
+        self._order.pop(mid, None)
+
+    def __setitem__(self, mid, task):
+        order = self._order.get(mid)
+        if mid in self:
+            self._unindex(mid)
+        super().__setitem__(mid, task)
+        self._index(mid, task, order)
+
+    def __delitem__(self, mid):
+        self._unindex(mid)
+        super().__delitem__(mid)
+
+    def pop(self, mid, *default):
+        if mid in self:
+            self._unindex(mid)
+        return super().pop(mid, *default)
+
+    def clear(self):
+        for mid in list(self):
+            self._unindex(mid)
+        super().clear()
+
+    def index_gid(self, gid, mid):
+        old = self._gid_of.get(mid)
+        self._gids[gid] = mid
+        self._gid_of[mid] = gid
+        if old is not None and old != gid:
+            self._gids.pop(old, None)
+
+    def refresh_gid(self, mid, task):
+        if self.get(mid) is not task:
+            return
+        try:
+            gid = task.gid()
+        except Exception:
+            return
+        if self._gid_of.get(mid) != gid:
+            self.index_gid(gid, mid)
+
+    def find_gid(self, gid):
+        if (task := self.get(self._gids.get(gid))) is None:
+            return None
+        try:
+            return task if task.gid() == gid else None
+        except Exception:
+            return None
+
+    def _sorted(self, mids):
+        return [self[mid] for mid in sorted(mids, key=self._order.__getitem__)]
+
+    def user_tasks(self, user_id):
+        return self._sorted(self._users.get(user_id, {}))
+
+    def status_tasks(self, match, user_id=None):
+        mids = set()
+        for status, group in self._statuses.items():
+            if match(status):
+                mids.update(group)
+        for mid in self._live:
+            try:
+                if match(self[mid].status()):
+                    mids.add(mid)
+            except Exception:
+                pass
+        if user_id:
+            mids &= self._users.get(user_id, {}).keys()
+        return self._sorted(mids)
@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from datetime import datetime
+from psutil import Process
+from time import time
+
+from bot import LOGGER
+from .db_handler import database
+
+_process = Process()
+
+
+def _cpu_time():
+    times = _process.cpu_times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class TaskTimeline:
+    # Wall time, bytes and CPU time for each stage of a task. CPU time is
+    # measured for the whole bot process and its reaped children, so stages
+    # overlapping other busy tasks are charged for their work too.
+    def __init__(self):
+        self.start = time()
+        self.engine = ""
+        self.stages = []
+        self._open = None
+        self._saved = False
+        self.begin("metadata")
+
+    @property
+    def current(self):
+        return self._open["stage"] if self._open else None
+
+    def begin(self, stage, size=0):
+        self.end()
+        self._open = {
+            "stage": stage,
+            "bytes": size,
+            "start": time(),
+            "cpu": _cpu_time(),
+        }
+
+    def end(self, size=None):
+        if (stage := self._open) is None:
+            return
+        self._open = None
+        now = time()
+        stage["cpu"] = _cpu_time() - stage["cpu"]
+        stage["wall"] = now - stage["start"]
+        stage["start"] -= self.start
+        if size is not None:
+            stage["bytes"] = size
+        self.stages.append(stage)
+
+    @contextmanager
+    def stage(self, stage, size=0):
+        self.begin(stage, size)
+        try:
+            yield
+        finally:
+            self.end()
+
+    async def save(self, listener, state):
+        self.end()
+        if self._saved or not self.stages:
+            return
+        self._saved = True
+        try:
+            await database.add_task_timeline(
+                {
+                    "time": datetime.utcnow(),
+                    "name": listener.name,
+                    "user_id": listener.user_id,
+                    "engine": self.engine,
+                    "state": state,
+                    "size": listener.size,
+                    "total": time() - self.start,
+                    "stages": self.stages,
+                }
+            )
+        except Exception as e:
+            LOGGER.error(f"Failed to save task timeline: {e}")
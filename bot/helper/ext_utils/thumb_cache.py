@@ -0,0 +1,113 @@
+from hashlib import blake2b
+from os import makedirs, remove, rename, scandir, stat, utime, walk, path as ospath
+from shutil import copy2, copytree, rmtree
+from time import time
+
+from bot import LOGGER, config_dict
+from .bot_utils import sync_to_async
+
+FINGERPRINT_CHUNK = 65536
+
+_fingerprints = {}
+
+
+def _get_fingerprint(path):
+    fstat = stat(path)
+    key = (fstat.st_size, fstat.st_mtime)
+    if path in _fingerprints and _fingerprints[path][0] == key:
+        return _fingerprints[path][1]
+    digest = blake2b(str(fstat.st_size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        for offset in [
+            0,
+            fstat.st_size // 2,
+            max(fstat.st_size - FINGERPRINT_CHUNK, 0),
+        ]:
+            f.seek(offset)
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    fingerprint = digest.hexdigest()
+    if len(_fingerprints) >= 256:
+        del _fingerprints[next(iter(_fingerprints))]
+    _fingerprints[path] = (key, fingerprint)
+    return fingerprint
+
+
+def _entry_path(fingerprint, kind):
+    name = blake2b(f"{fingerprint}:{kind}".encode(), digest_size=16).hexdigest()
+    return ospath.join(config_dict["THUMB_CACHE_DIR"], name)
+
+
+def _entry_size(entry):
+    if not entry.is_dir():
+        return entry.stat().st_size
+    return sum(
+        ospath.getsize(ospath.join(dirpath, f))
+        for dirpath, _, files in walk(entry.path)
+        for f in files
+    )
+
+
+def _evict():
+    limit = config_dict["THUMB_CACHE_SIZE"]
+    entries = []
+    total_size = 0
+    with scandir(config_dict["THUMB_CACHE_DIR"]) as it:
+        for entry in it:
+            size = _entry_size(entry)
+            total_size += size
+            entries.append((entry.stat().st_mtime, size, entry))
+    entries.sort(key=lambda x: x[0])
+    for _, size, entry in entries:
+        if total_size <= limit:
+            break
+        if entry.is_dir():
+            rmtree(entry.path, ignore_errors=True)
+        else:
+            remove(entry.path)
+        total_size -= size
+
+
+def _get_cached(path, kind, dest):
+    entry = _entry_path(_get_fingerprint(path), kind)
+    if not ospath.exists(entry):
+        return None
+    if ospath.isdir(entry):
+        copytree(entry, dest, dirs_exist_ok=True)
+    else:
+        copy2(entry, dest)
+    now = time()
+    utime(entry, (now, now))
+    return dest
+
+
+def _put_cache(path, kind, src):
+    makedirs(config_dict["THUMB_CACHE_DIR"], exist_ok=True)
+    entry = _entry_path(_get_fingerprint(path), kind)
+    tmp = f"{entry}.{time()}.tmp"
+    if ospath.isdir(src):
+        copytree(src, tmp)
+    else:
+        copy2(src, tmp)
+    if ospath.isdir(entry):
+        rmtree(entry, ignore_errors=True)
+    rename(tmp, entry)
+    _evict()
+
+
+async def get_cached_thumb(path, kind, dest):
+    if not config_dict["THUMB_CACHE_SIZE"]:
+        return None
+    try:
+        return await sync_to_async(_get_cached, path, kind, dest)
+    except Exception as e:
+        LOGGER.error(f"Thumbnail cache read failed. Path: {path}. Error: {e}")
+        return None
+
+
+async def cache_thumb(path, kind, src):
+    if not config_dict["THUMB_CACHE_SIZE"]:
+        return
+    try:
+        await sync_to_async(_put_cache, path, kind, src)
+    except Exception as e:
+        LOGGER.error(f"Thumbnail cache write failed. Path: {path}. Error: {e}")
@@ -0,0 +1,92 @@
+from io import UnsupportedOperation
+from os import remove, walk, path as ospath
+from zipfile import ZipFile, ZIP_STORED
+
+
+class ZipVolumeWriter:
+    # Non-seekable sink for ZipFile that cuts the archive into name.zip.001,
+    # name.zip.002, ... like 7z -v. zipfile falls back to data descriptors on
+    # unseekable streams, so a volume is final as soon as it is closed.
+    def __init__(self, base_path, volume_size, on_volume, listener):
+        self._base_path = base_path
+        self._volume_size = volume_size
+        self._on_volume = on_volume
+        self._listener = listener
+        self._file = None
+        self._index = 0
+        self._written = 0
+        self._position = 0
+
+    def write(self, data):
+        if self._listener.is_cancelled:
+            raise InterruptedError("Zip cancelled")
+        view = memoryview(data)
+        length = len(view)
+        while view:
+            if self._file is None:
+                self._index += 1
+                self._file = open(f"{self._base_path}.{self._index:03}", "wb")
+                self._written = 0
+            chunk = view[: self._volume_size - self._written]
+            self._file.write(chunk)
+            self._written += len(chunk)
+            view = view[len(chunk) :]
+            if self._written >= self._volume_size:
+                self._close_volume()
+        self._position += length
+        return length
+
+    def _close_volume(self):
+        self._file.close()
+        path = self._file.name
+        self._file = None
+        self._on_volume(path)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, *_):
+        raise UnsupportedOperation("seek")
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._close_volume()
+
+    def abort(self):
+        # The open volume is incomplete, so it is dropped instead of handed on.
+        if self._file is None:
+            return
+        self._file.close()
+        try:
+            remove(self._file.name)
+        except OSError:
+            pass
+        self._file = None
+
+
+def write_zip_volumes(
+    src, base_path, volume_size, on_volume, listener, excluded=(), extensions=()
+):
+    writer = ZipVolumeWriter(base_path, volume_size, on_volume, listener)
+    root = ospath.dirname(src)
+    try:
+        with ZipFile(writer, "w", ZIP_STORED, allowZip64=True) as zf:
+            if ospath.isfile(src):
+                zf.write(src, ospath.basename(src))
+            else:
+                for dirpath, dirs, files in walk(src):
+                    dirs.sort()
+                    zf.write(dirpath, ospath.relpath(dirpath, root))
+                    for file_ in sorted(files):
+                        f_path = ospath.join(dirpath, file_)
+                        if f_path in excluded or file_.lower().endswith(extensions):
+                            continue
+                        zf.write(f_path, ospath.relpath(f_path, root))
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
@@ -1,9 +1,19 @@
 from aiofiles.os import remove, path as aiopath
-from asyncio import sleep
+from asyncio import wait_for, shield, TimeoutError
+from collections import OrderedDict
 from time import time
 
-from bot import aria2, task_dict_lock, task_dict, LOGGER, config_dict, intervals
-from ..ext_utils.bot_utils import loop_thread, bt_selection_buttons, sync_to_async
+from bot import (
+    aria2,
+    task_dict_lock,
+    task_dict,
+    LOGGER,
+    config_dict,
+    intervals,
+    bot_loop,
+)
+from ..ext_utils.bot_utils import bt_selection_buttons, sync_to_async
+from ..ext_utils.engine_cache import aria2_cache, fetch_downloads
 from ..ext_utils.files_utils import clean_unwanted
 from ..ext_utils.status_utils import get_task_by_gid
 from ..ext_utils.task_manager import stop_duplicate_check
@@ -14,59 +24,172 @@ from ..telegram_helper.message_utils import (
     update_status_message,
 )
 
+TERMINAL_EVENTS = ("complete", "bt_complete", "error", "stop")
+
+
+class Aria2EventHub:
+    # aria2 pushes notifications over its JSON-RPC WebSocket. Everything that
+    # arrives while a refresh is in flight is fetched with one multicall, then
+    # handlers run with that status and coroutines waiting on a gid are woken
+    # by futures instead of sleeping and polling.
+    def __init__(self):
+        self.handlers = {}
+        self._pending = {}
+        self._flusher = None
+        self._waiters = {}
+        self._finished = OrderedDict()
+        self._registered = {}
+
+    def push(self, event, gid):
+        bot_loop.call_soon_threadsafe(self._queue, event, gid)
+
+    def _queue(self, event, gid):
+        self._pending.setdefault(gid, []).append(event)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = bot_loop.create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            try:
+                downloads = await sync_to_async(fetch_downloads, list(batch))
+            except Exception as e:
+                LOGGER.error(f"{e}: while refreshing aria2 notifications")
+                downloads = {}
+            aria2_cache.invalidate()
+            for gid, events in batch.items():
+                download = downloads.get(gid)
+                for event in events:
+                    if event in TERMINAL_EVENTS:
+                        self._resolve(gid, (event, download))
+                    if handler := self.handlers.get(event):
+                        bot_loop.create_task(handler(gid, download))
+
+    def _resolve(self, gid, result):
+        self._finished[gid] = result
+        while len(self._finished) > 200:
+            self._finished.popitem(last=False)
+        for future in self._waiters.pop(gid, []):
+            if not future.done():
+                future.set_result(result)
+
+    async def wait(self, gid):
+        # Returns (event, download) once gid completes, fails or stops.
+        if (result := self._finished.get(gid)) is not None:
+            return result
+        future = bot_loop.create_future()
+        self._waiters.setdefault(gid, []).append(future)
+        return await future
 
-@loop_thread
-async def _on_download_started(api, gid):
-    download = await sync_to_async(api.get_download, gid)
-    if download.options.follow_torrent == "false":
+    async def settle(self, gid):
+        # wait() that also checks the status cache every few poll intervals,
+        # so a notification lost in a WebSocket reconnect can't hang the
+        # caller.
+        waiter = bot_loop.create_task(self.wait(gid))
+        try:
+            while True:
+                try:
+                    return await wait_for(
+                        shield(waiter), config_dict["ENGINE_POLL_INTERVAL"] * 15
+                    )
+                except TimeoutError:
+                    download = await sync_to_async(aria2_cache.get, gid)
+                    if download is None:
+                        continue
+                    if download.is_complete:
+                        event = "complete"
+                    elif download.has_failed:
+                        event = "error"
+                    elif download.is_removed:
+                        event = "stop"
+                    else:
+                        continue
+                    LOGGER.warning(f"Missed aria2 {event} notification. Gid: {gid}")
+                    self._resolve(gid, (event, download))
+        finally:
+            waiter.cancel()
+
+    def task_added(self, gid):
+        for future in self._registered.pop(gid, []):
+            if not future.done():
+                future.set_result(None)
+
+    async def task(self, gid, timeout=5):
+        # Notifications can beat add_aria2c_download to task_dict, so wait for
+        # the task to be registered rather than sleeping a fixed time.
+        if task := await get_task_by_gid(gid):
+            return task
+        future = bot_loop.create_future()
+        self._registered.setdefault(gid, []).append(future)
+        try:
+            await wait_for(future, timeout)
+        except TimeoutError:
+            if (futures := self._registered.get(gid)) and future in futures:
+                futures.remove(future)
+                if not futures:
+                    del self._registered[gid]
+        return await get_task_by_gid(gid)
+
+
+aria2_hub = Aria2EventHub()
+
+
+async def _resolve_name(gid, download):
+    # HTTP downloads only learn their file name from the response, so follow
+    # the shared status cache until it is known or the download ends.
+    waiter = bot_loop.create_task(aria2_hub.wait(gid))
+    try:
+        while not download.files or not download.files[0].path.name:
+            try:
+                await wait_for(shield(waiter), config_dict["ENGINE_POLL_INTERVAL"])
+                return None
+            except TimeoutError:
+                if (download := await sync_to_async(aria2_cache.get, gid)) is None:
+                    return None
+        return download
+    finally:
+        waiter.cancel()
+
+
+async def _on_download_started(gid, download):
+    if download is None or download.options.follow_torrent == "false":
         return
     if download.is_metadata:
         LOGGER.info(f"onDownloadStarted: {gid} METADATA")
-        await sleep(1)
-        if task := await get_task_by_gid(gid):
+        if task := await aria2_hub.task(gid):
             task.listener.is_torrent = True
             if task.listener.select:
                 metamsg = "Downloading Metadata, wait then you can select files. Use torrent file to avoid this wait."
                 meta = await send_message(task.listener.message, metamsg)
-                while True:
-                    await sleep(0.5)
-                    if download.is_removed or download.followed_by_ids:
-                        await delete_message(meta)
-                        break
-                    await sync_to_async(download.update)
+                await aria2_hub.wait(gid)
+                await delete_message(meta)
         return
-    else:
-        LOGGER.info(f"onDownloadStarted: {download.name} - Gid: {gid}")
-        await sleep(1)
-
-    await sleep(2)
-    if task := await get_task_by_gid(gid):
-        download = await sync_to_async(api.get_download, gid)
-        await sync_to_async(download.update)
+    LOGGER.info(f"onDownloadStarted: {download.name} - Gid: {gid}")
+    if (task := await aria2_hub.task(gid)) and (
+        download := await _resolve_name(gid, download)
+    ):
         task.listener.name = download.name
         msg, button = await stop_duplicate_check(task.listener)
         if msg:
             await task.listener.on_download_error(msg, button)
-            await sync_to_async(api.remove, [download], force=True, files=True)
+            await sync_to_async(aria2.remove, [download], force=True, files=True)
             return
 
 
-@loop_thread
-async def _on_download_complete(api, gid):
-    try:
-        download = await sync_to_async(api.get_download, gid)
-    except:
-        return
-    if download.options.follow_torrent == "false":
+async def _on_download_complete(gid, download):
+    if download is None or download.options.follow_torrent == "false":
         return
     if download.followed_by_ids:
         new_gid = download.followed_by_ids[0]
         LOGGER.info(f"Gid changed from {gid} to {new_gid}")
+        if task := await get_task_by_gid(gid):
+            # Moves the task to new_gid in the gid index.
+            await sync_to_async(task.update)
         if task := await get_task_by_gid(new_gid):
             task.listener.is_torrent = True
             if config_dict["BASE_URL"] and task.listener.select:
                 if not task.queued:
-                    await sync_to_async(api.client.force_pause, new_gid)
+                    await sync_to_async(aria2.client.force_pause, new_gid)
                 SBUTTONS = bt_selection_buttons(new_gid)
                 msg = "Your download paused. Choose files then press Done Selecting button to start downloading."
                 await send_message(task.listener.message, msg, SBUTTONS)
@@ -78,23 +201,22 @@ async def _on_download_complete(api, gid):
                 await task.listener.on_upload_error(
                     f"Seeding stopped with Ratio: {task.ratio()} and Time: {task.seeding_time()}"
                 )
-                await sync_to_async(api.remove, [download], force=True, files=True)
+                await sync_to_async(aria2.remove, [download], force=True, files=True)
     else:
         LOGGER.info(f"onDownloadComplete: {download.name} - Gid: {gid}")
-        if task := await get_task_by_gid(gid):
+        if task := await aria2_hub.task(gid):
             await task.listener.on_download_complete()
             if intervals["stopAll"]:
                 return
-            await sync_to_async(api.remove, [download], force=True, files=True)
+            await sync_to_async(aria2.remove, [download], force=True, files=True)
 
 
-@loop_thread
-async def _on_bt_download_complete(api, gid):
+async def _on_bt_download_complete(gid, download):
     seed_start_time = time()
-    await sleep(1)
-    download = await sync_to_async(api.get_download, gid)
+    if download is None:
+        return
     LOGGER.info(f"onBtDownloadComplete: {download.name} - Gid: {gid}")
-    if task := await get_task_by_gid(gid):
+    if task := await aria2_hub.task(gid):
         task.listener.is_torrent = True
         if task.listener.select:
             res = download.files
@@ -105,11 +227,11 @@ async def _on_bt_download_complete(api, gid):
                         await remove(f_path)
                     except:
                         pass
-            await clean_unwanted(download.dir)
+            await clean_unwanted(download.dir, inventory=task.listener.inventory)
         if task.listener.seed:
             try:
                 await sync_to_async(
-                    api.set_options, {"max-upload-limit": "0"}, [download]
+                    aria2.set_options, {"max-upload-limit": "0"}, [download]
                 )
             except Exception as e:
                 LOGGER.error(
@@ -117,7 +239,7 @@ async def _on_bt_download_complete(api, gid):
                 )
         else:
             try:
-                await sync_to_async(api.client.force_pause, gid)
+                await sync_to_async(aria2.client.force_pause, gid)
             except Exception as e:
                 LOGGER.error(f"{e} GID: {gid}")
         await task.listener.on_download_complete()
@@ -129,7 +251,7 @@ async def _on_bt_download_complete(api, gid):
             await task.listener.on_upload_error(
                 f"Seeding stopped with Ratio: {task.ratio()} and Time: {task.seeding_time()}"
             )
-            await sync_to_async(api.remove, [download], force=True, files=True)
+            await sync_to_async(aria2.remove, [download], force=True, files=True)
         elif (
             task.listener.seed
             and download.is_complete
@@ -139,47 +261,57 @@ async def _on_bt_download_complete(api, gid):
         elif task.listener.seed and not task.listener.is_cancelled:
             async with task_dict_lock:
                 if task.listener.mid not in task_dict:
-                    await sync_to_async(api.remove, [download], force=True, files=True)
+                    await sync_to_async(
+                        aria2.remove, [download], force=True, files=True
+                    )
                     return
                 task_dict[task.listener.mid] = Aria2Status(task.listener, gid, True)
                 task_dict[task.listener.mid].start_time = seed_start_time
             LOGGER.info(f"Seeding started: {download.name} - Gid: {gid}")
             await update_status_message(task.listener.message.chat.id)
         else:
-            await sync_to_async(api.remove, [download], force=True, files=True)
+            await sync_to_async(aria2.remove, [download], force=True, files=True)
 
 
-@loop_thread
-async def _on_download_stopped(_, gid):
-    await sleep(4)
-    if task := await get_task_by_gid(gid):
+async def _on_download_stopped(gid, _):
+    # A user cancel removes the task before aria2 reports the stop.
+    if (task := await aria2_hub.task(gid)) and not task.listener.is_cancelled:
         await task.listener.on_download_error("Dead torrent!")
 
 
-@loop_thread
-async def _on_download_error(api, gid):
-    await sleep(1)
+async def _on_download_error(gid, download):
     LOGGER.info(f"onDownloadError: {gid}")
     error = "None"
-    try:
-        download = await sync_to_async(api.get_download, gid)
-        if download.options.follow_torrent == "false":
-            return
-        error = download.error_message
-        LOGGER.info(f"Download Error: {error}")
-    except:
-        pass
-    if task := await get_task_by_gid(gid):
+    if download is not None:
+        try:
+            if download.options.follow_torrent == "false":
+                return
+            error = download.error_message
+            LOGGER.info(f"Download Error: {error}")
+        except:
+            pass
+    if (task := await aria2_hub.task(gid)) and not task.listener.is_cancelled:
         await task.listener.on_download_error(error)
 
 
+aria2_hub.handlers.update(
+    {
+        "start": _on_download_started,
+        "complete": _on_download_complete,
+        "bt_complete": _on_bt_download_complete,
+        "stop": _on_download_stopped,
+        "error": _on_download_error,
+    }
+)
+
+
 def start_aria2_listener():
     aria2.listen_to_notifications(
         threaded=False,
-        on_download_start=_on_download_started,
-        on_download_error=_on_download_error,
-        on_download_stop=_on_download_stopped,
-        on_download_complete=_on_download_complete,
-        on_bt_download_complete=_on_bt_download_complete,
+        on_download_start=lambda _, gid: aria2_hub.push("start", gid),
+        on_download_error=lambda _, gid: aria2_hub.push("error", gid),
+        on_download_stop=lambda _, gid: aria2_hub.push("stop", gid),
+        on_download_complete=lambda _, gid: aria2_hub.push("complete", gid),
+        on_bt_download_complete=lambda _, gid: aria2_hub.push("bt_complete", gid),
         timeout=60,
     )
@@ -1,7 +1,9 @@
-from time import sleep
+from asyncio import Semaphore, gather
 
-from bot import LOGGER, aria2
-from ..ext_utils.bot_utils import async_to_sync, sync_to_async
+from bot import LOGGER, aria2, config_dict
+from ..ext_utils.bot_utils import sync_to_async
+from ..ext_utils.engine_cache import aria2_cache
+from .aria2_listener import aria2_hub
 
 
 class DirectListener:
@@ -11,70 +13,84 @@ class DirectListener:
         self._a2c_opt = a2c_opt
         self._proc_bytes = 0
         self._failed = 0
-        self.download_task = None
+        self._active = {}
         self.name = self.listener.name
 
+    def _live(self):
+        return [
+            aria2_cache.get(gid) or download
+            for gid, download in list(self._active.items())
+        ]
+
     @property
     def processed_bytes(self):
-        if self.download_task:
-            return self._proc_bytes + self.download_task.completed_length
-        return self._proc_bytes
+        return self._proc_bytes + sum(
+            download.completed_length for download in self._live()
+        )
 
     @property
     def speed(self):
-        return self.download_task.download_speed if self.download_task else 0
+        return sum(download.download_speed for download in self._live())
+
+    @property
+    def is_waiting(self):
+        downloads = self._live()
+        return bool(downloads) and all(download.is_waiting for download in downloads)
 
-    def download(self, contents):
+    async def download(self, contents):
         self.is_downloading = True
-        for content in contents:
+        limit = Semaphore(max(config_dict["DIRECT_PARALLEL_DOWNLOADS"], 1))
+        await gather(*(self._download_file(content, limit) for content in contents))
+        if self.listener.is_cancelled:
+            return
+        if self._failed == len(contents):
+            await self.listener.on_download_error("All files are failed to download!")
+            return
+        await self.listener.on_download_complete()
+
+    async def _download_file(self, content, limit):
+        async with limit:
             if self.listener.is_cancelled:
-                break
+                return
+            a2c_opt = {**self._a2c_opt, "out": content["filename"]}
             if content["path"]:
-                self._a2c_opt["dir"] = f"{self._path}/{content['path']}"
+                a2c_opt["dir"] = f"{self._path}/{content['path']}"
             else:
-                self._a2c_opt["dir"] = self._path
-            filename = content["filename"]
-            self._a2c_opt["out"] = filename
+                a2c_opt["dir"] = self._path
             try:
-                self.download_task = aria2.add_uris(
-                    [content["url"]], self._a2c_opt, position=0
+                download = await sync_to_async(
+                    aria2.add_uris, [content["url"]], a2c_opt, position=0
                 )
             except Exception as e:
                 self._failed += 1
-                LOGGER.error(f"Unable to download {filename} due to: {e}")
-                continue
-            self.download_task = self.download_task.live
-            while True:
-                if self.listener.is_cancelled:
-                    if self.download_task:
-                        self.download_task.remove(True, True)
-                    break
-                self.download_task = self.download_task.live
-                if error_message := self.download_task.error_message:
-                    self._failed += 1
-                    LOGGER.error(
-                        f"Unable to download {self.download_task.name} due to: {error_message}"
-                    )
-                    self.download_task.remove(True, True)
-                    break
-                elif self.download_task.is_complete:
-                    self._proc_bytes += self.download_task.total_length
-                    self.download_task.remove(True)
-                    break
-                sleep(1)
-            self.download_task = None
-        if self.listener.is_cancelled:
-            return
-        if self._failed == len(contents):
-            async_to_sync(
-                self.listener.on_download_error, "All files are failed to download!"
-            )
-            return
-        async_to_sync(self.listener.on_download_complete)
+                LOGGER.error(f"Unable to download {content['filename']} due to: {e}")
+                return
+            if self.listener.is_cancelled:
+                # cancel_task ran while the URI was being added.
+                await sync_to_async(download.remove, True, True)
+                return
+            gid = download.gid
+            self._active[gid] = download
+            event, result = await aria2_hub.settle(gid)
+            del self._active[gid]
+            if result is not None:
+                download = result
+            if self.listener.is_cancelled:
+                await sync_to_async(download.remove, True, True)
+            elif event == "complete" and result is not None:
+                self._proc_bytes += download.total_length
+                await sync_to_async(download.remove, True)
+            else:
+                self._failed += 1
+                error_message = result.error_message if result else event
+                LOGGER.error(
+                    f"Unable to download {content['filename']} due to: {error_message}"
+                )
+                await sync_to_async(download.remove, True, True)
 
     async def cancel_task(self):
         self.listener.is_cancelled = True
         LOGGER.info(f"Cancelling Download: {self.listener.name}")
         await self.listener.on_download_error("Download Cancelled by User!")
-        if self.download_task:
-            await sync_to_async(self.download_task.remove, force=True, files=True)
+        if downloads := list(self._active.values()):
+            await sync_to_async(aria2.remove, downloads, force=True, files=True)
@@ -10,15 +10,21 @@ from bot import (
     config_dict,
     qb_torrents,
     qb_listener_lock,
+    qb_hook,
+    set_qb_hook,
     LOGGER,
 )
 from ..ext_utils.bot_utils import new_task, sync_to_async
+from ..ext_utils.engine_cache import qb_cache
 from ..ext_utils.files_utils import clean_unwanted
+from ..ext_utils.local_server import serve
 from ..ext_utils.status_utils import get_readable_time, get_task_by_gid
 from ..ext_utils.task_manager import stop_duplicate_check
 from ..mirror_leech_utils.status_utils.qbit_status import QbittorrentStatus
 from ..telegram_helper.message_utils import update_status_message
 
+REANNOUNCE_INTERVAL = 60
+
 
 async def _remove_torrent(hash_, _tag=None):
     await sync_to_async(
@@ -72,7 +78,7 @@ async def _on_download_complete(tor):
                 qbittorrent_client.torrents_pause, torrent_hashes=ext_hash
             )
         if task.listener.select:
-            await clean_unwanted(task.listener.dir)
+            await clean_unwanted(task.listener.dir, inventory=task.listener.inventory)
             path = tor.content_path.rsplit("/", 1)[0]
             res = await sync_to_async(
                 qbittorrent_client.torrents_files, torrent_hash=ext_hash
@@ -111,91 +117,131 @@ async def _on_download_complete(tor):
         await _remove_torrent(ext_hash, None)
 
 
+async def _check_torrent(tor_info, tor):
+    # tor is our mirror of the last state seen for this torrent, so one-off
+    # actions run on transitions and stalls only cost a local time check.
+    state = tor_info.state
+    changed = state != tor["state"]
+    tor["state"] = state
+    now = time()
+    if state == "metaDL":
+        TORRENT_TIMEOUT = config_dict["TORRENT_TIMEOUT"]
+        tor["stalled_time"] = now
+        if TORRENT_TIMEOUT and now - tor_info.added_on >= TORRENT_TIMEOUT:
+            del qb_torrents[tor_info.hash]
+            await _on_download_error("Dead Torrent!", tor_info)
+        elif changed or now - tor["announced"] >= REANNOUNCE_INTERVAL:
+            tor["announced"] = now
+            await sync_to_async(
+                qbittorrent_client.torrents_reannounce, torrent_hashes=tor_info.hash
+            )
+    elif state == "downloading":
+        tor["stalled_time"] = now
+        if not tor["stop_dup_check"]:
+            tor["stop_dup_check"] = True
+            await _stop_duplicate(tor_info)
+    elif state == "stalledDL":
+        TORRENT_TIMEOUT = config_dict["TORRENT_TIMEOUT"]
+        if not tor["rechecked"] and 0.99989999999999999 < tor_info.progress < 1:
+            msg = f"Force recheck - Name: {tor_info.name} Hash: "
+            msg += f"{tor_info.hash} Downloaded Bytes: {tor_info.downloaded} "
+            msg += f"Size: {tor_info.size} Total Size: {tor_info.total_size}"
+            LOGGER.warning(msg)
+            await sync_to_async(
+                qbittorrent_client.torrents_recheck, torrent_hashes=tor_info.hash
+            )
+            tor["rechecked"] = True
+        elif TORRENT_TIMEOUT and now - tor["stalled_time"] >= TORRENT_TIMEOUT:
+            del qb_torrents[tor_info.hash]
+            await _on_download_error("Dead Torrent!", tor_info)
+        elif changed or now - tor["announced"] >= REANNOUNCE_INTERVAL:
+            tor["announced"] = now
+            await sync_to_async(
+                qbittorrent_client.torrents_reannounce, torrent_hashes=tor_info.hash
+            )
+    elif state == "missingFiles":
+        if changed:
+            await sync_to_async(
+                qbittorrent_client.torrents_recheck, torrent_hashes=tor_info.hash
+            )
+    elif state == "error":
+        del qb_torrents[tor_info.hash]
+        await _on_download_error("No enough space for this torrent on device", tor_info)
+    # IMPROVED: Enhanced completion detection for 4.2.5
+    elif (
+        (tor_info.progress >= 0.999 or state in ["uploading", "stalledUP"])
+        and not tor["uploaded"]
+        and state not in ["checkingUP", "checkingDL", "checkingResumeData"]
+    ):
+        tor["uploaded"] = True
+        await _on_download_complete(tor_info)
+    elif state in ["pausedUP", "pausedDL"] and tor["seeding"]:
+        tor["seeding"] = False
+        await _on_seed_finish(tor_info)
+        await sleep(0.5)
+
+
+@new_task
+async def _on_hook(event, tor_hash):
+    # Pushed by qBittorrent's run external program option. Completion goes
+    # through the same flags as polling, so whichever sees it first wins.
+    qb_cache.invalidate()
+    if event != "finished":
+        return
+    async with qb_listener_lock:
+        if (tor := qb_torrents.get(tor_hash)) is None or tor["uploaded"]:
+            return
+        tor_info = await sync_to_async(qb_cache.get, tor_hash)
+        if tor_info is None or tor_info.state in [
+            "checkingUP",
+            "checkingDL",
+            "checkingResumeData",
+        ]:
+            return
+        tor["uploaded"] = True
+        await _on_download_complete(tor_info)
+
+
+async def _hook_route(path):
+    parts = path.strip("/").split("/")
+    if len(parts) != 3 or parts[0] != "qbit" or parts[1] not in ["added", "finished"]:
+        return None
+    _on_hook(parts[1], parts[2].lower())
+    return "OK\n"
+
+
+async def start_qbit_hook():
+    if not (port := config_dict["QBIT_HOOK_PORT"]):
+        return
+    try:
+        await serve("127.0.0.1", port, _hook_route)
+    except OSError as e:
+        LOGGER.error(f"qBittorrent hook disabled, unable to listen on {port}: {e}")
+        return
+    qb_hook["port"] = port
+    try:
+        await sync_to_async(set_qb_hook)
+    except Exception as e:
+        qb_hook["port"] = 0
+        LOGGER.error(f"Unable to set qBittorrent hook: {e}")
+
+
 @new_task
 async def _qb_listener():
     while True:
         async with qb_listener_lock:
             try:
-                torrents = await sync_to_async(qbittorrent_client.torrents_info)
+                torrents = await sync_to_async(qb_cache.get)
                 if len(torrents) == 0:
                     intervals["qb"] = ""
                     break
-                for tor_info in torrents:
-                    tor_hash = tor_info.hash
-                    if tor_hash not in qb_torrents:
-                        continue
-                    state = tor_info.state
-                    if state == "metaDL":
-                        TORRENT_TIMEOUT = config_dict["TORRENT_TIMEOUT"]
-                        qb_torrents[tor_hash]["stalled_time"] = time()
-                        if (
-                            TORRENT_TIMEOUT
-                            and time() - tor_info.added_on >= TORRENT_TIMEOUT
-                        ):
-                            await _on_download_error("Dead Torrent!", tor_info)
-                        else:
-                            await sync_to_async(
-                                qbittorrent_client.torrents_reannounce,
-                                torrent_hashes=tor_info.hash,
-                            )
-                    elif state == "downloading":
-                        qb_torrents[tor_hash]["stalled_time"] = time()
-                        if not qb_torrents[tor_hash]["stop_dup_check"]:
-                            qb_torrents[tor_hash]["stop_dup_check"] = True
-                            await _stop_duplicate(tor_info)
-                    elif state == "stalledDL":
-                        TORRENT_TIMEOUT = config_dict["TORRENT_TIMEOUT"]
-                        if (
-                            not qb_torrents[tor_hash]["rechecked"]
-                            and 0.99989999999999999 < tor_info.progress < 1
-                        ):
-                            msg = f"Force recheck - Name: {tor_info.name} Hash: "
-                            msg += f"{tor_info.hash} Downloaded Bytes: {tor_info.downloaded} "
-                            msg += f"Size: {tor_info.size} Total Size: {tor_info.total_size}"
-                            LOGGER.warning(msg)
-                            await sync_to_async(
-                                qbittorrent_client.torrents_recheck,
-                                torrent_hashes=tor_info.hash,
-                            )
-                            qb_torrents[tor_hash]["rechecked"] = True
-                        elif (
-                            TORRENT_TIMEOUT
-                            and time() - qb_torrents[tor_hash]["stalled_time"]
-                            >= TORRENT_TIMEOUT
-                        ):
-                            await _on_download_error("Dead Torrent!", tor_info)
-                        else:
-                            await sync_to_async(
-                                qbittorrent_client.torrents_reannounce,
-                                torrent_hashes=tor_info.hash,
-                            )
-                    elif state == "missingFiles":
-                        await sync_to_async(
-                            qbittorrent_client.torrents_recheck,
-                            torrent_hashes=tor_info.hash,
-                        )
-                    elif state == "error":
-                        await _on_download_error(
-                            "No enough space for this torrent on device", tor_info
-                        )
-                    # IMPROVED: Enhanced completion detection for 4.2.5
-                    elif (
-                        (tor_info.progress >= 0.999 or state in ["uploading", "stalledUP"])
-                        and not qb_torrents[tor_hash]["uploaded"]
-                        and state not in ["checkingUP", "checkingDL", "checkingResumeData"]
-                    ):
-                        qb_torrents[tor_hash]["uploaded"] = True
-                        await _on_download_complete(tor_info)
-                    elif (
-                        state in ["pausedUP", "pausedDL"]
-                        and qb_torrents[tor_hash]["seeding"]
-                    ):
-                        qb_torrents[tor_hash]["seeding"] = False
-                        await _on_seed_finish(tor_info)
-                        await sleep(0.5)
+                for tor_hash, tor in list(qb_torrents.items()):
+                    if tor_info := torrents.get(tor_hash):
+                        await _check_torrent(tor_info, tor)
             except Exception as e:
                 LOGGER.error(str(e))
-        await sleep(3)
+        # With the completion hook, polling only reconciles stalls and misses
+        await sleep(15 if qb_hook["port"] else 3)
 
 
 async def on_download_start(torrent_hash):
@@ -206,6 +252,9 @@ async def on_download_start(torrent_hash):
             "rechecked": False,
             "uploaded": False,
             "seeding": False,
+            "state": "",
+            "announced": 0,
         }
+        qb_cache.invalidate()
         if not intervals["qb"]:
             intervals["qb"] = await _qb_listener()
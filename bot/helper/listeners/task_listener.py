@@ -1,6 +1,6 @@
 from aiofiles.os import path as aiopath, listdir, makedirs, remove
 from aioshutil import move
-from asyncio import sleep, gather
+from asyncio import sleep, gather, Queue
 from html import escape
 from requests import utils as rutils
 from bot import (
@@ -23,14 +23,18 @@ from ..common import TaskConfig
 from ..ext_utils.bot_utils import sync_to_async
 from ..ext_utils.db_handler import database
 from ..ext_utils.files_utils import (
-    get_path_size,
     clean_download,
     clean_target,
     join_files,
 )
 from ..ext_utils.links_utils import is_gdrive_id
-from ..ext_utils.status_utils import get_readable_file_size
-from ..ext_utils.task_manager import start_from_queued, check_running_tasks
+from ..ext_utils.status_utils import get_readable_file_size, get_engine_name
+from ..ext_utils.task_manager import (
+    start_from_queued,
+    check_running_tasks,
+    forget_queued_task,
+)
+from ..ext_utils.task_timeline import TaskTimeline
 from ..mirror_leech_utils.gdrive_utils.upload import GoogleDriveUpload
 from ..mirror_leech_utils.rclone_utils.transfer import RcloneTransferHelper
 from ..mirror_leech_utils.status_utils.gdrive_status import GoogleDriveStatus
@@ -51,6 +55,7 @@ class TaskListener(TaskConfig):
         super().__init__()
         self.download_failed = False
         self.upload_failed = False
+        self.timeline = TaskTimeline()
 
     async def clean(self):
         try:
@@ -73,6 +78,8 @@ class TaskListener(TaskConfig):
                 self.same_dir[self.folder_name]["total"] -= 1
 
     async def on_download_start(self):
+        if self.timeline.current == "metadata":
+            self.timeline.begin("download")
         if (
             self.is_super_chat
             and config_dict["INCOMPLETE_TASK_NOTIFIER"]
@@ -127,12 +134,14 @@ class TaskListener(TaskConfig):
             download = task_dict[self.mid]
             self.name = download.name()
             gid = download.gid()
+        self.timeline.engine = get_engine_name(download)
         if not (self.is_torrent or self.is_qbit):
             self.seed = False
         unwanted_files = []
         unwanted_files_size = []
         files_to_delete = []
         if multi_links:
+            await self.timeline.save(self, "merged")
             await self.on_upload_error(
                 f"{self.name} Downloaded!\n\nWaiting for other tasks to finish..."
             )
@@ -149,70 +158,93 @@ class TaskListener(TaskConfig):
                 await self.on_upload_error(str(e))
                 return
         up_path = f"{self.dir}/{self.name}"
-        self.size = await get_path_size(up_path)
+        self.size = await self.inventory.size(up_path)
+        self.timeline.end(self.size)
         if not config_dict["QUEUE_ALL"]:
             async with queue_dict_lock:
                 if self.mid in non_queued_dl:
                     non_queued_dl.remove(self.mid)
             await start_from_queued()
         if self.join and await aiopath.isdir(up_path):
-            await join_files(up_path)
+            with self.timeline.stage("join", self.size):
+                await join_files(up_path)
         if self.extract:
-            up_path = await self.proceed_extract(up_path, gid)
+            with self.timeline.stage("extract", self.size):
+                up_path = await self.proceed_extract(up_path, gid)
             if self.is_cancelled:
                 return
             up_dir, self.name = up_path.rsplit("/", 1)
-            self.size = await get_path_size(up_dir)
+            self.size = await self.inventory.size(up_dir)
         if self.ffmpeg_cmds:
-            up_path = await self.proceed_ffmpeg(
-                up_path,
-                gid,
-            )
+            with self.timeline.stage("ffmpeg", self.size):
+                up_path = await self.proceed_ffmpeg(
+                    up_path,
+                    gid,
+                )
             if self.is_cancelled:
                 return
             up_dir, self.name = up_path.rsplit("/", 1)
-            self.size = await get_path_size(up_dir)
+            self.size = await self.inventory.size(up_dir)
         if self.name_sub:
-            up_path = await self.substitute(up_path)
+            with self.timeline.stage("rename", self.size):
+                up_path = await self.substitute(up_path)
             if self.is_cancelled:
                 return
             self.name = up_path.rsplit("/", 1)[1]
         if self.screen_shots:
-            up_path = await self.generate_screenshots(up_path)
+            with self.timeline.stage("screenshots", self.size):
+                up_path = await self.generate_screenshots(up_path)
             if self.is_cancelled:
                 return
             up_dir, self.name = up_path.rsplit("/", 1)
-            self.size = await get_path_size(up_dir)
+            self.size = await self.inventory.size(up_dir)
         if self.convert_audio or self.convert_video:
-            up_path = await self.convert_media(
-                up_path,
-                gid,
-                unwanted_files,
-                unwanted_files_size,
-                files_to_delete,
-            )
+            with self.timeline.stage("convert", self.size):
+                up_path = await self.convert_media(
+                    up_path,
+                    gid,
+                    unwanted_files,
+                    unwanted_files_size,
+                    files_to_delete,
+                )
             if self.is_cancelled:
                 return
             up_dir, self.name = up_path.rsplit("/", 1)
-            self.size = await get_path_size(up_dir)
+            self.size = await self.inventory.size(up_dir)
         if self.sample_video:
-            up_path = await self.generate_sample_video(
-                up_path, gid, unwanted_files, files_to_delete
-            )
+            with self.timeline.stage("sample", self.size):
+                up_path = await self.generate_sample_video(
+                    up_path, gid, unwanted_files, files_to_delete
+                )
             if self.is_cancelled:
                 return
             up_dir, self.name = up_path.rsplit("/", 1)
-            self.size = await get_path_size(up_dir)
-        if self.compress:
-            up_path = await self.proceed_compress(
-                up_path, gid, unwanted_files, files_to_delete
+            self.size = await self.inventory.size(up_dir)
+        if (
+            self.compress
+            and self.is_leech
+            and config_dict["STREAM_ZIP_UPLOAD"]
+            and not isinstance(self.compress, str)
+            and await self.inventory.size(up_path) > self.split_size
+        ):
+            await self.proceed_stream_upload(
+                up_path, gid, unwanted_files, unwanted_files_size, files_to_delete
             )
+            return
+        if self.compress:
+            with self.timeline.stage("compress", self.size):
+                up_path = await self.proceed_compress(
+                    up_path, gid, unwanted_files, files_to_delete
+                )
             if self.is_cancelled:
                 return
         up_dir, self.name = up_path.rsplit("/", 1)
-        self.size = await get_path_size(up_dir)
+        self.size = await self.inventory.size(up_dir)
         if self.is_leech and not self.compress:
-            await self.proceed_split(up_dir, unwanted_files_size, unwanted_files, gid)
+            with self.timeline.stage("split", self.size):
+                await self.proceed_split(
+                    up_dir, unwanted_files_size, unwanted_files, gid
+                )
             if self.is_cancelled:
                 return
         add_to_queue, event = await check_running_tasks(self, "up")
@@ -223,9 +255,10 @@ class TaskListener(TaskConfig):
             await event.wait()
             if self.is_cancelled:
                 return
-        self.size = await get_path_size(up_dir)
+        self.size = await self.inventory.size(up_dir)
         for s in unwanted_files_size:
             self.size -= s
+        self.timeline.begin("upload", self.size)
 
         if self.is_leech:
             tg = TelegramUploader(self, up_dir)
@@ -252,9 +285,31 @@ class TaskListener(TaskConfig):
                 RCTransfer.upload(up_path, unwanted_files, files_to_delete),
             )
 
+    async def proceed_stream_upload(self, up_path, gid, o_files, m_size, ft_delete):
+        add_to_queue, event = await check_running_tasks(self, "up")
+        await start_from_queued()
+        if add_to_queue:
+            async with task_dict_lock:
+                task_dict[self.mid] = QueueStatus(self, gid, "Up")
+            await event.wait()
+            if self.is_cancelled:
+                return
+        self.size = await self.inventory.size(up_path) - sum(m_size)
+        self.timeline.begin("upload", self.size)
+        volumes = Queue(2)
+        tg = TelegramUploader(self, f"{self.dir}10000")
+        async with task_dict_lock:
+            task_dict[self.mid] = TelegramStatus(self, tg, gid, "up")
+        await gather(
+            update_status_message(self.message.chat.id),
+            self.proceed_stream_compress(up_path, o_files, ft_delete, volumes),
+            tg.upload_stream(volumes),
+        )
+
     async def on_upload_complete(
         self, link, files, folders, mime_type, rclone_path="", dir_id=""
     ):
+        await self.timeline.save(self, "done")
         if (
             self.is_super_chat
             and config_dict["INCOMPLETE_TASK_NOTIFIER"]
@@ -364,6 +419,7 @@ class TaskListener(TaskConfig):
         await start_from_queued()
 
     async def on_download_error(self, error, button=None):
+        await self.timeline.save(self, "failed")
         async with task_dict_lock:
             if self.mid in task_dict:
                 del task_dict[self.mid]
@@ -401,6 +457,7 @@ class TaskListener(TaskConfig):
             if self.mid in queued_dl:
                 queued_dl[self.mid].set()
                 del queued_dl[self.mid]
+                await forget_queued_task(self)
             if self.mid in queued_up:
                 queued_up[self.mid].set()
                 del queued_up[self.mid]
@@ -417,6 +474,7 @@ class TaskListener(TaskConfig):
             await remove(self.thumb)
 
     async def on_upload_error(self, error):
+        await self.timeline.save(self, "failed")
         async with task_dict_lock:
             if self.mid in task_dict:
                 del task_dict[self.mid]
@@ -452,6 +510,7 @@ class TaskListener(TaskConfig):
             if self.mid in queued_dl:
                 queued_dl[self.mid].set()
                 del queued_dl[self.mid]
+                await forget_queued_task(self)
             if self.mid in queued_up:
                 queued_up[self.mid].set()
                 del queued_up[self.mid]
@@ -6,6 +6,7 @@ from pyrogram.errors import FloodWait, PeerIdInvalid
 from pyrogram import types
 
 from ..ext_utils.db_handler import database, sanitize_filename
+from ..telegram_helper.rate_limiter import tg_limit
 from ..telegram_helper.message_utils import edit_message
 
 LOGGER = logging.getLogger(__name__)
@@ -45,7 +46,8 @@ class ChannelScanner:
         try:
             # STEP 1: Get channel info using user session
             try:
-                chat = await self.user_client.get_chat(self.channel_id)
+                async with tg_limit(self.user_client, "get_messages"):
+                    chat = await self.user_client.get_chat(self.channel_id)
                 await self._update_status(f"📋 Scanning channel: **{chat.title}**")
                 LOGGER.info(f"Starting scan for channel: {chat.title} ({self.channel_id})")
             except PeerIdInvalid:
@@ -64,13 +66,15 @@ class ChannelScanner:
                 raise
             
             # STEP 2: Get total message count and latest message ID
-            total_messages = await self.user_client.get_chat_history_count(self.channel_id)
+            async with tg_limit(self.user_client, "get_messages"):
+                total_messages = await self.user_client.get_chat_history_count(self.channel_id)
             
             # Get latest message ID (starting point)
             latest_msg = None
-            async for msg in self.user_client.get_chat_history(self.channel_id, limit=1):
-                latest_msg = msg
-                break
+            async with tg_limit(self.user_client, "get_messages"):
+                async for msg in self.user_client.get_chat_history(self.channel_id, limit=1):
+                    latest_msg = msg
+                    break
             
             if not latest_msg:
                 await self._update_status("❌ **No messages found in channel**")
@@ -96,8 +100,7 @@ class ChannelScanner:
         except FloodWait as e:
             LOGGER.warning(f'FloodWait: waiting {e.x}s')
             await self._update_status(f'⏳ Rate limited, waiting {e.x}s...')
-            await asyncio.sleep(e.x + 1)
-            await self.scan(status_msg)  # Resume
+            await self.scan(status_msg)  # Resume once the paused bucket reopens
             
         except Exception as e:
             LOGGER.error(f"Scanning error: {e}", exc_info=True)
@@ -122,10 +125,11 @@ class ChannelScanner:
             LOGGER.info(f"Batch {batch_num}: Fetching messages {message_ids[-1]}-{message_ids[0]}")
             
             try:
-                messages = await self.bot_client.get_messages(
-                    self.channel_id,
-                    message_ids=message_ids
-                )
+                async with tg_limit(self.bot_client, "get_messages"):
+                    messages = await self.bot_client.get_messages(
+                        self.channel_id,
+                        message_ids=message_ids
+                    )
                 
                 valid_messages = [msg for msg in messages if msg and not isinstance(msg, int)]
                 
@@ -150,7 +154,6 @@ class ChannelScanner:
                 
             except FloodWait as e:
                 LOGGER.warning(f'FloodWait in batch: {e.x}s')
-                await asyncio.sleep(e.x + 1)
                 continue
             
             except Exception as e:
@@ -10,7 +10,9 @@ from bot import (
     aria2c_global,
 )
 from ...ext_utils.bot_utils import bt_selection_buttons, sync_to_async
+from ...ext_utils.Hash_Fetch import get_torrent_size
 from ...ext_utils.task_manager import check_running_tasks
+from ...listeners.aria2_listener import aria2_hub
 from ...mirror_leech_utils.status_utils.aria2_status import Aria2Status
 from ...telegram_helper.message_utils import send_status_message, send_message
 
@@ -30,6 +32,10 @@ async def add_aria2c_download(listener, dpath, header, ratio, seed_time):
     if TORRENT_TIMEOUT := config_dict["TORRENT_TIMEOUT"]:
         a2c_opt["bt-stop-timeout"] = f"{TORRENT_TIMEOUT}"
 
+    # Size estimate for the queue disk check
+    if not listener.size and await aiopath.exists(listener.link):
+        listener.size = await sync_to_async(get_torrent_size, listener.link) or 0
+
     add_to_queue, event = await check_running_tasks(listener)
     if add_to_queue:
         if listener.link.startswith("magnet:"):
@@ -55,6 +61,7 @@ async def add_aria2c_download(listener, dpath, header, ratio, seed_time):
     name = download.name
     async with task_dict_lock:
         task_dict[listener.mid] = Aria2Status(listener, gid, queued=add_to_queue)
+    aria2_hub.task_added(gid)
     if add_to_queue:
         LOGGER.info(f"Added to Queue/Download: {name}. Gid: {gid}")
         if (not listener.select or not download.is_torrent) and listener.multi <= 1:
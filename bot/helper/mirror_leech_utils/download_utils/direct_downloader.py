@@ -7,7 +7,6 @@ from bot import (
     task_dict,
     task_dict_lock,
 )
-from ...ext_utils.bot_utils import sync_to_async
 from ...ext_utils.task_manager import check_running_tasks, stop_duplicate_check
 from ...listeners.direct_listener import DirectListener
 from ...mirror_leech_utils.status_utils.direct_status import DirectStatus
@@ -63,4 +62,4 @@ async def add_direct_download(listener, path):
         if listener.multi <= 1:
             await send_status_message(listener.message)
 
-    await sync_to_async(directListener.download, contents)
+    await directListener.download(contents)
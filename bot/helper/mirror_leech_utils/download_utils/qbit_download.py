@@ -17,7 +17,7 @@ from ...telegram_helper.message_utils import (
     delete_message,
     send_status_message,
 )
-from ...ext_utils.Hash_Fetch import get_hash_magnet, get_hash_file
+from ...ext_utils.Hash_Fetch import get_hash_magnet, get_hash_file, get_torrent_size
 
 
 async def add_qb_torrent(listener, path, ratio, seed_time):
@@ -46,6 +46,10 @@ async def add_qb_torrent(listener, path, ratio, seed_time):
             except Exception:
                 pass  # non-fatal; proceed to add
 
+        # Size estimate for the queue disk check
+        if tpath and not listener.size:
+            listener.size = await sync_to_async(get_torrent_size, tpath) or 0
+
         add_to_queue, event = await check_running_tasks(listener)
 
         # Add torrent (keep tags for compatibility, but tracking will be hash-first)
@@ -203,6 +207,10 @@ async def add_qb_torrent_ghostleech(listener, torrent_path, ratio, seed_time):
         except Exception:
             pass  # non-fatal; proceed to add
 
+        # Size estimate for the queue disk check
+        if not listener.size:
+            listener.size = await sync_to_async(get_torrent_size, torrent_path) or 0
+
         add_to_queue, event = await check_running_tasks(listener)
 
         # Add .torrent file (start if not queued)
@@ -13,6 +13,7 @@ from ...ext_utils.task_manager import check_running_tasks, stop_duplicate_check
 from ...mirror_leech_utils.status_utils.queue_status import QueueStatus
 from ...mirror_leech_utils.status_utils.telegram_status import TelegramStatus
 from ...telegram_helper.message_utils import send_status_message
+from ...telegram_helper.rate_limiter import tg_limit
 
 global_lock = Lock()
 GLOBAL_GID = set()
@@ -127,10 +128,11 @@ class TelegramDownloadHelper:
                 # Start download with enhanced error handling
                 download_start_time = time()
                 try:
-                    download_result = await message.download(
-                        file_name=path, 
-                        progress=self._on_download_progress
-                    )
+                    async with tg_limit(message._client, "download"):
+                        download_result = await message.download(
+                            file_name=path, 
+                            progress=self._on_download_progress
+                        )
                 except TimeoutError as timeout_err:
                     download_time = time() - download_start_time
                     raise TimeoutError(f"Download timeout after {download_time:.1f}s: {str(timeout_err)}")
@@ -166,9 +168,8 @@ class TelegramDownloadHelper:
                     raise Exception("Download returned None - no data received")
                 
             except FloodWait as f:
-                wait_time = f.value + 5  # Add 5 seconds buffer
-                LOGGER.warning(f"FloodWait: sleeping for {wait_time}s - {self._listener.name}")
-                await sleep(wait_time)
+                # The download bucket is paused for the wait, next attempt queues on it
+                LOGGER.warning(f"FloodWait: {f.value}s - {self._listener.name}")
                 continue  # Don't count FloodWait as a retry
                 
             except TimeoutError as e:
@@ -226,9 +227,10 @@ class TelegramDownloadHelper:
             and self._listener.is_super_chat
         ):
             self.session = "user"
-            message = await user.get_messages(
-                chat_id=message.chat.id, message_ids=message.id
-            )
+            async with tg_limit(user, "get_messages"):
+                message = await user.get_messages(
+                    chat_id=message.chat.id, message_ids=message.id
+                )
         elif self.session != "user":
             self.session = "bot"
         
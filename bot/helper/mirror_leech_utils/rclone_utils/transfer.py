@@ -282,7 +282,10 @@ class RcloneTransferHelper:
         if await aiopath.isdir(path):
             mime_type = "Folder"
             folders, files = await count_files_and_folders(
-                path, self._listener.extension_filter, unwanted_files
+                path,
+                self._listener.extension_filter,
+                unwanted_files,
+                self._listener.inventory,
             )
             rc_path += f"/{self._listener.name}" if rc_path else self._listener.name
         else:
@@ -360,7 +363,7 @@ class RcloneTransferHelper:
             return
         LOGGER.info(f"Upload Done. Path: {destination}")
         if self._listener.seed and not self._listener.new_dir:
-            await clean_unwanted(path, ft_delete)
+            await clean_unwanted(path, ft_delete, self._listener.inventory)
         await self._listener.on_upload_complete(
             link, files, folders, mime_type, destination
         )
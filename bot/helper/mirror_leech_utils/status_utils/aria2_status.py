@@ -1,7 +1,8 @@
 from time import time
 
-from bot import aria2, LOGGER
+from bot import aria2, task_dict, LOGGER
 from ...ext_utils.bot_utils import sync_to_async
+from ...ext_utils.engine_cache import aria2_cache
 from ...ext_utils.status_utils import MirrorStatus, get_readable_time
 
 
@@ -24,13 +25,14 @@ class Aria2Status:
         self.seeding = seeding
 
     def update(self):
-        if self._download is None:
-            self._download = get_download(self._gid, self._download)
-        else:
-            self._download = self._download.live
+        if download := aria2_cache.get(self._gid):
+            self._download = download
+        elif self._download is None:
+            self._download = get_download(self._gid)
         if self._download.followed_by_ids:
             self._gid = self._download.followed_by_ids[0]
-            self._download = get_download(self._gid)
+            self._download = aria2_cache.get(self._gid) or get_download(self._gid)
+            task_dict.refresh_gid(self.listener.mid, self)
 
     def progress(self):
         return self._download.progress_string()
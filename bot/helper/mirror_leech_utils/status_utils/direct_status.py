@@ -6,6 +6,8 @@ from ...ext_utils.status_utils import (
 
 
 class DirectStatus:
+    live_status = True
+
     def __init__(self, listener, obj, gid):
         self._gid = gid
         self._obj = obj
@@ -40,7 +42,7 @@ class DirectStatus:
             return "-"
 
     def status(self):
-        if self._obj.download_task and self._obj.download_task.is_waiting:
+        if self._obj.is_waiting:
             return MirrorStatus.STATUS_QUEUEDL
         return MirrorStatus.STATUS_DOWNLOAD
 
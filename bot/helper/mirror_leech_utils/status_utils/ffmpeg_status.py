@@ -1,5 +1,10 @@
 from bot import LOGGER, subprocess_lock
-from ...ext_utils.status_utils import get_readable_file_size, MirrorStatus
+from ...ext_utils.status_utils import (
+    get_readable_file_size,
+    MirrorStatus,
+    get_readable_time,
+)
+from ...ext_utils.task_manager import cpu_pool
 
 
 class FFmpegStatus:
@@ -12,6 +17,23 @@ class FFmpegStatus:
     def gid(self):
         return self._gid
 
+    def progress(self):
+        return f"{round(self.listener.ffprogress.progress_raw, 2)}%"
+
+    def speed(self):
+        return f"{get_readable_file_size(self.listener.ffprogress.speed_raw)}/s ({self.listener.ffprogress.time_rate}x)"
+
+    def processed_bytes(self):
+        return get_readable_file_size(self.listener.ffprogress.processed_bytes)
+
+    def eta(self):
+        if eta := self.listener.ffprogress.eta_raw:
+            return get_readable_time(eta)
+        return "-"
+
+    def queue_position(self):
+        return cpu_pool.position(self.listener)
+
     def name(self):
         return self.listener.name
 
@@ -34,10 +56,9 @@ class FFmpegStatus:
     async def cancel_task(self):
         LOGGER.info(f"Cancelling {self.cstatus}: {self.listener.name}")
         self.listener.is_cancelled = True
+        cpu_pool.cancel(self.listener)
         async with subprocess_lock:
-            if (
-                self.listener.subproc is not None
-                and self.listener.subproc.returncode is None
-            ):
-                self.listener.subproc.kill()
+            for subproc in [self.listener.subproc, *self.listener.subprocs]:
+                if subproc is not None and subproc.returncode is None:
+                    subproc.kill()
         await self.listener.on_upload_error(f"{self.cstatus} stopped by user!")
@@ -1,7 +1,14 @@
 from asyncio import sleep, gather
 
-from bot import LOGGER, qbittorrent_client, qb_torrents, qb_listener_lock
+from bot import (
+    LOGGER,
+    qbittorrent_client,
+    qb_torrents,
+    qb_listener_lock,
+    task_dict,
+)
 from ...ext_utils.bot_utils import sync_to_async
+from ...ext_utils.engine_cache import qb_cache
 from ...ext_utils.status_utils import (
     MirrorStatus,
     get_readable_file_size,
@@ -10,25 +17,14 @@ from ...ext_utils.status_utils import (
 
 
 def _get_by_hash(hsh, old_info=None):
-    try:
-        res = qbittorrent_client.torrents_info(torrent_hashes=hsh)
-        if res:
-            return res[0]
-        return old_info
-    except Exception as e:
-        LOGGER.error(f"{e}: Qbittorrent, while getting torrent info. Hash: {hsh}")
-        return old_info
+    return qb_cache.get(hsh) or old_info
 
 
 def _get_by_tag(tag, old_info=None):
-    try:
-        res = qbittorrent_client.torrents_info(tag=tag)
-        if res:
-            return res[0]
-        return old_info
-    except Exception as e:
-        LOGGER.error(f"{e}: Qbittorrent, while getting torrent info. Tag: {tag}")
-        return old_info
+    for tor in qb_cache.get().values():
+        if tag in tor.tags.split(", "):
+            return tor
+    return old_info
 
 
 class QbittorrentStatus:
@@ -45,6 +41,7 @@ class QbittorrentStatus:
         else:
             # Fallback to tag-based for backward-compat cases
             self._info = _get_by_tag(f"{self.listener.mid}", self._info)
+            task_dict.refresh_gid(self.listener.mid, self)
 
     def progress(self):
         return f"{round(self._info.progress * 100, 2)}%"
@@ -193,6 +190,8 @@ class QbittorrentStatus:
         return self.hash()[:12]
 
     def hash(self):
+        if self.torrent_hash:
+            return self.torrent_hash
         return self._info.hash
 
     async def cancel_task(self):
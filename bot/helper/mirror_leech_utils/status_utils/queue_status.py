@@ -1,5 +1,6 @@
 from bot import LOGGER
 from ...ext_utils.status_utils import get_readable_file_size, MirrorStatus
+from ...ext_utils.task_manager import queue_reasons
 
 
 class QueueStatus:
@@ -38,6 +39,9 @@ class QueueStatus:
     def task(self):
         return self
 
+    def queue_reason(self):
+        return queue_reasons.get(self.listener.mid, "")
+
     async def cancel_task(self):
         self.listener.is_cancelled = True
         LOGGER.info(f"Cancelling Queue{self._status}: {self.listener.name}")
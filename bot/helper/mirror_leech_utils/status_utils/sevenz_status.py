@@ -7,6 +7,7 @@ from ...ext_utils.status_utils import (
     MirrorStatus,
     get_readable_time,
 )
+from ...ext_utils.task_manager import cpu_pool
 
 
 class SevenZStatus:
@@ -37,6 +38,9 @@ class SevenZStatus:
     def speed(self):
         return f"{get_readable_file_size(self.speed_raw())}/s"
 
+    def queue_position(self):
+        return cpu_pool.position(self.listener)
+
     def name(self):
         return self.listener.name
 
@@ -60,7 +64,12 @@ class SevenZStatus:
         return get_readable_file_size(self._proccessed_bytes)
 
     async def processed_raw(self):
-        if self.listener.new_dir:
+        if self.cstatus == "Extract" and (progress := self.listener.sevenz_progress):
+            self._size = sum(size for size, _ in progress.values())
+            self._proccessed_bytes = sum(
+                size * percent / 100 for size, percent in progress.values()
+            )
+        elif self.listener.new_dir:
             self._proccessed_bytes = await get_path_size(self.listener.new_dir)
         else:
             self._proccessed_bytes = await get_path_size(self.listener.dir) - self._size
@@ -71,10 +80,9 @@ class SevenZStatus:
     async def cancel_task(self):
         LOGGER.info(f"Cancelling {self.cstatus}: {self.listener.name}")
         self.listener.is_cancelled = True
+        cpu_pool.cancel(self.listener)
         async with subprocess_lock:
-            if (
-                self.listener.subproc is not None
-                and self.listener.subproc.returncode is None
-            ):
-                self.listener.subproc.kill()
+            for subproc in [self.listener.subproc, *self.listener.subprocs]:
+                if subproc is not None and subproc.returncode is None:
+                    subproc.kill()
         await self.listener.on_upload_error(f"{self.cstatus} stopped by user!")
@@ -1,9 +1,9 @@
 from PIL import Image
-from aioshutil import copy, rmtree
+from aioshutil import rmtree
 from asyncio import sleep
 from logging import getLogger
 from natsort import natsorted
-from os import walk, path as ospath
+from os import path as ospath
 from time import time
 from re import match as re_match, sub as re_sub
 from pyrogram.errors import FloodWait, RPCError, BadRequest
@@ -28,9 +28,14 @@ from tenacity import (
 )
 
 from bot import config_dict, user
-from ..ext_utils.bot_utils import sync_to_async
-from ..ext_utils.files_utils import clean_unwanted, is_archive, get_base_name
+from ..ext_utils.files_utils import (
+    clean_unwanted,
+    is_archive,
+    get_base_name,
+    clone_file,
+)
 from ..telegram_helper.message_utils import delete_message
+from ..telegram_helper.rate_limiter import tg_limit
 from ..ext_utils.media_utils import (
     get_media_info,
     get_document_type,
@@ -97,36 +102,41 @@ class TelegramUploader:
             )
             try:
                 if self._user_session:
-                    self._sent_msg = await user.send_message(
-                        chat_id=self._listener.up_dest,
-                        text=msg,
-                        disable_web_page_preview=True,
-                        message_thread_id=self._listener.chat_thread_id,
-                        disable_notification=True,
-                    )
+                    async with tg_limit(user, "send"):
+                        self._sent_msg = await user.send_message(
+                            chat_id=self._listener.up_dest,
+                            text=msg,
+                            disable_web_page_preview=True,
+                            message_thread_id=self._listener.chat_thread_id,
+                            disable_notification=True,
+                        )
                 else:
-                    self._sent_msg = await self._listener.client.send_message(
-                        chat_id=self._listener.up_dest,
-                        text=msg,
-                        disable_web_page_preview=True,
-                        message_thread_id=self._listener.chat_thread_id,
-                        disable_notification=True,
-                    )
+                    async with tg_limit(self._listener.client, "send"):
+                        self._sent_msg = await self._listener.client.send_message(
+                            chat_id=self._listener.up_dest,
+                            text=msg,
+                            disable_web_page_preview=True,
+                            message_thread_id=self._listener.chat_thread_id,
+                            disable_notification=True,
+                        )
                     self._is_private = self._sent_msg.chat.type.name == "PRIVATE"
             except Exception as e:
                 await self._listener.on_upload_error(str(e))
                 return False
         elif self._user_session:
-            self._sent_msg = await user.get_messages(
-                chat_id=self._listener.message.chat.id, message_ids=self._listener.mid
-            )
-            if self._sent_msg is None:
-                self._sent_msg = await user.send_message(
+            async with tg_limit(user, "get_messages"):
+                self._sent_msg = await user.get_messages(
                     chat_id=self._listener.message.chat.id,
-                    text="Deleted Cmd Message! Don't delete the cmd message again!",
-                    disable_web_page_preview=True,
-                    disable_notification=True,
+                    message_ids=self._listener.mid,
                 )
+            if self._sent_msg is None:
+                async with tg_limit(user, "send"):
+                    self._sent_msg = await user.send_message(
+                        chat_id=self._listener.message.chat.id,
+                        text="Deleted Cmd Message! Don't delete the cmd message again!",
+                        disable_web_page_preview=True,
+                        disable_notification=True,
+                    )
         else:
             self._sent_msg = self._listener.message
         return True
@@ -144,7 +154,7 @@ class TelegramUploader:
                 dirpath = f"{dirpath}/copied_mltb"
                 await makedirs(dirpath, exist_ok=True)
                 new_path = ospath.join(dirpath, f"{self._lprefix} {file_}")
-                self._up_path = await copy(self._up_path, new_path)
+                self._up_path = await clone_file(self._up_path, new_path)
             else:
                 new_path = ospath.join(dirpath, f"{self._lprefix} {file_}")
                 await rename(self._up_path, new_path)
@@ -176,7 +186,7 @@ class TelegramUploader:
                 dirpath = f"{dirpath}/copied_mltb"
                 await makedirs(dirpath, exist_ok=True)
                 new_path = ospath.join(dirpath, f"{name}{ext}")
-                self._up_path = await copy(self._up_path, new_path)
+                self._up_path = await clone_file(self._up_path, new_path)
             else:
                 new_path = ospath.join(dirpath, f"{name}{ext}")
                 await rename(self._up_path, new_path)
@@ -204,29 +214,33 @@ class TelegramUploader:
         ]
         for i in range(0, len(inputs), 10):
             batch = inputs[i : i + 10]
-            self._sent_msg = (
-                await self._sent_msg.reply_media_group(
-                    media=batch,
-                    quote=True,
-                    disable_notification=True,
-                )
-            )[-1]
+            async with tg_limit(self._sent_msg._client, "upload"):
+                self._sent_msg = (
+                    await self._sent_msg.reply_media_group(
+                        media=batch,
+                        quote=True,
+                        disable_notification=True,
+                    )
+                )[-1]
 
     async def _send_media_group(self, subkey, key, msgs):
         for index, msg in enumerate(msgs):
             if self._listener.mixed_leech or not self._user_session:
-                msgs[index] = await self._listener.client.get_messages(
-                    chat_id=msg[0], message_ids=msg[1]
-                )
+                async with tg_limit(self._listener.client, "get_messages"):
+                    msgs[index] = await self._listener.client.get_messages(
+                        chat_id=msg[0], message_ids=msg[1]
+                    )
             else:
-                msgs[index] = await user.get_messages(
-                    chat_id=msg[0], message_ids=msg[1]
-                )
-        msgs_list = await msgs[0].reply_to_message.reply_media_group(
-            media=self._get_input_media(subkey, key),
-            quote=False,
-            disable_notification=True,
-        )
+                async with tg_limit(user, "get_messages"):
+                    msgs[index] = await user.get_messages(
+                        chat_id=msg[0], message_ids=msg[1]
+                    )
+        async with tg_limit(msgs[0]._client, "upload"):
+            msgs_list = await msgs[0].reply_to_message.reply_media_group(
+                media=self._get_input_media(subkey, key),
+                quote=False,
+                disable_notification=True,
+            )
         for msg in msgs:
             if msg.link in self._msgs_dict:
                 del self._msgs_dict[msg.link]
@@ -242,7 +256,9 @@ class TelegramUploader:
         res = await self._msg_to_reply()
         if not res:
             return
-        for dirpath, _, files in natsorted(await sync_to_async(walk, self._path)):
+        for dirpath, _, files in natsorted(
+            await self._listener.inventory.walk(self._path)
+        ):
             if dirpath.endswith("/yt-dlp-thumb"):
                 continue
             if dirpath.endswith("_mltbss"):
@@ -250,84 +266,103 @@ class TelegramUploader:
                 await rmtree(dirpath, ignore_errors=True)
                 continue
             for file_ in natsorted(files):
-                delete_file = False
-                self._up_path = f_path = ospath.join(dirpath, file_)
-                if self._up_path in ft_delete:
-                    delete_file = True
-                if self._up_path in o_files:
-                    continue
-                if file_.lower().endswith(tuple(self._listener.extension_filter)):
-                    if not self._listener.seed or self._listener.new_dir:
-                        await remove(self._up_path)
-                    continue
-                try:
-                    f_size = await aiopath.getsize(self._up_path)
-                    self._total_files += 1
-                    if f_size == 0:
-                        LOGGER.error(
-                            f"{self._up_path} size is zero, telegram don't upload zero size files"
+                if not await self._upload_path(dirpath, file_, o_files, ft_delete):
+                    return
+        await self._finalize()
+
+    async def upload_stream(self, volumes):
+        await self._user_settings()
+        res = await self._msg_to_reply()
+        if not res:
+            return
+        while (f_path := await volumes.get()) is not None:
+            dirpath, file_ = f_path.rsplit("/", 1)
+            if not await self._upload_path(dirpath, file_, [], []):
+                return
+        if self._listener.is_cancelled:
+            return
+        await self._finalize()
+
+    async def _upload_path(self, dirpath, file_, o_files, ft_delete):
+        delete_file = False
+        self._up_path = f_path = ospath.join(dirpath, file_)
+        if self._up_path in ft_delete:
+            delete_file = True
+        if self._up_path in o_files:
+            return True
+        if file_.lower().endswith(tuple(self._listener.extension_filter)):
+            if not self._listener.seed or self._listener.new_dir:
+                await remove(self._up_path)
+            return True
+        try:
+            f_size = self._listener.inventory.file_size(self._up_path)
+            self._total_files += 1
+            if f_size == 0:
+                LOGGER.error(
+                    f"{self._up_path} size is zero, telegram don't upload zero size files"
+                )
+                self._corrupted += 1
+                return True
+            if self._listener.is_cancelled:
+                return False
+            cap_mono = await self._prepare_file(file_, dirpath, delete_file)
+            if self._last_msg_in_group:
+                group_lists = [x for v in self._media_dict.values() for x in v.keys()]
+                match = re_match(r".+(?=\.0*\d+$)|.+(?=\.part\d+\..+$)", f_path)
+                if not match or match and match.group(0) not in group_lists:
+                    for key, value in list(self._media_dict.items()):
+                        for subkey, msgs in list(value.items()):
+                            if len(msgs) > 1:
+                                await self._send_media_group(subkey, key, msgs)
+            if self._listener.mixed_leech:
+                self._user_session = f_size > 2097152000
+                if self._user_session:
+                    async with tg_limit(user, "get_messages"):
+                        self._sent_msg = await user.get_messages(
+                            chat_id=self._sent_msg.chat.id,
+                            message_ids=self._sent_msg.id,
                         )
-                        self._corrupted += 1
-                        continue
-                    if self._listener.is_cancelled:
-                        return
-                    cap_mono = await self._prepare_file(file_, dirpath, delete_file)
-                    if self._last_msg_in_group:
-                        group_lists = [
-                            x for v in self._media_dict.values() for x in v.keys()
-                        ]
-                        match = re_match(r".+(?=\.0*\d+$)|.+(?=\.part\d+\..+$)", f_path)
-                        if not match or match and match.group(0) not in group_lists:
-                            for key, value in list(self._media_dict.items()):
-                                for subkey, msgs in list(value.items()):
-                                    if len(msgs) > 1:
-                                        await self._send_media_group(subkey, key, msgs)
-                    if self._listener.mixed_leech:
-                        self._user_session = f_size > 2097152000
-                        if self._user_session:
-                            self._sent_msg = await user.get_messages(
-                                chat_id=self._sent_msg.chat.id,
-                                message_ids=self._sent_msg.id,
-                            )
-                        else:
-                            self._sent_msg = await self._listener.client.get_messages(
-                                chat_id=self._sent_msg.chat.id,
-                                message_ids=self._sent_msg.id,
-                            )
-                    self._last_msg_in_group = False
-                    self._last_uploaded = 0
-                    await self._upload_file(cap_mono, file_, f_path)
-                    if self._listener.is_cancelled:
-                        return
-                    if (
-                        not self._is_corrupted
-                        and (self._listener.is_super_chat or self._listener.up_dest)
-                        and not self._is_private
-                    ):
-                        self._msgs_dict[self._sent_msg.link] = file_
-                    await sleep(1)
-                except Exception as err:
-                    if isinstance(err, RetryError):
-                        LOGGER.info(
-                            f"Total Attempts: {err.last_attempt.attempt_number}"
+                else:
+                    async with tg_limit(self._listener.client, "get_messages"):
+                        self._sent_msg = await self._listener.client.get_messages(
+                            chat_id=self._sent_msg.chat.id,
+                            message_ids=self._sent_msg.id,
                         )
-                        err = err.last_attempt.exception()
-                    LOGGER.error(f"{err}. Path: {self._up_path}")
-                    self._corrupted += 1
-                    if self._listener.is_cancelled:
-                        return
-                if (
-                    not self._listener.is_cancelled
-                    and await aiopath.exists(self._up_path)
-                    and (
-                        not self._listener.seed
-                        or self._listener.new_dir
-                        or dirpath.endswith("/splited_files_mltb")
-                        or "/copied_mltb/" in self._up_path
-                        or delete_file
-                    )
-                ):
-                    await remove(self._up_path)
+            self._last_msg_in_group = False
+            self._last_uploaded = 0
+            await self._upload_file(cap_mono, file_, f_path)
+            if self._listener.is_cancelled:
+                return False
+            if (
+                not self._is_corrupted
+                and (self._listener.is_super_chat or self._listener.up_dest)
+                and not self._is_private
+            ):
+                self._msgs_dict[self._sent_msg.link] = file_
+            await sleep(1)
+        except Exception as err:
+            if isinstance(err, RetryError):
+                LOGGER.info(f"Total Attempts: {err.last_attempt.attempt_number}")
+                err = err.last_attempt.exception()
+            LOGGER.error(f"{err}. Path: {self._up_path}")
+            self._corrupted += 1
+            if self._listener.is_cancelled:
+                return False
+        if (
+            not self._listener.is_cancelled
+            and await aiopath.exists(self._up_path)
+            and (
+                not self._listener.seed
+                or self._listener.new_dir
+                or dirpath.endswith("/splited_files_mltb")
+                or "/copied_mltb/" in self._up_path
+                or delete_file
+            )
+        ):
+            await remove(self._up_path)
+        return True
+
+    async def _finalize(self):
         for key, value in list(self._media_dict.items()):
             for subkey, msgs in list(value.items()):
                 if len(msgs) > 1:
@@ -340,7 +375,7 @@ class TelegramUploader:
         if self._listener.is_cancelled:
             return
         if self._listener.seed and not self._listener.new_dir:
-            await clean_unwanted(self._path)
+            await clean_unwanted(self._path, inventory=self._listener.inventory)
         if self._total_files == 0:
             await self._listener.on_upload_error(
                 "No files to upload. In case you have filled EXTENSION_FILTER, then check if all files have those extensions or not."
@@ -424,16 +459,17 @@ class TelegramUploader:
 
                 if self._listener.is_cancelled:
                     return
-                self._sent_msg = await self._sent_msg.reply_document(
-                    document=self._up_path,
-                    quote=False,
-                    thumb=thumb,
-                    caption=final_caption_to_send,
-                    force_document=True,
-                    disable_notification=True,
-                    progress=self._upload_progress,
-                    parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
-                )
+                async with tg_limit(self._sent_msg._client, "upload"):
+                    self._sent_msg = await self._sent_msg.reply_document(
+                        document=self._up_path,
+                        quote=False,
+                        thumb=thumb,
+                        caption=final_caption_to_send,
+                        force_document=True,
+                        disable_notification=True,
+                        progress=self._upload_progress,
+                        parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
+                    )
             elif is_video:
                 key = "videos"
                 duration = (await get_media_info(self._up_path))[0]
@@ -453,48 +489,51 @@ class TelegramUploader:
                     height = 320
                 if self._listener.is_cancelled:
                     return
-                self._sent_msg = await self._sent_msg.reply_video(
-                    video=self._up_path,
-                    quote=False,
-                    caption=final_caption_to_send,
-                    duration=duration,
-                    width=width,
-                    height=height,
-                    thumb=thumb,
-                    supports_streaming=True,
-                    disable_notification=True,
-                    progress=self._upload_progress,
-                    parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
-                )
+                async with tg_limit(self._sent_msg._client, "upload"):
+                    self._sent_msg = await self._sent_msg.reply_video(
+                        video=self._up_path,
+                        quote=False,
+                        caption=final_caption_to_send,
+                        duration=duration,
+                        width=width,
+                        height=height,
+                        thumb=thumb,
+                        supports_streaming=True,
+                        disable_notification=True,
+                        progress=self._upload_progress,
+                        parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
+                    )
             elif is_audio:
                 key = "audios"
                 duration, artist, title = await get_media_info(self._up_path)
                 if self._listener.is_cancelled:
                     return
-                self._sent_msg = await self._sent_msg.reply_audio(
-                    audio=self._up_path,
-                    quote=False,
-                    caption=final_caption_to_send,
-                    duration=duration,
-                    performer=artist,
-                    title=title,
-                    thumb=thumb,
-                    disable_notification=True,
-                    progress=self._upload_progress,
-                    parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
-                )
+                async with tg_limit(self._sent_msg._client, "upload"):
+                    self._sent_msg = await self._sent_msg.reply_audio(
+                        audio=self._up_path,
+                        quote=False,
+                        caption=final_caption_to_send,
+                        duration=duration,
+                        performer=artist,
+                        title=title,
+                        thumb=thumb,
+                        disable_notification=True,
+                        progress=self._upload_progress,
+                        parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
+                    )
             else:
                 key = "photos"
                 if self._listener.is_cancelled:
                     return
-                self._sent_msg = await self._sent_msg.reply_photo(
-                    photo=self._up_path,
-                    quote=False,
-                    caption=final_caption_to_send,
-                    disable_notification=True,
-                    progress=self._upload_progress,
-                    parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
-                )
+                async with tg_limit(self._sent_msg._client, "upload"):
+                    self._sent_msg = await self._sent_msg.reply_photo(
+                        photo=self._up_path,
+                        quote=False,
+                        caption=final_caption_to_send,
+                        disable_notification=True,
+                        progress=self._upload_progress,
+                        parse_mode=ParseMode.HTML, # Added this to respect markdown in caption
+                    )
 
             if (
                 not self._listener.is_cancelled
@@ -526,7 +565,6 @@ class TelegramUploader:
                 await remove(thumb)
         except (FloodWait) as f:
             LOGGER.warning(str(f))
-            await sleep(f.value * 1.3)
             if (
                 self._thumb is None
                 and thumb is not None
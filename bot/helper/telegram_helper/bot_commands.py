@@ -27,6 +27,7 @@ class _BotCommands:
         self.PingCommand = f"ping{CMD_SUFFIX}"
         self.RestartCommand = f"restart{CMD_SUFFIX}"
         self.StatsCommand = f"stats{CMD_SUFFIX}"
+        self.PerfCommand = f"perf{CMD_SUFFIX}"
         self.HelpCommand = f"help{CMD_SUFFIX}"
         self.LogCommand = f"log{CMD_SUFFIX}"
         self.ShellCommand = f"shell{CMD_SUFFIX}"
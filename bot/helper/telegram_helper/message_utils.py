@@ -7,6 +7,7 @@ from bot import config_dict, LOGGER, status_dict, task_dict_lock, intervals, bot
 from ..ext_utils.bot_utils import SetInterval
 from ..ext_utils.exceptions import TgLinkException
 from ..ext_utils.status_utils import get_readable_message
+from .rate_limiter import tg_limit, STATUS_PRIORITY
 import pyrogram.utils as pyroutils
 
 # Fix for new Telegram peer ID formats
@@ -14,38 +15,38 @@ pyroutils.MIN_CHAT_ID = -999999999999
 pyroutils.MIN_CHANNEL_ID = -100999999999999
 
 
-async def send_message(message, text, buttons=None, block=True):
+async def send_message(message, text, buttons=None, block=True, priority=None):
     try:
-        return await message.reply(
-            text=text,
-            quote=True,
-            disable_web_page_preview=True,
-            disable_notification=True,
-            reply_markup=buttons,
-        )
+        async with tg_limit(message._client, "send", priority):
+            return await message.reply(
+                text=text,
+                quote=True,
+                disable_web_page_preview=True,
+                disable_notification=True,
+                reply_markup=buttons,
+            )
     except FloodWait as f:
         LOGGER.warning(str(f))
         if block:
-            await sleep(f.value * 1.2)
-            return await send_message(message, text, buttons)
+            return await send_message(message, text, buttons, priority=priority)
         return str(f)
     except Exception as e:
         LOGGER.error(str(e))
         return str(e)
 
 
-async def edit_message(message, text, buttons=None, block=True):
+async def edit_message(message, text, buttons=None, block=True, priority=None):
     try:
-        return await message.edit(
-            text=text,
-            disable_web_page_preview=True,
-            reply_markup=buttons,
-        )
+        async with tg_limit(message._client, "edit", priority):
+            return await message.edit(
+                text=text,
+                disable_web_page_preview=True,
+                reply_markup=buttons,
+            )
     except FloodWait as f:
         LOGGER.warning(str(f))
         if block:
-            await sleep(f.value * 1.2)
-            return await edit_message(message, text, buttons)
+            return await edit_message(message, text, buttons, priority=priority)
         return str(f)
     except Exception as e:
         LOGGER.error(str(e))
@@ -54,12 +55,12 @@ async def edit_message(message, text, buttons=None, block=True):
 
 async def send_file(message, file, caption=""):
     try:
-        return await message.reply_document(
-            document=file, quote=True, caption=caption, disable_notification=True
-        )
+        async with tg_limit(message._client, "upload"):
+            return await message.reply_document(
+                document=file, quote=True, caption=caption, disable_notification=True
+            )
     except FloodWait as f:
         LOGGER.warning(str(f))
-        await sleep(f.value * 1.2)
         return await send_file(message, file, caption)
     except Exception as e:
         LOGGER.error(str(e))
@@ -69,17 +70,17 @@ async def send_file(message, file, caption=""):
 async def send_rss(text, chat_id, thread_id):
     try:
         app = user or bot
-        return await app.send_message(
-            chat_id=chat_id,
-            text=text,
-            disable_web_page_preview=True,
-            message_thread_id=thread_id,
-            disable_notification=True,
-        )
+        async with tg_limit(app, "send"):
+            return await app.send_message(
+                chat_id=chat_id,
+                text=text,
+                disable_web_page_preview=True,
+                message_thread_id=thread_id,
+                disable_notification=True,
+            )
     except (FloodWait) as f:
         LOGGER.warning(str(f))
-        await sleep(f.value * 1.2)
-        return await send_rss(text)
+        return await send_rss(text, chat_id, thread_id)
     except Exception as e:
         LOGGER.error(str(e))
         return str(e)
@@ -87,7 +88,8 @@ async def send_rss(text, chat_id, thread_id):
 
 async def delete_message(message):
     try:
-        await message.delete()
+        async with tg_limit(message._client, "edit"):
+            await message.delete()
     except Exception as e:
         LOGGER.error(str(e))
 
@@ -158,7 +160,8 @@ async def get_tg_link_message(link):
         try:
             # First try to resolve the peer with user session to check if channel has restrictions
             peer = await user.resolve_peer(chat)
-            channel_info = await user.get_chat(chat)
+            async with tg_limit(user, "get_messages"):
+                channel_info = await user.get_chat(chat)
             
             # Check if channel has forwarding restrictions
             if hasattr(channel_info, 'noforwards') and channel_info.noforwards:
@@ -167,7 +170,8 @@ async def get_tg_link_message(link):
             else:
                 # Try bot first for unrestricted channels
                 try:
-                    message = await bot.get_messages(chat_id=chat, message_ids=msg_id)
+                    async with tg_limit(bot, "get_messages"):
+                        message = await bot.get_messages(chat_id=chat, message_ids=msg_id)
                     if message.empty:
                         private = True
                 except Exception as e:
@@ -177,7 +181,8 @@ async def get_tg_link_message(link):
             LOGGER.warning(f"User session peer resolution failed for {chat}: {e}")
             # Fall back to original logic
             try:
-                message = await bot.get_messages(chat_id=chat, message_ids=msg_id)
+                async with tg_limit(bot, "get_messages"):
+                    message = await bot.get_messages(chat_id=chat, message_ids=msg_id)
                 if message.empty:
                     private = True
             except Exception as e:
@@ -186,7 +191,8 @@ async def get_tg_link_message(link):
                     raise e
     elif not private:
         try:
-            message = await bot.get_messages(chat_id=chat, message_ids=msg_id)
+            async with tg_limit(bot, "get_messages"):
+                message = await bot.get_messages(chat_id=chat, message_ids=msg_id)
             if message.empty:
                 private = True
         except Exception as e:
@@ -200,7 +206,8 @@ async def get_tg_link_message(link):
         try:
             # Ensure peer is resolved before accessing messages
             await user.resolve_peer(chat)
-            user_message = await user.get_messages(chat_id=chat, message_ids=msg_id)
+            async with tg_limit(user, "get_messages"):
+                user_message = await user.get_messages(chat_id=chat, message_ids=msg_id)
         except Exception as e:
             raise TgLinkException(
                 f"Cannot access this channel. It may have forwarding restrictions or you don't have access. ERROR: {e}"
@@ -212,6 +219,13 @@ async def get_tg_link_message(link):
 
 
 
+def _stop_status(sid):
+    del status_dict[sid]
+    if obj := intervals["status"].get(sid):
+        obj.cancel()
+        del intervals["status"][sid]
+
+
 async def update_status_message(sid, force=False):
     if intervals["stopAll"]:
         return
@@ -228,74 +242,63 @@ async def update_status_message(sid, force=False):
         status = status_dict[sid]["status"]
         is_user = status_dict[sid]["is_user"]
         page_step = status_dict[sid]["page_step"]
-        text, buttons = await get_readable_message(
-            sid, is_user, page_no, status, page_step
-        )
+    text, buttons = await get_readable_message(
+        sid, is_user, page_no, status, page_step
+    )
+    async with task_dict_lock:
+        if not status_dict.get(sid):
+            return
         if text is None:
-            del status_dict[sid]
-            if obj := intervals["status"].get(sid):
-                obj.cancel()
-                del intervals["status"][sid]
+            _stop_status(sid)
             return
-        if text != status_dict[sid]["message"].text:
-            message = await edit_message(
-                status_dict[sid]["message"], text, buttons, block=False
-            )
-            if isinstance(message, str):
-                if message.startswith("Telegram says: [400"):
-                    del status_dict[sid]
-                    if obj := intervals["status"].get(sid):
-                        obj.cancel()
-                        del intervals["status"][sid]
-                else:
-                    LOGGER.error(
-                        f"Status with id: {sid} haven't been updated. Error: {message}"
-                    )
-                return
-            status_dict[sid]["message"].text = text
-            status_dict[sid]["time"] = time()
+        message = status_dict[sid]["message"]
+        if text == message.text:
+            return
+    edited = await edit_message(
+        message, text, buttons, block=False, priority=STATUS_PRIORITY
+    )
+    async with task_dict_lock:
+        if isinstance(edited, str):
+            if edited.startswith("Telegram says: [400"):
+                if status_dict.get(sid, {}).get("message") is message:
+                    _stop_status(sid)
+            else:
+                LOGGER.error(
+                    f"Status with id: {sid} haven't been updated. Error: {edited}"
+                )
+            return
+        message.text = text
 
 
 async def send_status_message(msg, user_id=0):
     if intervals["stopAll"]:
         return
+    sid = user_id or msg.chat.id
+    is_user = bool(user_id)
+    if sdata := status_dict.get(sid):
+        text, buttons = await get_readable_message(
+            sid, is_user, sdata["page_no"], sdata["status"], sdata["page_step"]
+        )
+    else:
+        text, buttons = await get_readable_message(sid, is_user)
     async with task_dict_lock:
-        sid = user_id or msg.chat.id
-        is_user = bool(user_id)
-        if sid in list(status_dict.keys()):
-            page_no = status_dict[sid]["page_no"]
-            status = status_dict[sid]["status"]
-            page_step = status_dict[sid]["page_step"]
-            text, buttons = await get_readable_message(
-                sid, is_user, page_no, status, page_step
-            )
-            if text is None:
-                del status_dict[sid]
-                if obj := intervals["status"].get(sid):
-                    obj.cancel()
-                    del intervals["status"][sid]
-                return
-            message = status_dict[sid]["message"]
-            await delete_message(message)
-            message = await send_message(msg, text, buttons, block=False)
-            if isinstance(message, str):
-                LOGGER.error(
-                    f"Status with id: {sid} haven't been sent. Error: {message}"
-                )
-                return
-            message.text = text
-            status_dict[sid].update({"message": message, "time": time()})
-        else:
-            text, buttons = await get_readable_message(sid, is_user)
-            if text is None:
-                return
-            message = await send_message(msg, text, buttons, block=False)
-            if isinstance(message, str):
-                LOGGER.error(
-                    f"Status with id: {sid} haven't been sent. Error: {message}"
-                )
-                return
-            message.text = text
+        old = status_dict[sid]["message"] if sid in status_dict else None
+        if text is None:
+            if old is not None:
+                _stop_status(sid)
+            return
+    if old is not None:
+        await delete_message(old)
+    message = await send_message(
+        msg, text, buttons, block=False, priority=STATUS_PRIORITY
+    )
+    if isinstance(message, str):
+        LOGGER.error(f"Status with id: {sid} haven't been sent. Error: {message}")
+        return
+    message.text = text
+    stale = False
+    async with task_dict_lock:
+        if (sdata := status_dict.get(sid)) is None and old is None:
             status_dict[sid] = {
                 "message": message,
                 "time": time(),
@@ -304,6 +307,14 @@ async def send_status_message(msg, user_id=0):
                 "status": "All",
                 "is_user": is_user,
             }
+        elif sdata is not None and sdata["message"] is old:
+            sdata.update({"message": message, "time": time()})
+        else:
+            # Another send replaced or stopped this status meanwhile.
+            stale = True
+    if stale:
+        await delete_message(message)
+        return
     if not intervals["status"].get(sid) and not is_user:
         intervals["status"][sid] = SetInterval(
             config_dict["STATUS_UPDATE_INTERVAL"], update_status_message, sid
@@ -0,0 +1,114 @@
+from asyncio import sleep
+from contextlib import asynccontextmanager
+from heapq import heappush, heappop
+from itertools import count
+from pyrogram.errors import FloodWait
+from time import monotonic
+
+from bot import bot, bot_loop, user
+from ..ext_utils.metrics import observe, record_flood_wait
+
+# Calls per second and burst for each method class of one client. Every
+# call also draws from the client bucket, which is where priorities matter.
+LIMITS = {
+    "send": (1, 5),
+    "edit": (1, 5),
+    "get_messages": (3, 10),
+    "upload": (2, 4),
+    "download": (3, 6),
+    "client": (20, 30),
+}
+PRIORITY = {
+    "upload": 0,
+    "download": 0,
+    "send": 1,
+    "get_messages": 1,
+    "edit": 2,
+}
+STATUS_PRIORITY = 3
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._stamp = monotonic()
+        self._paused_until = 0
+        self._waiters = []
+        self._seq = count()
+        self._drainer = None
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    async def acquire(self, priority):
+        now = monotonic()
+        self._refill(now)
+        if not self._waiters and now >= self._paused_until and self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        future = bot_loop.create_future()
+        heappush(self._waiters, (priority, next(self._seq), future))
+        if self._drainer is None or self._drainer.done():
+            self._drainer = bot_loop.create_task(self._drain())
+        await future
+        return monotonic() - now
+
+    async def _drain(self):
+        while self._waiters:
+            now = monotonic()
+            if now < self._paused_until:
+                await sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens < 1:
+                await sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, future = heappop(self._waiters)
+            if not future.done():
+                self._tokens -= 1
+                future.set_result(None)
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+        self._tokens = 0
+
+
+buckets = {}
+
+
+def client_key(client):
+    if isinstance(client, str):
+        return client
+    if client is bot:
+        return "bot"
+    if user and client is user:
+        return "user"
+    return getattr(client, "name", "bot")
+
+
+def _bucket(client, method):
+    if (bucket := buckets.get((client, method))) is None:
+        bucket = buckets[(client, method)] = TokenBucket(*LIMITS[method])
+    return bucket
+
+
+@asynccontextmanager
+async def tg_limit(client, method, priority=None):
+    # FloodWait only pauses the method bucket it was raised in, then the
+    # caller's own handler decides whether to retry or give up.
+    client = client_key(client)
+    if priority is None:
+        priority = PRIORITY[method]
+    bucket = _bucket(client, method)
+    waited = await bucket.acquire(priority)
+    waited += await _bucket(client, "client").acquire(priority)
+    observe("mltb_telegram_wait_seconds", waited, client=client, method=method)
+    try:
+        yield
+    except FloodWait as f:
+        record_flood_wait(client, f.value)
+        bucket.pause(f.value)
+        raise
@@ -53,6 +53,7 @@ from ..helper.telegram_helper.message_utils import (
     update_status_message,
     delete_message,
 )
+from ..helper.telegram_helper.rate_limiter import tg_limit
 from .rss import add_job
 from .torrent_search import initiate_search_tools
 
@@ -64,9 +65,17 @@ DEFAULT_VALUES = {
     "LEECH_SPLIT_SIZE": MAX_SPLIT_SIZE,
     "RSS_DELAY": 600,
     "STATUS_UPDATE_INTERVAL": 15,
+    "ENGINE_POLL_INTERVAL": 2,
+    "PERF_HISTORY": 5000,
+    "QBIT_HOOK_PORT": 8091,
+    "DIRECT_PARALLEL_DOWNLOADS": 4,
     "SEARCH_LIMIT": 0,
+    "QUEUE_DISK_RESERVE": 0,
+    "QUEUE_BANDWIDTH": 0,
     "UPSTREAM_BRANCH": "master",
     "DEFAULT_UPLOAD": "gd",
+    "THUMB_CACHE_DIR": "thumb_cache",
+    "THUMB_CACHE_SIZE": 209715200,
 }
 
 
@@ -186,6 +195,8 @@ async def edit_variable(_, message, pre_message, key):
         value = False
         if key == "INCOMPLETE_TASK_NOTIFIER" and config_dict["DATABASE_URL"]:
             await database.trunc_table("tasks")
+        elif key == "RESUME_QUEUED_TASKS" and config_dict["DATABASE_URL"]:
+            await database.trunc_table("queue")
     elif key == "DOWNLOAD_DIR":
         if not value.endswith("/"):
             value += "/"
@@ -250,7 +261,15 @@ async def edit_variable(_, message, pre_message, key):
         await database.update_config({key: value})
     if key in ["SEARCH_PLUGINS", "SEARCH_API_LINK"]:
         await initiate_search_tools()
-    elif key in ["QUEUE_ALL", "QUEUE_DOWNLOAD", "QUEUE_UPLOAD"]:
+    elif key in [
+        "QUEUE_ALL",
+        "QUEUE_DOWNLOAD",
+        "QUEUE_UPLOAD",
+        "QUEUE_USER",
+        "QUEUE_DISK_RESERVE",
+        "QUEUE_DISK_CHECK",
+        "QUEUE_BANDWIDTH",
+    ]:
         await start_from_queued()
     elif key in [
         "RCLONE_SERVE_URL",
@@ -334,7 +353,8 @@ async def update_private_file(_, message, pre_message):
         await delete_message(message)
     elif doc := message.document:
         file_name = doc.file_name
-        await message.download(file_name=f"{getcwd()}/{file_name}")
+        async with tg_limit(message._client, "download"):
+            await message.download(file_name=f"{getcwd()}/{file_name}")
         if file_name == "accounts.zip":
             if await aiopath.exists("accounts"):
                 await rmtree("accounts", ignore_errors=True)
@@ -486,6 +506,8 @@ async def edit_bot_settings(client, query):
                     index_urls[0] = ""
             elif data[2] == "INCOMPLETE_TASK_NOTIFIER" and config_dict["DATABASE_URL"]:
                 await database.trunc_table("tasks")
+            elif data[2] == "RESUME_QUEUED_TASKS" and config_dict["DATABASE_URL"]:
+                await database.trunc_table("queue")
         config_dict[data[2]] = value
         await update_buttons(message, "var")
         if data[2] == "DATABASE_URL":
@@ -494,7 +516,15 @@ async def edit_bot_settings(client, query):
             await database.update_config({data[2]: value})
         if data[2] in ["SEARCH_PLUGINS", "SEARCH_API_LINK"]:
             await initiate_search_tools()
-        elif data[2] in ["QUEUE_ALL", "QUEUE_DOWNLOAD", "QUEUE_UPLOAD"]:
+        elif data[2] in [
+            "QUEUE_ALL",
+            "QUEUE_DOWNLOAD",
+            "QUEUE_UPLOAD",
+            "QUEUE_USER",
+            "QUEUE_DISK_RESERVE",
+            "QUEUE_DISK_CHECK",
+            "QUEUE_BANDWIDTH",
+        ]:
             await start_from_queued()
         elif data[2] in [
             "RCLONE_SERVE_URL",
@@ -903,6 +933,74 @@ async def load_config():
         LOGGER.error(f"Wrong FFMPEG_CMDS format: {FFMPEG_CMDS}")
         FFMPEG_CMDS = []
 
+    IO_WORKERS = environ.get("IO_WORKERS", "")
+    IO_WORKERS = 0 if len(IO_WORKERS) == 0 else int(IO_WORKERS)
+
+    THUMB_CACHE_DIR = environ.get("THUMB_CACHE_DIR", "").rstrip("/")
+    if len(THUMB_CACHE_DIR) == 0:
+        THUMB_CACHE_DIR = "thumb_cache"
+
+    THUMB_CACHE_SIZE = environ.get("THUMB_CACHE_SIZE", "")
+    THUMB_CACHE_SIZE = (
+        209715200 if len(THUMB_CACHE_SIZE) == 0 else int(THUMB_CACHE_SIZE)
+    )
+
+    CPU_SLOTS = environ.get("CPU_SLOTS", "")
+    CPU_SLOTS = 0 if len(CPU_SLOTS) == 0 else int(CPU_SLOTS)
+
+    STREAM_ZIP_UPLOAD = environ.get("STREAM_ZIP_UPLOAD", "")
+    STREAM_ZIP_UPLOAD = STREAM_ZIP_UPLOAD.lower() == "true"
+
+    QUEUE_USER = environ.get("QUEUE_USER", "")
+    QUEUE_USER = "" if len(QUEUE_USER) == 0 else int(QUEUE_USER)
+
+    QUEUE_DISK_RESERVE = environ.get("QUEUE_DISK_RESERVE", "")
+    if len(QUEUE_DISK_RESERVE) == 0:
+        QUEUE_DISK_RESERVE = 0
+    else:
+        QUEUE_DISK_RESERVE = int(QUEUE_DISK_RESERVE)
+
+    QUEUE_BANDWIDTH = environ.get("QUEUE_BANDWIDTH", "")
+    if len(QUEUE_BANDWIDTH) == 0:
+        QUEUE_BANDWIDTH = 0
+    else:
+        QUEUE_BANDWIDTH = int(QUEUE_BANDWIDTH)
+
+    RESUME_QUEUED_TASKS = environ.get("RESUME_QUEUED_TASKS", "")
+    RESUME_QUEUED_TASKS = RESUME_QUEUED_TASKS.lower() == "true"
+    if not RESUME_QUEUED_TASKS and config_dict["DATABASE_URL"]:
+        await database.trunc_table("queue")
+
+    ENGINE_POLL_INTERVAL = environ.get("ENGINE_POLL_INTERVAL", "")
+    if len(ENGINE_POLL_INTERVAL) == 0:
+        ENGINE_POLL_INTERVAL = 2
+    else:
+        ENGINE_POLL_INTERVAL = int(ENGINE_POLL_INTERVAL)
+
+    METRICS_PORT = environ.get("METRICS_PORT", "")
+    METRICS_PORT = "" if len(METRICS_PORT) == 0 else int(METRICS_PORT)
+
+    PERF_HISTORY = environ.get("PERF_HISTORY", "")
+    if len(PERF_HISTORY) == 0:
+        PERF_HISTORY = 5000
+    else:
+        PERF_HISTORY = int(PERF_HISTORY)
+
+    QBIT_HOOK_PORT = environ.get("QBIT_HOOK_PORT", "")
+    if len(QBIT_HOOK_PORT) == 0:
+        QBIT_HOOK_PORT = 8091
+    else:
+        QBIT_HOOK_PORT = int(QBIT_HOOK_PORT)
+
+    DIRECT_PARALLEL_DOWNLOADS = environ.get("DIRECT_PARALLEL_DOWNLOADS", "")
+    if len(DIRECT_PARALLEL_DOWNLOADS) == 0:
+        DIRECT_PARALLEL_DOWNLOADS = 4
+    else:
+        DIRECT_PARALLEL_DOWNLOADS = max(int(DIRECT_PARALLEL_DOWNLOADS), 1)
+
+    QUEUE_DISK_CHECK = environ.get("QUEUE_DISK_CHECK", "")
+    QUEUE_DISK_CHECK = QUEUE_DISK_CHECK.lower() == "true"
+
     await (await create_subprocess_exec("pkill", "-9", "-f", "gunicorn")).wait()
     BASE_URL = environ.get("BASE_URL", "").rstrip("/")
     if len(BASE_URL) == 0:
@@ -949,9 +1047,12 @@ async def load_config():
             "BASE_URL_PORT": BASE_URL_PORT,
             "BOT_TOKEN": BOT_TOKEN,
             "CMD_SUFFIX": CMD_SUFFIX,
+            "CPU_SLOTS": CPU_SLOTS,
             "DATABASE_URL": DATABASE_URL,
             "DEFAULT_UPLOAD": DEFAULT_UPLOAD,
+            "DIRECT_PARALLEL_DOWNLOADS": DIRECT_PARALLEL_DOWNLOADS,
             "DOWNLOAD_DIR": DOWNLOAD_DIR,
+            "ENGINE_POLL_INTERVAL": ENGINE_POLL_INTERVAL,
             "EQUAL_SPLITS": EQUAL_SPLITS,
             "EXTENSION_FILTER": EXTENSION_FILTER,
             "FFMPEG_CMDS": FFMPEG_CMDS,
@@ -959,23 +1060,32 @@ async def load_config():
             "GDRIVE_ID": GDRIVE_ID,
             "INCOMPLETE_TASK_NOTIFIER": INCOMPLETE_TASK_NOTIFIER,
             "INDEX_URL": INDEX_URL,
+            "IO_WORKERS": IO_WORKERS,
             "IS_TEAM_DRIVE": IS_TEAM_DRIVE,
             "LEECH_DUMP_CHAT": LEECH_DUMP_CHAT,
             "LEECH_FILENAME_PREFIX": LEECH_FILENAME_PREFIX,
             "LEECH_SPLIT_SIZE": LEECH_SPLIT_SIZE,
             "MEDIA_GROUP": MEDIA_GROUP,
+            "METRICS_PORT": METRICS_PORT,
             "MIXED_LEECH": MIXED_LEECH,
             "NAME_SUBSTITUTE": NAME_SUBSTITUTE,
             "OWNER_ID": OWNER_ID,
+            "PERF_HISTORY": PERF_HISTORY,
+            "QBIT_HOOK_PORT": QBIT_HOOK_PORT,
             "QUEUE_ALL": QUEUE_ALL,
+            "QUEUE_BANDWIDTH": QUEUE_BANDWIDTH,
+            "QUEUE_DISK_CHECK": QUEUE_DISK_CHECK,
+            "QUEUE_DISK_RESERVE": QUEUE_DISK_RESERVE,
             "QUEUE_DOWNLOAD": QUEUE_DOWNLOAD,
             "QUEUE_UPLOAD": QUEUE_UPLOAD,
+            "QUEUE_USER": QUEUE_USER,
             "RCLONE_FLAGS": RCLONE_FLAGS,
             "RCLONE_PATH": RCLONE_PATH,
             "RCLONE_SERVE_URL": RCLONE_SERVE_URL,
             "RCLONE_SERVE_USER": RCLONE_SERVE_USER,
             "RCLONE_SERVE_PASS": RCLONE_SERVE_PASS,
             "RCLONE_SERVE_PORT": RCLONE_SERVE_PORT,
+            "RESUME_QUEUED_TASKS": RESUME_QUEUED_TASKS,
             "RSS_CHAT": RSS_CHAT,
             "RSS_DELAY": RSS_DELAY,
             "SEARCH_API_LINK": SEARCH_API_LINK,
@@ -985,10 +1095,13 @@ async def load_config():
             "STATUS_UPDATE_INTERVAL": STATUS_UPDATE_INTERVAL,
             "STOP_DUPLICATE": STOP_DUPLICATE,
             "STREAMWISH_API": STREAMWISH_API,
+            "STREAM_ZIP_UPLOAD": STREAM_ZIP_UPLOAD,
             "SUDO_USERS": SUDO_USERS,
             "TELEGRAM_API": TELEGRAM_API,
             "TELEGRAM_HASH": TELEGRAM_HASH,
             "THUMBNAIL_LAYOUT": THUMBNAIL_LAYOUT,
+            "THUMB_CACHE_DIR": THUMB_CACHE_DIR,
+            "THUMB_CACHE_SIZE": THUMB_CACHE_SIZE,
             "TORRENT_TIMEOUT": TORRENT_TIMEOUT,
             "USER_TRANSMISSION": USER_TRANSMISSION,
             "UPSTREAM_REPO": UPSTREAM_REPO,
@@ -6,8 +6,10 @@ from pyrogram import enums
 from bot import bot, user, LOGGER, config_dict, user_data
 from ..helper.ext_utils.bot_utils import new_task
 from ..helper.ext_utils.db_handler import database
+from ..helper.ext_utils.metrics import inc
 from ..helper.telegram_helper.message_utils import send_message, edit_message
 from ..helper.telegram_helper.filters import CustomFilters
+from ..helper.telegram_helper.rate_limiter import tg_limit
 from ..helper.mirror_leech_utils.channel_scanner import ChannelScanner
 from ..helper.mirror_leech_utils.channel_status import channel_status
 from ..helper.listeners.task_listener import TaskListener
@@ -386,10 +388,11 @@ class SimpleChannelLeechCoordinator(TaskListener):
 
             for scan in scan_types:
                 try:
-                    total_count = await user.search_messages_count(
-                        chat_id=self.channel_chat_id,
-                        filter=scan['filter']
-                    )
+                    async with tg_limit(user, "get_messages"):
+                        total_count = await user.search_messages_count(
+                            chat_id=self.channel_chat_id,
+                            filter=scan['filter']
+                        )
                     scan_totals[scan['name']] = total_count
                 except Exception as e:
                     scan_totals[scan['name']] = 0
@@ -599,6 +602,7 @@ class SimpleChannelLeechCoordinator(TaskListener):
 
             # SUCCESS: Add to database to prevent future downloads
             self.completed_count += 1
+            inc("mltb_cleech_files_total", result="completed")
             
             # CRITICAL: Mark file as completed in database
             await database.add_file_entry(
@@ -642,6 +646,7 @@ class SimpleChannelLeechCoordinator(TaskListener):
                 LOGGER.info(f"[cleech] ❌ Failed download marked to prevent retry: {sanitized_name} (Error: {error})")
             
             self.failed_count += 1
+            inc("mltb_cleech_files_total", result="failed")
             
             # Start next downloads
             while len(self.our_active_links) < self.max_concurrent and self.pending_files:
@@ -737,7 +742,8 @@ class SimpleChannelLeechCoordinator(TaskListener):
                 self.resume_from_msg_id = 0
 
             try:
-                chat = await user.get_chat(self.channel_id)
+                async with tg_limit(user, "get_messages"):
+                    chat = await user.get_chat(self.channel_id)
                 self.channel_chat_id = chat.id
             except Exception as e:
                 await send_message(self.message, f"Could not resolve channel: {e}")
@@ -855,7 +861,8 @@ class SimpleChannelLeechCoordinator(TaskListener):
             pending_msg_ids = progress.get("pending_files", [])
             for msg_id in pending_msg_ids:
                 try:
-                    message = await user.get_messages(self.channel_chat_id, msg_id)
+                    async with tg_limit(user, "get_messages"):
+                        message = await user.get_messages(self.channel_chat_id, msg_id)
                     file_info = scanner._extract_file_info(message)
                     if file_info:
                         message_link = f"https://t.me/c/{str(self.channel_chat_id)[4:]}/{msg_id}"
@@ -936,6 +943,8 @@ class SimpleChannelLeechCoordinator(TaskListener):
         while len(self.our_active_links) < self.max_concurrent and self.pending_files:
             await self._start_next_download()
             
+        for reason, count in skip_counts.items():
+            inc("mltb_cleech_files_total", count, result=f"skipped_{reason}")
         return skip_counts
 
     async def _start_next_download(self):
@@ -961,11 +970,10 @@ class SimpleChannelLeechCoordinator(TaskListener):
             clean_name = self._generate_clean_filename(file_item['file_info'])
             leech_cmd = f'/leech {file_item["url"]} -n {clean_name}'
             
-            command_message = await user.send_message(chat_id=COMMAND_CHANNEL_ID, text=leech_cmd)
+            async with tg_limit(user, "send"):
+                command_message = await user.send_message(chat_id=COMMAND_CHANNEL_ID, text=leech_cmd)
             actual_stored_url = f"https://t.me/c/{str(COMMAND_CHANNEL_ID)[4:]}/{command_message.id}"
             
-            await asyncio.sleep(2)
-            
             # Update tracking with actual URL
             self.our_active_links.discard(url)
             self.our_active_links.add(actual_stored_url)
@@ -44,6 +44,7 @@ from ..helper.mirror_leech_utils.download_utils.telegram_download import (
 from ..helper.telegram_helper.bot_commands import BotCommands
 from ..helper.telegram_helper.filters import CustomFilters
 from ..helper.telegram_helper.message_utils import send_message, get_tg_link_message
+from ..helper.telegram_helper.rate_limiter import tg_limit
 
 
 class Mirror(TaskListener):
@@ -225,9 +226,10 @@ class Mirror(TaskListener):
             self.options = " ".join(input_list[1:])
             b_msg.append(f"{self.bulk[0]} -i {len(self.bulk)} {self.options}")
             nextmsg = await send_message(self.message, " ".join(b_msg))
-            nextmsg = await self.client.get_messages(
-                chat_id=self.message.chat.id, message_ids=nextmsg.id
-            )
+            async with tg_limit(self.client, "get_messages"):
+                nextmsg = await self.client.get_messages(
+                    chat_id=self.message.chat.id, message_ids=nextmsg.id
+                )
             if self.message.from_user:
                 nextmsg.from_user = self.user
             else:
@@ -266,7 +268,8 @@ class Mirror(TaskListener):
                 file_.mime_type == "application/x-bittorrent"
                 or file_.file_name.endswith(".torrent")
             ):
-                self.link = await reply_to.download()
+                async with tg_limit(reply_to._client, "download"):
+                    self.link = await reply_to.download()
                 file_ = None
 
         if (
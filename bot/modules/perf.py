@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from html import escape
+from pyrogram.filters import command
+from pyrogram.handlers import MessageHandler
+from re import match as re_match
+
+from bot import bot, config_dict
+from ..helper.ext_utils.bot_utils import new_task
+from ..helper.ext_utils.db_handler import database
+from ..helper.ext_utils.status_utils import get_readable_file_size, get_readable_time
+from ..helper.telegram_helper.bot_commands import BotCommands
+from ..helper.telegram_helper.filters import CustomFilters
+from ..helper.telegram_helper.message_utils import send_message
+
+UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+def _duration(seconds):
+    if seconds < 1:
+        return f"{seconds:.2f}s"
+    return get_readable_time(seconds)
+
+
+def _stage_line(name, stages):
+    walls = [stage["wall"] for stage in stages]
+    line = (
+        f"<code>{name}</code>: {_duration(_percentile(walls, 50))} | "
+        f"{_duration(_percentile(walls, 90))} | {_duration(_percentile(walls, 99))}"
+        f" | CPU {_duration(sum(stage['cpu'] for stage in stages) / len(stages))}"
+    )
+    if (size := sum(stage["bytes"] for stage in stages)) and (wall := sum(walls)):
+        line += f" | {get_readable_file_size(size / wall)}/s"
+    return f"{line} ({len(stages)})"
+
+
+@new_task
+async def perf_report(_, message):
+    if not config_dict["DATABASE_URL"]:
+        await send_message(message, "Task timelines need DATABASE_URL!")
+        return
+    args = message.text.split()
+    window = args[1].lower() if len(args) > 1 else "24h"
+    if not (parsed := re_match(r"^(\d+)([mhd])$", window)):
+        await send_message(
+            message,
+            f"Send window like 30m, 12h or 7d. Ex: /{BotCommands.PerfCommand} 6h",
+        )
+        return
+    since = datetime.utcnow() - timedelta(
+        **{UNITS[parsed.group(2)]: int(parsed.group(1))}
+    )
+    timelines = await database.get_task_timelines(since)
+    if not timelines:
+        await send_message(message, f"No finished tasks in the last {window}!")
+        return
+
+    stages = {}
+    engines = {}
+    for timeline in timelines:
+        for stage in timeline["stages"]:
+            stages.setdefault(stage["stage"], []).append(stage)
+            if stage["stage"] == "download":
+                engines.setdefault(timeline["engine"] or "-", []).append(stage)
+    failed = sum(timeline["state"] == "failed" for timeline in timelines)
+    msg = f"<b>Tasks in the last {window}:</b> {len(timelines)}"
+    msg += f" | <b>Failed:</b> {failed}"
+    msg += "\n\n<b>Stages</b> <i>p50 | p90 | p99 | avg CPU | rate</i>"
+    for name, group in sorted(
+        stages.items(), key=lambda x: -sum(stage["wall"] for stage in x[1])
+    ):
+        msg += f"\n{_stage_line(name, group)}"
+    msg += "\n\n<b>Download by engine</b>"
+    for name, group in sorted(engines.items()):
+        msg += f"\n{_stage_line(name, group)}"
+    msg += "\n\n<b>Slowest tasks</b>"
+    for index, timeline in enumerate(
+        sorted(timelines, key=lambda x: -x["total"])[:5], start=1
+    ):
+        slowest = max(timeline["stages"], key=lambda x: x["wall"])
+        msg += (
+            f"\n{index}. <code>{escape(str(timeline['name'])[:60])}</code>"
+            f" {get_readable_file_size(timeline['size'] or 0)}"
+            f" | {_duration(timeline['total'])} | {slowest['stage']}"
+            f" {_duration(slowest['wall'])} | {timeline['state']}"
+        )
+    await send_message(message, msg)
+
+
+bot.add_handler(
+    MessageHandler(
+        perf_report,
+        filters=command(BotCommands.PerfCommand, case_sensitive=True)
+        & CustomFilters.sudo,
+    )
+)
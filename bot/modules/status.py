@@ -13,12 +13,14 @@ from bot import (
     bot,
 )
 from ..helper.ext_utils.bot_utils import sync_to_async, new_task
+from ..helper.ext_utils.files_utils import copy_stats
 from ..helper.ext_utils.status_utils import (
     MirrorStatus,
     get_readable_file_size,
     get_readable_time,
     speed_string_to_bytes,
 )
+from ..helper.ext_utils.task_manager import cpu_pool
 from ..helper.telegram_helper.bot_commands import BotCommands
 from ..helper.telegram_helper.filters import CustomFilters
 from ..helper.telegram_helper.message_utils import (
@@ -137,7 +139,7 @@ async def status_pages(_, query):
                     case MirrorStatus.STATUS_CONVERT:
                         tasks["ConvertMedia"] += 1
                     case MirrorStatus.STATUS_FFMPEG:
-                        tasks["FFMPEG"] += 1
+                        tasks["FFmpeg"] += 1
                     case _:
                         tasks["Download"] += 1
                         dl_speed += speed_string_to_bytes(download.speed())
@@ -151,6 +153,10 @@ async def status_pages(_, query):
 <b>OULS:</b> {get_readable_file_size(up_speed)}/s
 <b>OSDS:</b> {get_readable_file_size(seed_speed)}/s
 """
+        msg += f"\n<b>CPU Slots:</b> {cpu_pool.used}/{cpu_pool.slots} | <b>Queued:</b> {cpu_pool.queued}"
+        msg += f"\n<b>Seed Copies:</b> RL {copy_stats['reflink']} | HL {copy_stats['hardlink']} | CP {copy_stats['copy']} ({get_readable_file_size(copy_stats['copied_bytes'])})"
+        for stage, (count, total, longest) in cpu_pool.wait_stats.items():
+            msg += f"\n<b>{stage} Wait:</b> avg {get_readable_time(total / count) or '0s'} | max {get_readable_time(longest) or '0s'}"
         button = ButtonMaker()
         button.data_button("Back", f"status {data[1]} ref")
         await edit_message(message, msg, button.build_menu())
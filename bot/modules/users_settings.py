@@ -32,6 +32,7 @@ from ..helper.telegram_helper.message_utils import (
     send_file,
     delete_message,
 )
+from ..helper.telegram_helper.rate_limiter import tg_limit
 
 handler_dict = {}
 
@@ -258,7 +259,8 @@ async def add_rclone(_, message, pre_event):
     rpath = f"{getcwd()}/rclone/"
     await makedirs(rpath, exist_ok=True)
     des_dir = f"{rpath}{user_id}.conf"
-    await message.download(file_name=des_dir)
+    async with tg_limit(message._client, "download"):
+        await message.download(file_name=des_dir)
     update_user_ldata(user_id, "rclone_config", f"rclone/{user_id}.conf")
     await delete_message(message)
     await update_user_settings(pre_event)
@@ -273,7 +275,8 @@ async def add_token_pickle(_, message, pre_event):
     tpath = f"{getcwd()}/tokens/"
     await makedirs(tpath, exist_ok=True)
     des_dir = f"{tpath}{user_id}.pickle"
-    await message.download(file_name=des_dir)
+    async with tg_limit(message._client, "download"):
+        await message.download(file_name=des_dir)
     update_user_ldata(user_id, "token_pickle", f"tokens/{user_id}.pickle")
     await delete_message(message)
     await update_user_settings(pre_event)